@@ -36,6 +36,26 @@ API_SERVICE_OPTS = [
                       'or have dns server, otherwise it will delay the '
                       'response from api.')
                 ),
+    cfg.IntOpt('max_limit',
+               default=1000,
+               help=('The maximum number of items returned in a single '
+                     'response from a collection resource.'),
+               ),
+    cfg.IntOpt('workers',
+               default=1,
+               help='Number of worker processes for the ripcord API server.',
+               ),
+    cfg.StrOpt('server',
+               default='simple',
+               help=('WSGI server used by each worker. simple serves one '
+                     'request at a time, eventlet serves many concurrent '
+                     'connections from a pool of greenthreads.'),
+               ),
+    cfg.IntOpt('eventlet_pool_size',
+               default=1000,
+               help=('Maximum number of greenthreads serving requests in '
+                     'each worker when using the eventlet server.'),
+               ),
 ]
 
 CONF = cfg.CONF
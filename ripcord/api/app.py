@@ -20,6 +20,8 @@ import os
 import socket
 from wsgiref import simple_server
 
+import eventlet
+from eventlet import wsgi
 import netaddr
 from oslo.config import cfg
 from paste import deploy
@@ -27,8 +29,14 @@ import pecan
 
 from ripcord.api import config
 from ripcord.api import hooks
+from ripcord.api import inflight
+from ripcord.api import metrics
 from ripcord.api import middleware
+from ripcord.api import profiler
+from ripcord.api import tracing
+from ripcord.common import exception
 from ripcord.openstack.common import log
+from ripcord.openstack.common import service
 
 LOG = log.getLogger(__name__)
 
@@ -50,10 +58,18 @@ def build_server():
     app = load_app()
     # Create the WSGI server and start it
     host, port = cfg.CONF.api.host, cfg.CONF.api.port
-    server_cls = get_server_cls(host)
 
-    srv = simple_server.make_server(
-        host, port, app, server_cls, get_handler_cls())
+    if cfg.CONF.api.server == 'eventlet':
+        srv = EventletServer(
+            app, host, port, pool_size=cfg.CONF.api.eventlet_pool_size)
+    elif cfg.CONF.api.server == 'simple':
+        server_cls = get_server_cls(host)
+        srv = simple_server.make_server(
+            host, port, app, server_cls, get_handler_cls())
+    else:
+        raise exception.ConfigInvalid(
+            error_msg='api server value of %s is invalid, must be one of '
+                      'simple or eventlet.' % cfg.CONF.api.server)
 
     LOG.info('Starting server in PID %s' % os.getpid())
     LOG.info("Configuration:")
@@ -122,7 +138,13 @@ def load_app():
 
 def setup_app(pecan_config=None):
     app_hooks = [
+        hooks.ContextHook(),
         hooks.DBHook(),
+        hooks.MetricsHook(),
+        hooks.QueryStatsHook(),
+        # NOTE(pabelanger): Last, so the controller stage starts after the
+        # before() of the other hooks and ends before their after().
+        hooks.TracingHook(),
     ]
 
     if not pecan_config:
@@ -137,10 +159,38 @@ def setup_app(pecan_config=None):
         debug=CONF.debug,
         force_canonical=getattr(pecan_config.app, 'force_canonical', True),
         hooks=app_hooks,
-        wrap_app=middleware.ParsableErrorMiddleware,
+        wrap_app=_wrap_app,
         guess_content_type_from_ext=False)
 
-    return app
+    return tracing.TracingMiddleware(
+        inflight.InflightMiddleware(metrics.MetricsMiddleware(app)))
+
+
+def _wrap_app(app):
+    app.render = tracing.traced('serialize', app.render)
+
+    return tracing.Stage('errors', middleware.ParsableErrorMiddleware(
+        tracing.Stage('dispatch', app)))
+
+
+class EventletServer(object):
+    """WSGI server handling each connection in its own greenthread."""
+
+    def __init__(self, app, host, port, pool_size):
+        self.app = app
+        self.pool = eventlet.GreenPool(pool_size)
+
+        family = socket.AF_INET
+        if netaddr.valid_ipv6(host):
+            family = socket.AF_INET6
+        self.socket = eventlet.listen((host, port), family=family)
+
+    def serve_forever(self):
+        # NOTE(pabelanger): eventlet closes the socket it was given once the
+        # server stops, hand it a duplicate so the service can be restarted.
+        wsgi.server(
+            self.socket.dup(), self.app, custom_pool=self.pool,
+            log=log.WritableLogger(LOG))
 
 
 class VersionSelectorApplication(object):
@@ -151,3 +201,29 @@ class VersionSelectorApplication(object):
 
     def __call__(self, environ, start_response):
         return self.v1(environ, start_response)
+
+
+class WSGIService(service.Service):
+    """Provides ability to launch the API from a forked process."""
+
+    def __init__(self):
+        super(WSGIService, self).__init__()
+        self.workers = CONF.api.workers
+        if self.workers < 1:
+            raise exception.ConfigInvalid(
+                error_msg='api workers value of %d is invalid, must be '
+                          'greater than 0.' % self.workers)
+
+        # NOTE(pabelanger): The listen socket is created here, in the parent,
+        # so every forked worker accepts connections from the same socket.
+        self.server = build_server()
+
+    def start(self):
+        # NOTE(pabelanger): Threads do not survive fork(), the sampling
+        # profiler is started by each worker.
+        if profiler.start_sampling() and (
+                CONF.api.sampling_profiler_write_interval > 0):
+            self.tg.add_timer(CONF.api.sampling_profiler_write_interval,
+                              profiler.write_samples)
+        inflight.start_watchdog(self.tg)
+        self.tg.add_thread(self.server.serve_forever)
@@ -0,0 +1,74 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Diagnostics of the API process, only served to local admin users."""
+
+import netaddr
+import pecan
+from pecan import rest
+
+from ripcord.api import inflight
+from ripcord.api import profiler
+from ripcord.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class AdminController(rest.RestController):
+    """REST Controller for process diagnostics."""
+
+    _custom_actions = {
+        'pool': ['GET'],
+        'requests': ['GET'],
+        'stacks': ['GET'],
+    }
+
+    @pecan.expose('json')
+    def pool(self):
+        """Checkout statistics and occupancy of the database pools."""
+        _check_admin()
+        return pecan.request.db_api.get_pool_stats()
+
+    @pecan.expose('json')
+    def requests(self):
+        """The requests being served by this worker, and their stacks."""
+        _check_admin()
+        return inflight.snapshot()
+
+    @pecan.expose(content_type='text/plain')
+    def stacks(self):
+        """Stacks counted by the sampling profiler, in collapsed format."""
+        _check_admin()
+        if profiler.SAMPLER is None:
+            pecan.abort(404, 'The sampling profiler is not running.')
+
+        return profiler.SAMPLER.collapsed()
+
+
+def _check_admin():
+    """Refuse the request unless it is local and made by an admin user.
+
+    The admin role is read from X-Roles by ripcord.api.hooks.ContextHook,
+    without the authtoken filter in the pipeline anyone can claim it.
+    """
+    try:
+        local = netaddr.IPAddress(pecan.request.remote_addr).is_loopback()
+    except (netaddr.AddrFormatError, TypeError, ValueError):
+        local = False
+
+    if not local or not pecan.request.request_context.is_admin:
+        LOG.warn('Refused admin request from %s' % pecan.request.remote_addr)
+        pecan.abort(403)
@@ -14,9 +14,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from ripcord.api.controllers import admin
 from ripcord.api.controllers.v1 import controller as v1
 
 
 class RootController(object):
 
+    admin = admin.AdminController()
     v1 = v1.Controller()
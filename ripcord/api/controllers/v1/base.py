@@ -15,8 +15,10 @@
 # limitations under the License.
 
 import datetime
-import wsme
+import operator
 
+import wsme
+from wsme.rest import json as wsme_json
 from wsme import types
 
 
@@ -25,8 +27,63 @@ class APIBase(types.Base):
     created_at = datetime.datetime
     updated_at = datetime.datetime
 
+    def __init__(self, **kwargs):
+        for attr in types.list_attributes(self.__class__):
+            setattr(self, attr.key, kwargs.get(attr.key))
+
     def as_dict(self):
-        return dict((k, getattr(self, k))
-                    for k in self.fields
-                    if hasattr(self, k) and
-                    getattr(self, k) != wsme.Unset)
+        res = {}
+        for attr in types.list_attributes(self.__class__):
+            value = getattr(self, attr.key)
+            if value is not wsme.Unset:
+                res[attr.key] = value
+
+        return res
+
+
+class Serializer(object):
+    """Convert rows of a model to the JSON representation of an API type.
+
+    The attributes shared by the type and the model are looked up once,
+    rows are then read with a single attrgetter call rather than the
+    per-attribute conversion of WSME. The serializer is registered with
+    WSME, so the results of wsexpose'd controllers go through it too.
+    """
+
+    def __init__(self, datatype, model):
+        columns = model.__table__.columns
+        attributes = [attr for attr in types.list_attributes(datatype)
+                      if attr.key in columns]
+
+        self.datetimes = tuple(attr.key for attr in attributes
+                               if attr.datatype is datetime.datetime)
+        self.fields = tuple(attr.key for attr in attributes)
+        self._attrgetter = operator.attrgetter(*self.fields)
+
+        wsme_json.tojson.when_object(datatype)(self._tojson)
+
+    def to_dict(self, row):
+        """Convert a model, a dict or an API object to a JSON-ready dict.
+
+        Dicts may only hold some of the fields, as read for a sparse
+        fieldset, only those are converted.
+        """
+        if isinstance(row, dict):
+            res = dict((k, row[k]) for k in self.fields if k in row)
+        else:
+            res = dict(zip(self.fields, self._attrgetter(row)))
+            if isinstance(row, types.Base):
+                res = dict((k, v) for k, v in res.iteritems()
+                           if v is not wsme.Unset)
+
+        for k in self.datetimes:
+            if res.get(k) is not None:
+                res[k] = res[k].isoformat()
+
+        return res
+
+    def _tojson(self, datatype, value):
+        if value is None:
+            return None
+
+        return self.to_dict(value)
@@ -22,6 +22,7 @@ from wsme import types as wtypes
 from wsmeext import pecan as wsme_pecan
 
 from ripcord.api.controllers.v1 import base
+from ripcord.api.controllers.v1 import utils
 from ripcord.common import exception
 from ripcord.db.sqlalchemy import models
 from ripcord.openstack.common import log as logging
@@ -38,15 +39,30 @@ class Domain(base.APIBase):
     user_id = wtypes.text
     uuid = wtypes.text
 
-    def __init__(self, **kwargs):
-        self.fields = vars(models.Domain)
-        for k in self.fields:
-            setattr(self, k, kwargs.get(k))
+
+SERIALIZER = base.Serializer(Domain, models.Domain)
+
+# NOTE(pabelanger): Columns listings can be sorted by, see
+# utils.validate_sort_key().
+SORT_KEYS = ('created_at', 'id', 'name', 'uuid')
+
+
+class DomainRehash(wtypes.Base):
+    """Progress of recomputing the subscriber digests of a domain."""
+
+    done = int
+    pending = bool
+    total = int
 
 
 class DomainsController(rest.RestController):
     """REST Controller for Domain."""
 
+    _custom_actions = {
+        'export': ['GET'],
+        'rehash': ['GET'],
+    }
+
     @wsme_pecan.wsexpose(None, wtypes.text, status_code=204)
     def delete(self, uuid):
         """Delete a domain."""
@@ -55,24 +71,102 @@ class DomainsController(rest.RestController):
         except exception.DomainNotFound as e:
             raise wsme.exc.ClientSideError(e.message, status_code=e.code)
 
-    @wsme_pecan.wsexpose([Domain])
-    def get_all(self):
-        """Retrieve a list of domains."""
+    @pecan.expose(content_type='application/json')
+    def export(self, sort_key='id', sort_dir='asc'):
+        """Stream every domain of the project as a JSON list.
+
+        Unlike get_all the list is not paged, rows are read from the
+        database and written to the client as they arrive.
+
+        :param sort_key: column to sort results by, one of created_at,
+            id, name or uuid, default: id.
+        :param sort_dir: direction to sort, "asc" or "desc", default: asc.
+        """
+        project_id = pecan.request.headers.get('X-Tenant-Id')
+
+        try:
+            sort_key = utils.validate_sort_key(sort_key, SORT_KEYS)
+            sort_dir = utils.validate_sort_dir(sort_dir)
+            res = pecan.request.db_api.stream_domains(
+                project_id=project_id, sort_key=sort_key, sort_dir=sort_dir)
+        except wsme.exc.ClientSideError as e:
+            pecan.abort(400, e.msg)
+        except exception.Invalid as e:
+            pecan.abort(e.code, e.message)
+
+        utils.stream_response(Domain, res)
+
+    @wsme_pecan.wsexpose(
+        [Domain], int, wtypes.text, wtypes.text, wtypes.text, wtypes.text)
+    def get_all(self, limit=None, marker=None, sort_key='id', sort_dir='asc',
+                fields=None):
+        """Retrieve a list of domains.
+
+        :param limit: maximum number of domains to return.
+        :param marker: uuid of the last domain of the previous page.
+        :param sort_key: column to sort results by, one of created_at,
+            id, name or uuid, default: id.
+        :param sort_dir: direction to sort, "asc" or "desc", default: asc.
+        :param fields: comma separated list of the fields to return, only
+            those are read from the database, default: all of them.
+        """
         project_id = pecan.request.headers.get('X-Tenant-Id')
-        res = pecan.request.db_api.list_domains(project_id=project_id)
+        limit = utils.validate_limit(limit)
+        sort_key = utils.validate_sort_key(sort_key, SORT_KEYS)
+        sort_dir = utils.validate_sort_dir(sort_dir)
+        fields = utils.validate_fields(fields, SERIALIZER.fields)
+
+        try:
+            res = pecan.request.db_api.list_domains(
+                project_id=project_id, limit=limit, marker=marker,
+                sort_key=sort_key, sort_dir=sort_dir,
+                columns=utils.page_columns(fields))
+        except exception.Invalid as e:
+            raise wsme.exc.ClientSideError(e.message, status_code=e.code)
+
+        utils.set_next_link(
+            'domains', res, limit, sort_key=sort_key, sort_dir=sort_dir,
+            fields=fields and ','.join(fields))
+
+        if fields:
+            res = [utils.select_fields(r, fields) for r in res]
 
         return res
 
-    @wsme_pecan.wsexpose(Domain, unicode)
-    def get_one(self, uuid):
-        """Retrieve information about the given domain."""
+    @wsme_pecan.wsexpose(Domain, unicode, wtypes.text)
+    def get_one(self, uuid, fields=None):
+        """Retrieve information about the given domain.
+
+        :param fields: comma separated list of the fields to return, only
+            those are read from the database, default: all of them.
+        """
+        fields = utils.validate_fields(fields, SERIALIZER.fields)
+
         try:
-            result = pecan.request.db_api.get_domain(uuid=uuid)
+            result = pecan.request.db_api.get_domain(
+                uuid=uuid, columns=fields)
         except exception.DomainNotFound as e:
             raise wsme.exc.ClientSideError(e.message, status_code=e.code)
 
+        if fields:
+            result = utils.select_fields(result, fields)
+
         return result
 
+    @wsme_pecan.wsexpose(DomainRehash, wtypes.text)
+    def rehash(self, uuid):
+        """Retrieve the progress of a domain's subscriber rehash.
+
+        Renaming a domain invalidates the ha1 and ha1b digests of all its
+        subscribers, they are recomputed in the background.
+        """
+        try:
+            result = pecan.request.db_api.get_domain_rehash(uuid=uuid)
+        except exception.DomainNotFound as e:
+            raise wsme.exc.ClientSideError(e.message, status_code=e.code)
+
+        return DomainRehash(**result)
+
     @wsme.validate(Domain)
     @wsme_pecan.wsexpose(Domain, body=Domain)
     def post(self, body):
@@ -83,9 +177,10 @@ class DomainsController(rest.RestController):
 
             d = body.as_dict()
 
-            res = pecan.request.db_api.create_domain(
-                name=d['name'], disabled=d['disabled'],
-                user_id=user_id, project_id=project_id)
+            with utils.reserve_quotas(project_id=project_id, domains=1):
+                res = pecan.request.db_api.create_domain(
+                    name=d['name'], disabled=d['disabled'],
+                    user_id=user_id, project_id=project_id)
         except exception.DomainAlreadyExists as e:
             raise wsme.exc.ClientSideError(e.message, status_code=e.code)
 
@@ -107,4 +202,7 @@ class DomainsController(rest.RestController):
         except exception.DomainNotFound as e:
             raise wsme.exc.ClientSideError(e.message, status_code=e.code)
 
+        if res['rehash_marker'] is not None:
+            utils.spawn(pecan.request.db_api.rehash_domain, uuid=uuid)
+
         return res
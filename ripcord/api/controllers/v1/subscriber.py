@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from oslo.config import cfg
 import pecan
 import wsme
 
@@ -22,10 +23,13 @@ from wsme import types as wtypes
 from wsmeext import pecan as wsme_pecan
 
 from ripcord.api.controllers.v1 import base
+from ripcord.api.controllers.v1 import utils
 from ripcord.common import exception
 from ripcord.db.sqlalchemy import models
+from ripcord.openstack.common.db import exception as db_exc
 from ripcord.openstack.common import log as logging
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
@@ -45,15 +49,90 @@ class Subscriber(base.APIBase):
     username = wtypes.text
     uuid = wtypes.text
 
-    def __init__(self, **kwargs):
-        self.fields = vars(models.Subscriber)
-        for k in self.fields:
-            setattr(self, k, kwargs.get(k))
+
+SERIALIZER = base.Serializer(Subscriber, models.Subscriber)
+
+# NOTE(pabelanger): Columns listings can be sorted by, see
+# utils.validate_sort_key().
+SORT_KEYS = ('created_at', 'id', 'username', 'uuid')
+
+
+class SubscriberResult(wtypes.Base):
+    """Outcome of creating a single subscriber of a bulk request."""
+
+    error_message = wtypes.text
+    status_code = int
+    subscriber = Subscriber
 
 
 class SubscribersController(rest.RestController):
     """REST Controller for Subscriber."""
 
+    _custom_actions = {
+        'bulk': ['POST'],
+        'export': ['GET'],
+    }
+
+    @wsme_pecan.wsexpose([SubscriberResult], body=[Subscriber])
+    def bulk(self, body):
+        """Create a batch of subscribers in a single transaction.
+
+        A result is returned for every subscriber of the request, in the
+        same order. Subscribers which could not be created carry the
+        status code and error message a single POST would have returned.
+        """
+        if len(body) > CONF.api.max_limit:
+            raise wsme.exc.ClientSideError(
+                'Too many subscribers, the limit is %d' % CONF.api.max_limit)
+
+        user_id = pecan.request.headers.get('X-User-Id')
+        project_id = pecan.request.headers.get('X-Tenant-Id')
+
+        results = [None] * len(body)
+        subscribers = []
+        for idx, subscriber in enumerate(body):
+            d = subscriber.as_dict()
+            missing = [k for k in ['domain_id', 'password', 'username']
+                       if not d.get(k)]
+            if missing:
+                results[idx] = SubscriberResult(
+                    status_code=400,
+                    error_message='Missing fields: %s' % ', '.join(missing))
+                continue
+
+            subscribers.append((idx, {
+                'description': d['description'] or '',
+                'disabled': d['disabled'] or False,
+                'domain_id': d['domain_id'],
+                'email': d['email_address'] or '',
+                'password': d['password'],
+                'rpid': d['rpid'] or '',
+                'username': d['username'],
+            }))
+
+        try:
+            with utils.reserve_quotas(
+                    project_id=project_id, subscribers=len(subscribers)):
+                res = pecan.request.db_api.create_subscribers(
+                    subscribers=[s for _, s in subscribers], user_id=user_id,
+                    project_id=project_id)
+        except db_exc.DBDuplicateEntry:
+            # NOTE(pabelanger): Another request created one of these
+            # subscribers since we checked, the whole batch was rolled back.
+            raise wsme.exc.ClientSideError(
+                'Subscriber already exists, no subscribers were created',
+                status_code=409)
+
+        for (idx, _), r in zip(subscribers, res):
+            if isinstance(r, exception.RipcordException):
+                results[idx] = SubscriberResult(
+                    status_code=r.code, error_message=unicode(r))
+            else:
+                results[idx] = SubscriberResult(
+                    status_code=200, subscriber=Subscriber(**dict(r)))
+
+        return results
+
     @wsme_pecan.wsexpose(None, wtypes.text, status_code=204)
     def delete(self, uuid):
         """Delete an subscriber."""
@@ -62,22 +141,86 @@ class SubscribersController(rest.RestController):
         except exception.SubscriberNotFound as e:
             raise wsme.exc.ClientSideError(e.message, status_code=e.code)
 
-    @wsme_pecan.wsexpose([Subscriber])
-    def get_all(self):
-        """Retrieve a list of subscribers."""
+    @pecan.expose(content_type='application/json')
+    def export(self, sort_key='id', sort_dir='asc'):
+        """Stream every subscriber of the project as a JSON list.
+
+        Unlike get_all the list is not paged, rows are read from the
+        database and written to the client as they arrive.
+
+        :param sort_key: column to sort results by, one of created_at,
+            id, username or uuid, default: id.
+        :param sort_dir: direction to sort, "asc" or "desc", default: asc.
+        """
         project_id = pecan.request.headers.get('X-Tenant-Id')
-        res = pecan.request.db_api.list_subscribers(project_id=project_id)
+
+        try:
+            sort_key = utils.validate_sort_key(sort_key, SORT_KEYS)
+            sort_dir = utils.validate_sort_dir(sort_dir)
+            res = pecan.request.db_api.stream_subscribers(
+                project_id=project_id, sort_key=sort_key, sort_dir=sort_dir)
+        except wsme.exc.ClientSideError as e:
+            pecan.abort(400, e.msg)
+        except exception.Invalid as e:
+            pecan.abort(e.code, e.message)
+
+        utils.stream_response(Subscriber, res)
+
+    @wsme_pecan.wsexpose(
+        [Subscriber], int, wtypes.text, wtypes.text, wtypes.text, wtypes.text)
+    def get_all(self, limit=None, marker=None, sort_key='id', sort_dir='asc',
+                fields=None):
+        """Retrieve a list of subscribers.
+
+        :param limit: maximum number of subscribers to return.
+        :param marker: uuid of the last subscriber of the previous page.
+        :param sort_key: column to sort results by, one of created_at,
+            id, username or uuid, default: id.
+        :param sort_dir: direction to sort, "asc" or "desc", default: asc.
+        :param fields: comma separated list of the fields to return, only
+            those are read from the database, default: all of them.
+        """
+        project_id = pecan.request.headers.get('X-Tenant-Id')
+        limit = utils.validate_limit(limit)
+        sort_key = utils.validate_sort_key(sort_key, SORT_KEYS)
+        sort_dir = utils.validate_sort_dir(sort_dir)
+        fields = utils.validate_fields(fields, SERIALIZER.fields)
+
+        try:
+            res = pecan.request.db_api.list_subscribers(
+                project_id=project_id, limit=limit, marker=marker,
+                sort_key=sort_key, sort_dir=sort_dir,
+                columns=utils.page_columns(fields))
+        except exception.Invalid as e:
+            raise wsme.exc.ClientSideError(e.message, status_code=e.code)
+
+        utils.set_next_link(
+            'subscribers', res, limit, sort_key=sort_key, sort_dir=sort_dir,
+            fields=fields and ','.join(fields))
+
+        if fields:
+            res = [utils.select_fields(r, fields) for r in res]
 
         return res
 
-    @wsme_pecan.wsexpose(Subscriber, unicode)
-    def get_one(self, uuid):
-        """Retrieve information about the given subscriber."""
+    @wsme_pecan.wsexpose(Subscriber, unicode, wtypes.text)
+    def get_one(self, uuid, fields=None):
+        """Retrieve information about the given subscriber.
+
+        :param fields: comma separated list of the fields to return, only
+            those are read from the database, default: all of them.
+        """
+        fields = utils.validate_fields(fields, SERIALIZER.fields)
+
         try:
-            result = pecan.request.db_api.get_subscriber(uuid)
+            result = pecan.request.db_api.get_subscriber(
+                uuid, columns=fields)
         except exception.SubscriberNotFound as e:
             raise wsme.exc.ClientSideError(e.message, status_code=e.code)
 
+        if fields:
+            result = utils.select_fields(result, fields)
+
         return result
 
     @wsme.validate(Subscriber)
@@ -90,12 +233,13 @@ class SubscribersController(rest.RestController):
 
             d = body.as_dict()
 
-            res = pecan.request.db_api.create_subscriber(
-                username=d['username'], domain_id=d['domain_id'],
-                password=d['password'], user_id=user_id,
-                project_id=project_id, description=d['description'],
-                disabled=d['disabled'], email=d['email_address'],
-                rpid=d['rpid'])
+            with utils.reserve_quotas(project_id=project_id, subscribers=1):
+                res = pecan.request.db_api.create_subscriber(
+                    username=d['username'], domain_id=d['domain_id'],
+                    password=d['password'], user_id=user_id,
+                    project_id=project_id, description=d['description'],
+                    disabled=d['disabled'], email=d['email_address'],
+                    rpid=d['rpid'])
         except exception.SubscriberAlreadyExists as e:
             raise wsme.exc.ClientSideError(e.message, status_code=e.code)
 
@@ -0,0 +1,171 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import json
+import threading
+import urllib
+
+from oslo.config import cfg
+import pecan
+import wsme
+from wsme.rest import json as wsme_json
+
+from ripcord.common import exception
+from ripcord.openstack.common import excutils
+from ripcord.openstack.common import log as logging
+from ripcord import quota
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+
+@contextlib.contextmanager
+def reserve_quotas(project_id, **deltas):
+    """Reserve the quota of the resources the block creates.
+
+    The reservations are committed once the block returns and rolled
+    back if it raises, so concurrent creates cannot both take the last
+    slot of a quota.
+    """
+    try:
+        reservations = quota.QUOTAS.reserve(project_id=project_id, **deltas)
+    except exception.OverQuota as e:
+        raise wsme.exc.ClientSideError(
+            e.format_message(), status_code=e.code)
+
+    try:
+        yield
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            quota.QUOTAS.rollback(reservations, project_id=project_id)
+
+    quota.QUOTAS.commit(reservations, project_id=project_id)
+
+
+def set_next_link(resource, items, limit, **kwargs):
+    """Point the client at the next page of a collection.
+
+    A Link header with rel="next" is only added when the page is full,
+    the marker being the uuid of the last item returned.
+    """
+    if not items or len(items) < limit:
+        return
+
+    params = dict((k, v) for k, v in kwargs.items() if v is not None)
+    params.update(limit=limit, marker=items[-1]['uuid'])
+    url = '%s/v1/%s?%s' % (
+        pecan.request.host_url, resource,
+        urllib.urlencode(sorted(params.items())))
+    pecan.response.headers['Link'] = '<%s>; rel="next"' % url
+
+
+def spawn(func, *args, **kwargs):
+    """Run func in a background thread, logging any failure."""
+    def _run():
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            LOG.exception('Background task %s failed' % func.__name__)
+
+    thread = threading.Thread(target=_run)
+    thread.daemon = True
+    thread.start()
+
+
+def stream_json(datatype, rows):
+    """Serialize rows into a JSON list, one row at a time.
+
+    Each row is converted with the same rules WSME applies to datatype, so
+    the body matches what get_all would have returned.
+    """
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(wsme_json.tojson(datatype, row))
+        separator = ','
+    yield ']'
+
+
+def stream_response(datatype, rows):
+    """Make the current response write rows as they are serialized."""
+    pecan.response.app_iter = stream_json(datatype, rows)
+
+
+def page_columns(fields):
+    """The columns to read for a page of the given fields.
+
+    The uuid is always read, set_next_link() uses it as the marker.
+    """
+    if fields and 'uuid' not in fields:
+        return fields + ('uuid',)
+
+    return fields
+
+
+def select_fields(row, fields):
+    """Keep only the given fields of a row, a dict or a model."""
+    return dict((k, row[k]) for k in fields)
+
+
+def validate_fields(fields, valid):
+    """Parse the comma separated list of the fields query parameter.
+
+    :returns: a tuple of the field names, or None when every field is
+        wanted.
+    """
+    if fields is None:
+        return None
+
+    res = tuple(f.strip() for f in fields.split(',') if f.strip())
+    invalid = [f for f in res if f not in valid]
+    if invalid or not res:
+        raise wsme.exc.ClientSideError(
+            'Invalid fields: %s. Acceptable values are %s' % (
+                ', '.join(invalid), ', '.join(sorted(valid))))
+
+    return res
+
+
+def validate_limit(limit):
+    if limit is not None and limit <= 0:
+        raise wsme.exc.ClientSideError('Limit must be positive')
+
+    return min(CONF.api.max_limit, limit or CONF.api.max_limit)
+
+
+def validate_sort_key(sort_key, valid):
+    """Only accept the columns a listing can be paged by.
+
+    Pages start after the marker row's value of sort_key, a NULL value
+    would match no row and end the listing early, so valid only holds
+    columns which are never NULL.
+    """
+    if sort_key not in valid:
+        raise wsme.exc.ClientSideError(
+            'Invalid sort key: %s. Acceptable values are %s' % (
+                sort_key, ', '.join(sorted(valid))))
+
+    return sort_key
+
+
+def validate_sort_dir(sort_dir):
+    if sort_dir not in ['asc', 'desc']:
+        raise wsme.exc.ClientSideError(
+            'Invalid sort direction: %s. Acceptable values are '
+            '\'asc\' or \'desc\'' % sort_dir)
+
+    return sort_dir
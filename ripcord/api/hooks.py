@@ -14,12 +14,134 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
+
+from oslo.config import cfg
 from pecan import hooks
 
+from ripcord.api import tracing
 from ripcord.db import api as db_api
+from ripcord.openstack.common import context
+from ripcord.openstack.common import local
+
+CONF = cfg.CONF
+CONF.import_opt('replica_read_after_write', 'ripcord.db.sqlalchemy.api',
+                group='database')
+
+_TRACED_DB_API = tracing.TracedAPI('db', db_api)
+
+LAST_WRITE_COOKIE = 'ripcord_last_write'
+
+
+class ContextHook(hooks.PecanHook):
+    """Give every request an id, logged along with its messages.
+
+    The id is returned in the X-Openstack-Request-Id response header. The
+    context is an admin one when X-Roles, set by the authtoken filter,
+    holds the admin role.
+    """
+
+    def before(self, state):
+        roles = state.request.headers.get('X-Roles', '')
+        ctx = context.RequestContext(
+            user=state.request.headers.get('X-User-Id'),
+            tenant=state.request.headers.get('X-Tenant-Id'),
+            is_admin='admin' in [r.strip().lower() for r in roles.split(',')],
+            request_id=state.request.environ.get('openstack.request_id'))
+        # NOTE(pabelanger): local.store only keeps a weak reference.
+        state.request.request_context = ctx
+        state.request.environ['ripcord.context'] = ctx
+        local.store.context = ctx
+
+    def after(self, state):
+        ctx = getattr(state.request, 'request_context', None)
+        if ctx is not None:
+            state.response.headers['X-Openstack-Request-Id'] = ctx.request_id
 
 
 class DBHook(hooks.PecanHook):
+    """Give controllers the database api, on behalf of the client.
+
+    The time of the client's last write is kept in the ripcord_last_write
+    cookie, so that whichever worker serves its next requests sends its
+    reads to the primary database for replica_read_after_write seconds.
+    """
+
+    def before(self, state):
+        state.request.db_api = _TRACED_DB_API
+        db_api.set_client(
+            state.request.headers.get('X-Tenant-Id'),
+            last_write=_last_write(state.request))
+
+    def after(self, state):
+        last_write = db_api.get_last_write()
+        if last_write is not None:
+            state.response.set_cookie(
+                LAST_WRITE_COOKIE, '%.3f' % last_write, httponly=True,
+                max_age=CONF.database.replica_read_after_write)
+        db_api.set_client(None)
+
+
+def _last_write(request):
+    """Time of the client's last write, ignoring invalid cookies."""
+    try:
+        res = float(request.cookies.get(LAST_WRITE_COOKIE))
+    except (TypeError, ValueError):
+        return None
+
+    # NOTE(pabelanger): A time in the future would keep the client on the
+    # primary database for good.
+    if res > time.time():
+        return None
+
+    return res
+
+
+class MetricsHook(hooks.PecanHook):
+    """Name the controller method which handled the request.
+
+    Read by ripcord.api.metrics.MetricsMiddleware, as the route requests
+    are counted and timed by, and by ripcord.api.inflight while they run.
+    """
 
     def before(self, state):
-        state.request.db_api = db_api
+        controller = getattr(state, 'controller', None)
+        owner = getattr(controller, '__self__', None)
+        if owner is None:
+            return
+
+        state.request.environ['ripcord.route'] = '%s.%s' % (
+            owner.__class__.__name__, controller.__name__)
+
+
+class QueryStatsHook(hooks.PecanHook):
+    """Report the database statements issued by each request.
+
+    The number of statements is returned in the X-DB-Queries response
+    header. ripcord.api.tracing reports it, along with the time spent in
+    them, in the Server-Timing header and the access log line.
+    """
+
+    def before(self, state):
+        state.request.query_stats = db_api.start_query_stats()
+
+    def after(self, state):
+        stats = getattr(state.request, 'query_stats', None)
+        if stats is None:
+            return
+        db_api.stop_query_stats(stats)
+        state.request.environ['ripcord.query_stats'] = stats
+
+        state.response.headers['X-DB-Queries'] = str(stats.count)
+
+
+class TracingHook(hooks.PecanHook):
+    """Time the controller, from the decoding of its arguments to the
+    rendering of its result, as a stage of the request.
+    """
+
+    def before(self, state):
+        tracing.start('controller')
+
+    def after(self, state):
+        tracing.stop('controller')
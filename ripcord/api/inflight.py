@@ -0,0 +1,160 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""The requests being served by an API worker.
+
+Every request is registered until its response is sent, along with the
+greenthread serving it, so its current stack can be looked at while it
+runs. They are served by /admin/requests and, from the eventlet backdoor,
+printed with:
+
+    >>> from ripcord.api import inflight
+    >>> inflight.print_requests()
+"""
+
+import sys
+import time
+import traceback
+
+from eventlet import greenthread
+from eventlet import patcher
+from oslo.config import cfg
+
+from ripcord.api import middleware
+from ripcord.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+inflight_opts = [
+    cfg.IntOpt('slow_request_deadline',
+               default=60,
+               help=('Number of seconds after which the stack of a request '
+                     'still being served is logged, 0 disables the '
+                     'watchdog.')),
+    cfg.IntOpt('slow_request_check_interval',
+               default=10,
+               help=('Number of seconds between two checks of the requests '
+                     'being served against slow_request_deadline.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(inflight_opts, group='api')
+
+REQUESTS = {}
+
+_thread = patcher.original('thread')
+
+
+class Request(object):
+    """A request being served, and the greenthread serving it."""
+
+    def __init__(self, environ):
+        self.environ = environ
+        self.greenlet = greenthread.getcurrent()
+        self.reported = False
+        self.started = time.time()
+        self.thread_id = _thread.get_ident()
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started
+
+    @property
+    def frame(self):
+        # NOTE(pabelanger): gr_frame is only set while the greenthread is
+        # switched out, a running one is found among the OS threads.
+        frame = self.greenlet.gr_frame
+        if frame is None:
+            frame = sys._current_frames().get(self.thread_id)
+
+        return frame
+
+    def as_dict(self):
+        trace = self.environ.get('ripcord.trace')
+        frame = self.frame
+
+        return {
+            'elapsed': round(self.elapsed, 3),
+            'method': self.environ['REQUEST_METHOD'],
+            'path': self.environ.get('PATH_INFO', ''),
+            'request_id': self.environ.get('openstack.request_id'),
+            'route': self.environ.get('ripcord.route'),
+            'stack': ''.join(traceback.format_stack(frame)) if frame else '',
+            'stage': trace.current if trace is not None else None,
+            'tenant': self.environ.get('HTTP_X_TENANT_ID'),
+        }
+
+
+class InflightMiddleware(object):
+    """Register requests until their response has been sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+        key = id(request)
+        REQUESTS[key] = request
+
+        try:
+            app_iter = self.app(environ, start_response)
+        except Exception:
+            REQUESTS.pop(key, None)
+            raise
+
+        return middleware.ClosingIterator(
+            app_iter, lambda: REQUESTS.pop(key, None))
+
+
+def check_requests():
+    """Log the stack of the requests served for longer than the deadline.
+
+    Each request is only logged once.
+    """
+    deadline = CONF.api.slow_request_deadline
+    for request in REQUESTS.values():
+        if request.reported or request.elapsed < deadline:
+            continue
+
+        request.reported = True
+        res = request.as_dict()
+        LOG.warn('Slow request, %(method)s %(path)s served for %(elapsed)ss '
+                 'route: %(route)s tenant: %(tenant)s stage: %(stage)s\n'
+                 '%(stack)s' % res, context=request.environ.get(
+                     'ripcord.context'))
+
+
+def print_requests():
+    """Print the requests being served, for use from the backdoor."""
+    for res in snapshot():
+        print('%(request_id)s %(method)s %(path)s %(elapsed)ss '
+              'route: %(route)s tenant: %(tenant)s stage: %(stage)s' % res)
+        print(res['stack'])
+
+
+def snapshot():
+    """The requests being served, longest running first."""
+    return sorted((request.as_dict() for request in REQUESTS.values()),
+                  key=lambda res: -res['elapsed'])
+
+
+def start_watchdog(tg):
+    """Check the requests being served from a timer of the thread group."""
+    if CONF.api.slow_request_deadline <= 0:
+        return False
+
+    tg.add_timer(CONF.api.slow_request_check_interval, check_requests)
+    return True
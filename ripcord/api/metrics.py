@@ -0,0 +1,440 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Request and database metrics in the Prometheus text exposition format.
+
+Every worker keeps its own metrics. When running more than one worker
+each of them periodically writes its metrics to metrics_dir, the worker
+answering a scrape adds up those of the others. The counters and
+histograms of workers which died are kept in metrics_dir, so the totals of
+the host never go down, their gauges are dropped.
+
+The metrics are served on /metrics by ScrapeMiddleware, ahead of the
+authtoken filter in the paste pipeline, since scrapers carry no keystone
+token. They hold no tenant data.
+"""
+
+import collections
+import errno
+import json
+import os
+import tempfile
+import threading
+import time
+
+from oslo.config import cfg
+
+from ripcord.api import middleware
+from ripcord.common import paths
+from ripcord.common import utils
+from ripcord.db import api as db_api
+from ripcord.openstack.common import fileutils
+from ripcord.openstack.common import lockutils
+from ripcord.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+metrics_opts = [
+    cfg.StrOpt('metrics_dir',
+               default=paths.state_path_def('metrics'),
+               help=('Directory where each API worker writes its metrics, '
+                     'so any worker can report those of the whole host. '
+                     'Only used with more than one worker.')),
+    cfg.IntOpt('metrics_flush_interval',
+               default=5,
+               help=('Number of seconds between two writes of the metrics '
+                     'of an API worker to metrics_dir.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(metrics_opts, group='api')
+CONF.import_opt('workers', 'ripcord.api', group='api')
+
+# NOTE(pabelanger): Upper bounds, in seconds, of the request latency buckets.
+_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# NOTE(pabelanger): Requests which did not reach a controller.
+UNMATCHED_ROUTE = 'unmatched'
+
+# NOTE(pabelanger): The method label comes from the client, any method but
+# these is recorded as OTHER_METHOD to bound the number of series.
+_METHODS = frozenset(
+    ['DELETE', 'GET', 'HEAD', 'OPTIONS', 'PATCH', 'POST', 'PUT'])
+OTHER_METHOD = 'other'
+
+# NOTE(pabelanger): Name of the file holding the counters and histograms of
+# the workers which died, in metrics_dir.
+_RETIRED = 'retired.json'
+
+
+class Metrics(object):
+    """Counters and latency histograms of the requests of this process."""
+
+    def __init__(self):
+        self.db_queries = collections.defaultdict(int)
+        self.db_seconds = collections.defaultdict(float)
+        self.flushed_at = 0
+        self.latency = {}
+        self.requests = collections.defaultdict(int)
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.db_queries.clear()
+            self.db_seconds.clear()
+            self.latency.clear()
+            self.requests.clear()
+
+    def collect(self):
+        """Return the metric families of this process."""
+        with self._lock:
+            requests = self.requests.items()
+            latency = self.latency.items()
+            db_queries = self.db_queries.items()
+            db_seconds = self.db_seconds.items()
+
+        families = [
+            _family(
+                'ripcord_api_requests_total', 'counter',
+                'Requests handled, by controller method and status.',
+                [((('route', route), ('method', method), ('status', status)),
+                  count)
+                 for (route, method, status), count in requests]),
+            _family(
+                'ripcord_api_request_duration_seconds', 'histogram',
+                'Time spent handling requests, by controller method.',
+                [((('route', route),), histogram.stats())
+                 for route, histogram in latency]),
+            _family(
+                'ripcord_api_db_queries_total', 'counter',
+                'Database statements issued, by controller method.',
+                [((('route', route),), count)
+                 for route, count in db_queries]),
+            _family(
+                'ripcord_api_db_seconds_total', 'counter',
+                'Time spent in database statements, by controller method.',
+                [((('route', route),), seconds)
+                 for route, seconds in db_seconds]),
+        ]
+        families.extend(_collect_db())
+
+        return families
+
+    def flush(self):
+        """Write the metrics of this process to metrics_dir, if it is due."""
+        now = time.time()
+        if (CONF.api.workers < 2 or not CONF.api.metrics_dir or
+                now - self.flushed_at < CONF.api.metrics_flush_interval):
+            return
+        self.flushed_at = now
+
+        try:
+            _write(CONF.api.metrics_dir, '%d.json' % os.getpid(),
+                   self.collect())
+        except (IOError, OSError) as e:
+            LOG.warn('Unable to write metrics to %s: %s' % (
+                CONF.api.metrics_dir, e))
+
+    def record(self, route, method, status, duration, query_stats=None):
+        if method not in _METHODS:
+            method = OTHER_METHOD
+
+        with self._lock:
+            self.requests[(route, method, str(status))] += 1
+            histogram = self.latency.get(route)
+            if histogram is None:
+                histogram = self.latency[route] = utils.Histogram(
+                    _LATENCY_BUCKETS)
+            if query_stats is not None:
+                self.db_queries[route] += query_stats.count
+                self.db_seconds[route] += query_stats.elapsed
+
+        histogram.observe(duration)
+
+
+METRICS = Metrics()
+
+
+class MetricsMiddleware(object):
+    """Record the status and latency of every request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        started = time.time()
+        state = {}
+
+        def replacement_start_response(status, headers, exc_info=None):
+            state['status'] = status.split(' ', 1)[0]
+            return start_response(status, headers, exc_info)
+
+        def record():
+            METRICS.record(
+                environ.get('ripcord.route', UNMATCHED_ROUTE),
+                environ['REQUEST_METHOD'], state.get('status', '500'),
+                time.time() - started, environ.get('ripcord.query_stats'))
+            METRICS.flush()
+
+        try:
+            app_iter = self.app(environ, replacement_start_response)
+        except Exception:
+            record()
+            raise
+
+        return middleware.ClosingIterator(app_iter, record)
+
+
+class ScrapeMiddleware(object):
+    """Serve the metrics of the host on /metrics, passing other requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        if (environ.get('PATH_INFO') != '/metrics' or
+                environ['REQUEST_METHOD'] not in ('GET', 'HEAD')):
+            return self.app(environ, start_response)
+
+        body = render(collect_host())
+        start_response('200 OK', [
+            ('Content-Type', 'text/plain; charset=UTF-8'),
+            ('Content-Length', str(len(body)))])
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+
+        return [body]
+
+
+def collect_host():
+    """Return the metric families of every worker of this host."""
+    families = [METRICS.collect()]
+    if CONF.api.workers > 1 and CONF.api.metrics_dir:
+        families.extend(_read(CONF.api.metrics_dir, os.getpid()))
+
+    return _merge(families)
+
+
+def filter_factory(global_conf, **local_conf):
+    """Paste filter factory, to be placed ahead of authtoken."""
+    return ScrapeMiddleware
+
+
+def render(families):
+    """Format metric families in the Prometheus text exposition format."""
+    lines = []
+    for family in sorted(families, key=lambda f: f['name']):
+        lines.append('# HELP %s %s' % (family['name'], family['help']))
+        lines.append('# TYPE %s %s' % (family['name'], family['type']))
+        for labels, value in sorted(family['samples']):
+            if family['type'] != 'histogram':
+                lines.append(_sample(family['name'], labels, value))
+                continue
+
+            for bound, count in value['buckets']:
+                lines.append(_sample(
+                    family['name'] + '_bucket',
+                    list(labels) + [('le', _format(bound))], count))
+            lines.append(_sample(family['name'] + '_count', labels,
+                                 value['count']))
+            lines.append(_sample(family['name'] + '_sum', labels,
+                                 value['sum']))
+
+    return '\n'.join(lines) + '\n'
+
+
+def _collect_db():
+    families = []
+
+    pools = db_api.get_pool_stats()
+    for key, kind, help in (
+            ('checkouts', 'counter', 'Connections checked out.'),
+            ('timeouts', 'counter', 'Connection checkouts which timed out.'),
+            ('checked_out', 'gauge', 'Connections currently checked out.'),
+            ('overflow', 'gauge', 'Connections opened over the pool size.'),
+            ('size', 'gauge', 'Size of the pool.')):
+        name = 'ripcord_db_pool_%s' % key
+        if kind == 'counter':
+            name += '_total'
+        families.append(_family(name, kind, help, [
+            ((('pool', pool),), stats[key])
+            for pool, stats in pools.items() if stats[key] is not None]))
+    families.append(_family(
+        'ripcord_db_pool_checkout_seconds', 'histogram',
+        'Time spent checking a connection out.',
+        [((('pool', pool),), stats['checkout_time'])
+         for pool, stats in pools.items()]))
+
+    stats = db_api.get_entity_cache_stats()
+    for key in ('evictions', 'hits', 'misses', 'negative_hits'):
+        families.append(_family(
+            'ripcord_entity_cache_%s_total' % key, 'counter',
+            'Entity cache %s.' % key.replace('_', ' '),
+            [((), stats[key])]))
+    if stats['size'] is not None:
+        families.append(_family(
+            'ripcord_entity_cache_size', 'gauge', 'Entity cache entries.',
+            [((), stats['size'])]))
+
+    stats = db_api.get_read_coalescing_stats()
+    families.append(_family(
+        'ripcord_db_read_calls_total', 'counter',
+        'Reads by uuid sent to the database.', [((), stats['calls'])]))
+    families.append(_family(
+        'ripcord_db_read_coalesced_total', 'counter',
+        'Reads by uuid which waited for an identical read in flight.',
+        [((), stats['coalesced'])]))
+
+    return families
+
+
+def _family(name, kind, help, samples):
+    return {
+        'help': help,
+        'name': name,
+        'samples': samples,
+        'type': kind,
+    }
+
+
+def _format(value):
+    if isinstance(value, float):
+        return repr(value)
+
+    return str(value)
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+
+    return True
+
+
+def _merge(processes):
+    """Add up the samples of the metric families of several processes."""
+    families = collections.OrderedDict()
+    for process in processes:
+        for family in process:
+            merged = families.setdefault(family['name'], dict(
+                family, samples=collections.OrderedDict()))
+            for labels, value in family['samples']:
+                labels = tuple(tuple(label) for label in labels)
+                current = merged['samples'].get(labels)
+                if current is None:
+                    merged['samples'][labels] = value
+                elif family['type'] == 'histogram':
+                    merged['samples'][labels] = {
+                        'buckets': [
+                            (bound, count + other) for (bound, count), (
+                                _, other) in zip(current['buckets'],
+                                                 value['buckets'])],
+                        'count': current['count'] + value['count'],
+                        'sum': current['sum'] + value['sum'],
+                    }
+                else:
+                    merged['samples'][labels] = current + value
+
+    for family in families.values():
+        family['samples'] = family['samples'].items()
+
+    return families.values()
+
+
+def _load(path, name):
+    try:
+        with open(os.path.join(path, name)) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError) as e:
+        if getattr(e, 'errno', None) != errno.ENOENT:
+            LOG.warn('Unable to read metrics from %s: %s' % (name, e))
+
+    return None
+
+
+def _read(path, pid):
+    """Read the metric families written by the other workers.
+
+    The files of the workers which died are folded into _RETIRED.
+    """
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return []
+
+    processes = []
+    for name in names:
+        other, ext = os.path.splitext(name)
+        if ext != '.json' or not other.isdigit() or int(other) == pid:
+            continue
+        if not _is_alive(int(other)):
+            _retire(path, name)
+            continue
+        families = _load(path, name)
+        if families is not None:
+            processes.append(families)
+
+    families = _load(path, _RETIRED)
+    if families is not None:
+        processes.append(families)
+
+    return processes
+
+
+def _retire(path, name):
+    """Add the counters and histograms of a dead worker to _RETIRED."""
+    # NOTE(pabelanger): Workers scraped at the same time must not both add
+    # the same file.
+    with lockutils.lock('metrics', lock_file_prefix='ripcord-',
+                        external=True, lock_path=path):
+        families = _load(path, name)
+        if families is None:
+            return
+
+        processes = [[family for family in families
+                      if family['type'] in ('counter', 'histogram')]]
+        retired = _load(path, _RETIRED)
+        if retired is not None:
+            processes.append(retired)
+
+        try:
+            _write(path, _RETIRED, _merge(processes))
+        except (IOError, OSError) as e:
+            LOG.warn('Unable to write metrics to %s: %s' % (_RETIRED, e))
+            return
+
+        fileutils.delete_if_exists(os.path.join(path, name))
+
+
+def _sample(name, labels, value):
+    if labels:
+        name += '{%s}' % ','.join(
+            '%s="%s"' % (key, str(val).replace('\\', '\\\\').replace(
+                '"', '\\"').replace('\n', '\\n'))
+            for key, val in labels)
+
+    return '%s %s' % (name, _format(value))
+
+
+def _write(path, name, families):
+    fileutils.ensure_tree(path)
+    fd, tmp = tempfile.mkstemp(dir=path, prefix='.%s' % name)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(families, f)
+    os.rename(tmp, os.path.join(path, name))
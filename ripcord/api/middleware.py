@@ -83,7 +83,25 @@ class ParsableErrorMiddleware(object):
             else:
                 body = [json.dumps({'error_message': '\n'.join(app_iter)})]
                 state['headers'].append(('Content-Type', 'application/json'))
-            state['headers'].append(('Content-Length', len(body[0])))
+            state['headers'].append(('Content-Length', str(len(body[0]))))
         else:
             body = app_iter
         return body
+
+
+class ClosingIterator(object):
+    """Call a function once the server is done with the response body."""
+
+    def __init__(self, app_iter, func):
+        self.app_iter = app_iter
+        self.func = func
+
+    def __iter__(self):
+        return iter(self.app_iter)
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            self.func()
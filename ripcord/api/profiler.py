@@ -0,0 +1,275 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Profiling of the requests served by the API."""
+
+import collections
+import cProfile
+import os
+import random
+import re
+import sys
+import time
+
+from eventlet import patcher
+from oslo.config import cfg
+
+from ripcord.common import paths
+from ripcord.openstack.common import fileutils
+from ripcord.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+profiler_opts = [
+    cfg.FloatOpt('profile_sample_rate',
+                 default=0.0,
+                 help=('Fraction, from 0 to 1, of the requests profiled with '
+                       'cProfile.')),
+    cfg.BoolOpt('profile_allow_header',
+                default=False,
+                help=('Profile the requests of admin users carrying the '
+                      'X-Ripcord-Profile header. The roles are read from '
+                      'X-Roles, only enable it behind the authtoken '
+                      'filter.')),
+    cfg.StrOpt('profile_dir',
+               default=paths.state_path_def('profiles'),
+               help='Directory where the .pstats files of profiles are kept.'),
+    cfg.IntOpt('profile_max_files',
+               default=100,
+               help=('Maximum number of profiles kept in profile_dir, the '
+                     'oldest are removed first.')),
+    cfg.IntOpt('sampling_profiler_interval',
+               default=10,
+               help=('Number of milliseconds between two samples of the '
+                     'stacks of every thread of an API worker, 0 disables '
+                     'the sampling profiler.')),
+    cfg.IntOpt('sampling_profiler_max_stacks',
+               default=10000,
+               help=('Maximum number of distinct stacks counted by the '
+                     'sampling profiler, further ones are counted as '
+                     '"[other]".')),
+    cfg.IntOpt('sampling_profiler_write_interval',
+               default=0,
+               help=('Number of seconds between two writes of the stacks '
+                     'sampled by an API worker to profile_dir, 0 only serves '
+                     'them from /admin/stacks.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(profiler_opts, group='api')
+
+_UNSAFE = re.compile(r'[^\w.-]')
+
+# NOTE(pabelanger): The sampler must run in an OS thread and sleep for real,
+# rather than in a greenthread only scheduled when the others yield.
+_threading = patcher.original('threading')
+_time = patcher.original('time')
+
+SAMPLER = None
+
+
+class ProfilerMiddleware(object):
+    """Profile sampled requests, and those asking for it, with cProfile.
+
+    cProfile follows the OS thread, under the eventlet server the profile
+    of a request also holds the work of the greenthreads it yielded to.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        if not self._wanted(environ):
+            return self.app(environ, start_response)
+
+        profile = cProfile.Profile()
+        started = time.time()
+        app_iter = profile.runcall(self.app, environ, start_response)
+
+        return _ProfiledIterator(app_iter, profile, environ, started)
+
+    @staticmethod
+    def _wanted(environ):
+        if CONF.api.profile_allow_header and environ.get(
+                'HTTP_X_RIPCORD_PROFILE'):
+            roles = environ.get('HTTP_X_ROLES', '')
+            if 'admin' in [r.strip().lower() for r in roles.split(',')]:
+                return True
+
+        return random.random() < CONF.api.profile_sample_rate
+
+
+class _ProfiledIterator(object):
+    """Profile producing the response body, saving the profile once done."""
+
+    def __init__(self, app_iter, profile, environ, started):
+        self.app_iter = app_iter
+        self.environ = environ
+        self.profile = profile
+        self.started = started
+
+    def __iter__(self):
+        iterator = iter(self.app_iter)
+        while True:
+            self.profile.enable()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.profile.disable()
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            _save(self.profile, self.environ.get('ripcord.route', 'unmatched'),
+                  time.time() - self.started)
+
+
+class SamplingProfiler(object):
+    """Count the stacks of every thread, sampled at a fixed interval.
+
+    Under eventlet the stack of an OS thread is the one of the greenthread
+    it is running, greenthreads waiting on I/O or a lock use no CPU and are
+    not sampled. Stacks are counted in the collapsed format read by
+    flamegraph.pl, one "outermost;...;innermost count" line per stack.
+    """
+
+    def __init__(self, interval, max_stacks):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.samples = 0
+        self.stacks = collections.defaultdict(int)
+        self._lock = _threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def collapsed(self):
+        with self._lock:
+            stacks = sorted(self.stacks.items())
+
+        return ''.join('%s %d\n' % (stack, count) for stack, count in stacks)
+
+    def sample(self):
+        ident = _threading.current_thread().ident
+        for thread, frame in sys._current_frames().items():
+            if thread == ident:
+                continue
+
+            names = []
+            while frame is not None:
+                names.append('%s:%s' % (
+                    frame.f_globals.get('__name__', '?'),
+                    frame.f_code.co_name))
+                frame = frame.f_back
+            stack = ';'.join(reversed(names))
+
+            with self._lock:
+                if (stack not in self.stacks and
+                        len(self.stacks) >= self.max_stacks):
+                    stack = '[other]'
+                self.stacks[stack] += 1
+                self.samples += 1
+
+    def start(self):
+        self._running = True
+        self._thread = _threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+
+    def write(self, path):
+        fileutils.ensure_tree(path)
+        name = os.path.join(path, 'stacks-%d.collapsed' % os.getpid())
+        with open(name + '.tmp', 'w') as f:
+            f.write(self.collapsed())
+        os.rename(name + '.tmp', name)
+
+    def _run(self):
+        while self._running:
+            _time.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                LOG.warn('Unable to sample stacks: %s' % e)
+
+
+def start_sampling():
+    """Start the sampling profiler of this process, if enabled."""
+    global SAMPLER
+
+    if CONF.api.sampling_profiler_interval <= 0 or SAMPLER is not None:
+        return SAMPLER
+
+    SAMPLER = SamplingProfiler(
+        CONF.api.sampling_profiler_interval / 1000.0,
+        CONF.api.sampling_profiler_max_stacks)
+    SAMPLER.start()
+
+    return SAMPLER
+
+
+def write_samples():
+    """Write the stacks sampled by this process to profile_dir."""
+    if SAMPLER is None:
+        return
+
+    try:
+        SAMPLER.write(CONF.api.profile_dir)
+    except (IOError, OSError) as e:
+        LOG.warn('Unable to write sampled stacks: %s' % e)
+
+
+def filter_factory(global_conf, **local_conf):
+    """Paste filter factory, leaving the pipeline as is when disabled."""
+    def filter(app):
+        if not (CONF.api.profile_sample_rate or
+                CONF.api.profile_allow_header):
+            return app
+
+        return ProfilerMiddleware(app)
+
+    return filter
+
+
+def _save(profile, route, duration):
+    path = CONF.api.profile_dir
+    now = time.time()
+    name = '%s.%03d-%s-%dms-%d.pstats' % (
+        time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)), now % 1 * 1000,
+        _UNSAFE.sub('_', route), duration * 1000, os.getpid())
+
+    try:
+        fileutils.ensure_tree(path)
+        profile.dump_stats(os.path.join(path, name))
+        _rotate(path, CONF.api.profile_max_files)
+    except (IOError, OSError) as e:
+        LOG.warn('Unable to save profile %s: %s' % (name, e))
+        return
+
+    LOG.info('Profile of %s saved to %s' % (route, name))
+
+
+def _rotate(path, keep):
+    names = sorted(
+        name for name in os.listdir(path) if name.endswith('.pstats'))
+    for name in names[:max(len(names) - keep, 0)]:
+        fileutils.delete_if_exists(os.path.join(path, name))
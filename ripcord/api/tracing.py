@@ -0,0 +1,232 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Time spent by a request in each stage of the API.
+
+A Trace is started when a request enters the API and the stages it goes
+through are timed as nested spans. The time of a stage excludes the
+stages nested in it, so the stages of a request add up to its total.
+"""
+
+import collections
+import contextlib
+import functools
+import itertools
+import threading
+import time
+
+import wsme.rest.args
+
+from ripcord.api import middleware
+from ripcord.openstack.common import context
+from ripcord.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+_LOCAL = threading.local()
+
+
+class Trace(object):
+    """The stages of a request, and the time spent in each of them."""
+
+    def __init__(self):
+        self.stages = collections.OrderedDict()
+        self.started = time.time()
+        self._stack = []
+
+    @property
+    def current(self):
+        """The innermost stage being timed, if any."""
+        return self._stack[-1][0] if self._stack else None
+
+    def add(self, name, duration):
+        self.stages[name] = self.stages.get(name, 0.0) + duration
+
+    def start(self, name):
+        self._stack.append([name, time.time(), 0.0])
+
+    def stop(self, name):
+        """Stop the innermost span of the given name, and those it holds."""
+        if name not in [span[0] for span in self._stack]:
+            return
+
+        while True:
+            current, started, nested = self._stack.pop()
+            elapsed = time.time() - started
+            self.add(current, elapsed - nested)
+            if self._stack:
+                self._stack[-1][2] += elapsed
+            if current == name:
+                return
+
+    def server_timing(self, query_stats=None):
+        """Format the stages as the value of a Server-Timing header."""
+        metrics = ['total;dur=%.3f' % ((time.time() - self.started) * 1000)]
+        metrics.extend('%s;dur=%.3f' % (name, duration * 1000)
+                       for name, duration in self.stages.items())
+        if query_stats is not None:
+            metrics.append('sql;dur=%.3f;desc="%d queries"' % (
+                query_stats.elapsed * 1000, query_stats.count))
+
+        return ', '.join(metrics)
+
+
+class Stage(object):
+    """Time the WSGI application it wraps as a stage."""
+
+    def __init__(self, name, app):
+        self.app = app
+        self.name = name
+
+    def __call__(self, environ, start_response):
+        with span(self.name):
+            return self.app(environ, start_response)
+
+
+class TracedAPI(object):
+    """Time every function of the module it wraps as a stage."""
+
+    def __init__(self, name, api):
+        self._api = api
+        self._functions = {}
+        self._name = name
+
+    def __getattr__(self, key):
+        func = self._functions.get(key)
+        if func is None:
+            func = getattr(self._api, key)
+            if callable(func):
+                func = self._functions[key] = traced(self._name, func)
+
+        return func
+
+
+class TracingMiddleware(object):
+    """Trace requests, returning their stages in a Server-Timing header.
+
+    Placed at the head of the paste pipeline the time spent in the filters
+    ahead of the API, authtoken, is reported as well. The API traces the
+    requests which were not traced already.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        trace = environ.get('ripcord.trace')
+        if trace is not None:
+            trace.add('authtoken', time.time() - trace.started)
+            return self.app(environ, start_response)
+
+        trace = environ['ripcord.trace'] = Trace()
+        environ.setdefault(
+            'openstack.request_id', context.generate_request_id())
+        state = {}
+        written = []
+
+        def replacement_start_response(status, headers, exc_info=None):
+            # NOTE(pabelanger): Headers are held back until the stages are
+            # known, what the application writes meanwhile is sent after
+            # them, ahead of app_iter.
+            state['response'] = (status, headers, exc_info)
+            return written.append
+
+        _LOCAL.trace = trace
+        try:
+            app_iter = self.app(environ, replacement_start_response)
+        finally:
+            _LOCAL.trace = None
+
+        if 'response' not in state:
+            return app_iter
+
+        status, headers, exc_info = state['response']
+        query_stats = environ.get('ripcord.query_stats')
+        headers.append(('Server-Timing', trace.server_timing(query_stats)))
+        start_response(status, headers, exc_info)
+        _log(environ, status, trace, query_stats)
+
+        if written:
+            return middleware.ClosingIterator(
+                itertools.chain(written, app_iter),
+                getattr(app_iter, 'close', lambda: None))
+
+        return app_iter
+
+
+def filter_factory(global_conf, **local_conf):
+    """Paste filter factory, to be placed at the head of the pipeline."""
+    return TracingMiddleware
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the wrapped block as a stage of the current request."""
+    trace = getattr(_LOCAL, 'trace', None)
+    if trace is None:
+        yield
+        return
+
+    trace.start(name)
+    try:
+        yield
+    finally:
+        trace.stop(name)
+
+
+def start(name):
+    trace = getattr(_LOCAL, 'trace', None)
+    if trace is not None:
+        trace.start(name)
+
+
+def stop(name):
+    trace = getattr(_LOCAL, 'trace', None)
+    if trace is not None:
+        trace.stop(name)
+
+
+def traced(name, func):
+    """Time the calls of func as a stage of the current request."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return func(*args, **kwargs)
+
+    wrapper.traced = True
+    return wrapper
+
+
+def _log(environ, status, trace, query_stats):
+    timing = dict((name, round(duration * 1000, 3))
+                  for name, duration in trace.stages.items())
+    timing['total'] = round((time.time() - trace.started) * 1000, 3)
+    if query_stats is not None:
+        timing['sql'] = round(query_stats.elapsed * 1000, 3)
+        timing['queries'] = query_stats.count
+
+    LOG.info('"%s %s" status: %s route: %s timing: %s' % (
+        environ['REQUEST_METHOD'], environ.get('PATH_INFO', ''),
+        status.split(' ', 1)[0], environ.get('ripcord.route', '-'),
+        ' '.join('%s=%s' % item for item in sorted(timing.items()))),
+        context=environ.get('ripcord.context'),
+        extra={'timing': timing})
+
+
+# NOTE(pabelanger): wsexpose decodes and validates the arguments of a
+# controller with wsme.rest.args.get_args, looked up on every call.
+if not getattr(wsme.rest.args.get_args, 'traced', False):
+    wsme.rest.args.get_args = traced('validate', wsme.rest.args.get_args)
@@ -19,14 +19,27 @@
 Ripcord Service API
 """
 
+import eventlet
+eventlet.monkey_patch(os=False)
+
 from ripcord.api import app
 from ripcord.common import service
+from ripcord.openstack.common.db.sqlalchemy import session as db_session
 from ripcord.openstack.common import log
+from ripcord.openstack.common import service as os_service
 
 LOG = log.getLogger(__name__)
 
 
 def main():
     service.prepare_service()
-    srv = app.build_server()
-    srv.serve_forever()
+    launcher = os_service.ProcessLauncher()
+    server = app.WSGIService()
+
+    # NOTE(pabelanger): Make sure nothing created in the parent is shared
+    # with the workers, each one needs to open its own database connections
+    # after fork.
+    db_session.cleanup()
+
+    launcher.launch_service(server, workers=server.workers)
+    launcher.wait()
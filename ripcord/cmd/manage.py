@@ -19,11 +19,18 @@
 """
 
 import logging
+import os
+import shutil
+import sys
+import tempfile
 
 from oslo.config import cfg
 
 from ripcord.common import config
+from ripcord.common import exception
+from ripcord.db import api as db_api
 from ripcord.db import migration as db_migration
+from ripcord.db.sqlalchemy import explain
 from ripcord.openstack.common import log
 
 CONF = cfg.CONF
@@ -35,6 +42,36 @@ def do_db_version():
     print(db_migration.db_version())
 
 
+def do_db_explain():
+    """Check the queries of the database api for full table scans.
+
+    The schema is built by running every migration against a scratch
+    SQLite database, the configured database is left untouched.
+    """
+    path = tempfile.mkdtemp()
+    try:
+        CONF.set_override(
+            'connection', 'sqlite:///%s' % os.path.join(path, 'explain.db'),
+            group='database')
+        CONF.set_override('slave_connection', '', group='database')
+        db_migration.db_sync()
+
+        missing, scans = explain.verify()
+    except exception.RipcordException as e:
+        sys.exit(unicode(e))
+    finally:
+        shutil.rmtree(path)
+
+    for function in missing:
+        print('%s: not exercised' % function)
+    for function, statement, plan in scans:
+        print('%s: %s\n    %s' % (function, plan, ' '.join(statement.split())))
+
+    if missing or scans:
+        sys.exit(1)
+    print('No full table scans found')
+
+
 def do_db_sync():
     """Place a database under migration control and upgrade,
     creating first if necessary.
@@ -42,10 +79,39 @@ def do_db_sync():
     db_migration.db_sync(CONF.command.version)
 
 
+def do_domain_rehash():
+    """Finish recomputing subscriber digests of renamed domains."""
+    uuids = [CONF.command.uuid] if CONF.command.uuid else (
+        db_api.list_domains_rehash_pending())
+
+    for uuid in uuids:
+        res = db_api.rehash_domain(uuid=uuid)
+        print('%s: %d/%d subscribers rehashed' % (
+            uuid, res['done'], res['total']))
+
+
+def do_quota_reservation_expire():
+    """Release reservations left behind past their expiry."""
+    print('%d reservations expired' % db_api.expire_reservations())
+
+
+def do_quota_usage_refresh():
+    """Recount quota usages, correcting any which drifted."""
+    drift = db_api.refresh_quota_usages(project_id=CONF.command.project_id)
+
+    for project_id, resource, old, new in drift:
+        print('%s: %s usage corrected from %d to %d' % (
+            project_id, resource, old, new))
+    print('%d quota usages corrected' % len(drift))
+
+
 def add_command_parsers(subparsers):
     parser = subparsers.add_parser('db-version')
     parser.set_defaults(func=do_db_version)
 
+    parser = subparsers.add_parser('db-explain')
+    parser.set_defaults(func=do_db_explain)
+
     parser = subparsers.add_parser('db-sync')
     parser.set_defaults(func=do_db_sync)
     parser.add_argument('version', nargs='?')
@@ -56,6 +122,22 @@ def add_command_parsers(subparsers):
         choices=['days', 'hours', 'minutes', 'seconds'],
         help='Granularity to use for age argument, defaults to days.')
 
+    parser = subparsers.add_parser('domain-rehash')
+    parser.set_defaults(func=do_domain_rehash)
+    parser.add_argument(
+        'uuid', nargs='?',
+        help='Domain to rehash, defaults to every domain with a rehash '
+             'pending.')
+
+    parser = subparsers.add_parser('quota-reservation-expire')
+    parser.set_defaults(func=do_quota_reservation_expire)
+
+    parser = subparsers.add_parser('quota-usage-refresh')
+    parser.set_defaults(func=do_quota_usage_refresh)
+    parser.add_argument(
+        'project_id', nargs='?',
+        help='Project to recount, defaults to every project.')
+
 command_opt = cfg.SubCommandOpt('command',
                                 title='Commands',
                                 help='Available commands',
@@ -84,6 +84,10 @@ class RipcordException(Exception):
             return unicode(self)
 
 
+class ConfigInvalid(RipcordException):
+    message = 'Invalid configuration file. %(error_msg)s'
+
+
 class Conflict(RipcordException):
     code = 409
     message = 'Conflict'
@@ -93,6 +97,19 @@ class DomainAlreadyExists(Conflict):
     message = 'Domain %(name) already exists'
 
 
+class Invalid(RipcordException):
+    message = 'Unacceptable parameters'
+    code = 400
+
+
+class InvalidParameterValue(Invalid):
+    message = '%(err)s'
+
+
+class MarkerNotFound(Invalid):
+    message = 'Marker %(marker)s could not be found'
+
+
 class NotFound(RipcordException):
     message = 'Resource could not be found'
     code = 404
@@ -103,14 +120,19 @@ class DomainNotFound(NotFound):
 
 
 class SubscriberAlreadyExists(Conflict):
-    message = ('A subscriber with username %(username) and domain %(domains) '
-               'already exists')
+    message = ('A subscriber with username %(username)s and domain '
+               '%(domain_id)s already exists')
 
 
 class SubscriberNotFound(NotFound):
     message = 'Subscriber %(uuid)s could not be found'
 
 
+class OverQuota(RipcordException):
+    message = 'Quota exceeded for resources: %(overs)s'
+    code = 413
+
+
 class QuotaAlreadyExists(Conflict):
     message = 'Quota %(name) already exists'
 
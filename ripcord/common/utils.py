@@ -14,11 +14,54 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
+import sys
+import threading
+
 from oslo.config import cfg
+import six
 
 CONF = cfg.CONF
 
 
+class Histogram(object):
+    """Count observed values into buckets of upper bounds.
+
+    Values above the last bound are counted in an implicit '+Inf' bucket.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.count = 0
+        self.sum = 0.0
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def stats(self):
+        """Return the cumulative count of every bucket, the count and sum."""
+        with self._lock:
+            counts = list(self._counts)
+            res = {
+                'count': self.count,
+                'sum': self.sum,
+            }
+
+        buckets = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            total += count
+            buckets.append((bound, total))
+        res['buckets'] = buckets
+
+        return res
+
+
 class LazyPluggable(object):
     """A pluggable backend loaded lazily based on some value."""
 
@@ -44,3 +87,63 @@ class LazyPluggable(object):
     def __getattr__(self, key):
         backend = self.__get_backend()
         return getattr(backend, key)
+
+
+class SingleFlight(object):
+    """Share the outcome of a call between concurrent identical calls.
+
+    The first caller for a key runs the call, callers arriving with the
+    same key while it is in flight wait for it and get the same result, or
+    the same exception. Under eventlet.monkey_patch() the lock and events
+    are green, so waiting yields to other greenthreads.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.exc_info:
+                six.reraise(*flight.exc_info)
+
+            return flight.result
+
+        try:
+            flight.result = func(*args, **kwargs)
+        except Exception:
+            flight.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        return flight.result
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+        }
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.exc_info = None
+        self.result = None
@@ -14,74 +14,288 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
+
 from oslo.config import cfg
 
+from ripcord.common import exception
+from ripcord.common import utils
+from ripcord.db import cache
 from ripcord.openstack.common.db import api as db_api
 from ripcord.openstack.common import log as logging
 
+coalesce_opts = [
+    cfg.BoolOpt('coalesce_reads',
+                default=True,
+                help=('Make concurrent reads of the same domain or '
+                      'subscriber wait for a single database query.')),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(coalesce_opts, group='database')
+CONF.import_opt('replica_read_after_write', 'ripcord.db.sqlalchemy.api',
+                group='database')
+CONF.import_opt('slave_connection',
+                'ripcord.openstack.common.db.sqlalchemy.session',
+                group='database')
 
 _BACKEND_MAPPING = {'sqlalchemy': 'ripcord.db.sqlalchemy.api'}
 
 IMPL = db_api.DBAPI(backend_mapping=_BACKEND_MAPPING)
+_FLIGHTS = utils.SingleFlight()
 LOG = logging.getLogger(__name__)
 
 
+def commit_reservations(uuids):
+    return IMPL.commit_reservations(uuids=uuids)
+
+
 def create_domain(name, project_id, user_id, disabled=False):
-    return IMPL.create_domain(
+    res = IMPL.create_domain(
         name=name, project_id=project_id,
         user_id=user_id, disabled=disabled)
+    cache.get_cache().set('domain', res['uuid'], res)
+
+    return res
 
 
 def create_subscriber(
         username, domain_id, password, user_id, project_id, description='',
         disabled=False, email='', rpid=''):
-    return IMPL.create_subscriber(
+    res = IMPL.create_subscriber(
         username=username, domain_id=domain_id, password=password,
         user_id=user_id, project_id=project_id, description=description,
         disabled=disabled, email=email, rpid=rpid)
+    cache.get_cache().set('subscriber', res['uuid'], res)
+
+    return res
+
+
+def create_subscribers(subscribers, user_id, project_id):
+    res = IMPL.create_subscribers(
+        subscribers=subscribers, user_id=user_id, project_id=project_id)
+    for r in res:
+        if not isinstance(r, exception.RipcordException):
+            cache.get_cache().set('subscriber', r['uuid'], r)
+
+    return res
 
 
 def delete_domain(uuid):
-    return IMPL.delete_domain(uuid=uuid)
+    try:
+        return IMPL.delete_domain(uuid=uuid)
+    finally:
+        cache.get_cache().delete('domain', uuid)
 
 
 def delete_subscriber(uuid):
-    return IMPL.delete_subscriber(uuid=uuid)
+    try:
+        return IMPL.delete_subscriber(uuid=uuid)
+    finally:
+        cache.get_cache().delete('subscriber', uuid)
+
+
+def expire_reservations():
+    return IMPL.expire_reservations()
+
+
+def get_domain(uuid, columns=None):
+    return _get_cached(
+        'domain', IMPL.get_domain, exception.DomainNotFound, uuid,
+        columns=columns)
+
+
+def get_domain_rehash(uuid):
+    return IMPL.get_domain_rehash(uuid=uuid)
+
+
+def get_last_write():
+    return IMPL.get_last_write()
+
+
+def get_pool_stats():
+    return IMPL.get_pool_stats()
+
+
+def get_quota_limits(project_id=None):
+    return IMPL.get_quota_limits(project_id=project_id)
+
+
+def get_quota_usages(project_id):
+    return IMPL.get_quota_usages(project_id=project_id)
+
+
+def get_entity_cache_stats():
+    return cache.get_cache().stats()
+
+
+def get_read_coalescing_stats():
+    return _FLIGHTS.stats()
+
+
+def get_subscriber(uuid, columns=None):
+    return _get_cached(
+        'subscriber', IMPL.get_subscriber, exception.SubscriberNotFound, uuid,
+        columns=columns)
+
+
+def list_domains(
+        project_id, limit=None, marker=None, sort_key=None, sort_dir=None,
+        columns=None):
+    return IMPL.list_domains(
+        project_id=project_id, limit=limit, marker=marker,
+        sort_key=sort_key, sort_dir=sort_dir, columns=columns)
+
+
+def list_domains_rehash_pending():
+    return IMPL.list_domains_rehash_pending()
 
 
-def get_domain(uuid):
-    return IMPL.get_domain(uuid=uuid)
+def list_subscribers(
+        project_id, limit=None, marker=None, sort_key=None, sort_dir=None,
+        columns=None):
+    return IMPL.list_subscribers(
+        project_id=project_id, limit=limit, marker=marker,
+        sort_key=sort_key, sort_dir=sort_dir, columns=columns)
 
 
-def get_subscriber(uuid):
-    return IMPL.get_subscriber(uuid=uuid)
+def refresh_quota_usages(project_id=None):
+    return IMPL.refresh_quota_usages(project_id=project_id)
 
 
-def list_domains(project_id):
-    return IMPL.list_domains(project_id=project_id)
+def rehash_domain(uuid, batches=None):
+    entities = cache.get_cache()
 
+    def rehashed(uuids):
+        for subscriber in uuids:
+            entities.delete('subscriber', subscriber)
 
-def list_subscribers(project_id):
-    return IMPL.list_subscribers(project_id=project_id)
+    try:
+        return IMPL.rehash_domain(
+            uuid=uuid, batches=batches, rehashed=rehashed)
+    finally:
+        entities.delete('domain', uuid)
+
+
+def reserve_quotas(project_id, deltas, limits, expire):
+    return IMPL.reserve_quotas(
+        project_id=project_id, deltas=deltas, limits=limits, expire=expire)
+
+
+def rollback_reservations(uuids):
+    return IMPL.rollback_reservations(uuids=uuids)
+
+
+def set_client(client, last_write=None):
+    return IMPL.set_client(client=client, last_write=last_write)
+
+
+def set_quota(project_id, resource, hard_limit):
+    return IMPL.set_quota(
+        project_id=project_id, resource=resource, hard_limit=hard_limit)
+
+
+def set_quota_class(class_name, resource, hard_limit):
+    return IMPL.set_quota_class(
+        class_name=class_name, resource=resource, hard_limit=hard_limit)
+
+
+def start_query_stats():
+    return IMPL.start_query_stats()
+
+
+def stop_query_stats(stats):
+    return IMPL.stop_query_stats(stats=stats)
+
+
+def stream_domains(project_id, sort_key=None, sort_dir=None):
+    return IMPL.stream_domains(
+        project_id=project_id, sort_key=sort_key, sort_dir=sort_dir)
+
+
+def stream_subscribers(project_id, sort_key=None, sort_dir=None):
+    return IMPL.stream_subscribers(
+        project_id=project_id, sort_key=sort_key, sort_dir=sort_dir)
 
 
 def update_domain(
         uuid, name=None, project_id=None, user_id=None, disabled=None):
-    return IMPL.update_domain(
-        uuid, name=name, project_id=project_id,
-        user_id=user_id, disabled=disabled)
+    try:
+        res = IMPL.update_domain(
+            uuid, name=name, project_id=project_id,
+            user_id=user_id, disabled=disabled)
+    except exception.DomainNotFound:
+        cache.get_cache().delete('domain', uuid)
+        raise
+    cache.get_cache().set('domain', uuid, res)
+
+    return res
 
 
 def update_subscriber(
         uuid, description=None, disabled=None, domain_id=None, email=None,
         password=None, project_id=None, rpid=None, user_id=None,
         username=None):
-    return IMPL.update_subscriber(
-        uuid, description=description, disabled=disabled, domain_id=domain_id,
-        email=email, password=password, project_id=project_id, rpid=rpid,
-        user_id=user_id, username=username)
+    try:
+        res = IMPL.update_subscriber(
+            uuid, description=description, disabled=disabled,
+            domain_id=domain_id, email=email, password=password,
+            project_id=project_id, rpid=rpid, user_id=user_id,
+            username=username)
+    except exception.SubscriberNotFound:
+        cache.get_cache().delete('subscriber', uuid)
+        raise
+    cache.get_cache().set('subscriber', uuid, res)
+
+    return res
 
 
 def get_default_quota_class():
     return IMPL.get_default_quota_class()
+
+
+def _get_cached(kind, get, not_found, uuid, columns=None):
+    """Read an entity through the entity cache.
+
+    When only some columns are asked for, a cached entity is returned
+    whole. Otherwise the columns are read from the database and, being
+    partial, left out of the cache.
+    """
+    entities = cache.get_cache()
+
+    res = entities.get(kind, uuid)
+    if res == cache.NOT_FOUND:
+        raise not_found(uuid=uuid)
+    if res is not None:
+        return res
+    if columns:
+        return get(uuid=uuid, columns=columns)
+
+    # NOTE(pabelanger): A read in flight may have started before the client
+    # wrote, joining it could return the row as it was before the write.
+    if CONF.database.coalesce_reads and not IMPL.wrote_recently():
+        return _FLIGHTS.do(
+            (kind, uuid), _load, entities, kind, get, not_found, uuid)
+
+    return _load(entities, kind, get, not_found, uuid)
+
+
+def _load(entities, kind, get, not_found, uuid):
+    """Read an entity from the database, caching the outcome.
+
+    The outcome is not cached if the entity was written during the read,
+    nor, when reads may be served by slave_connection, during the
+    replica_read_after_write seconds before it.
+    """
+    since = time.time()
+    if CONF.database.slave_connection:
+        since -= CONF.database.replica_read_after_write
+
+    try:
+        res = get(uuid=uuid)
+    except not_found:
+        entities.set_not_found(kind, uuid, since)
+        raise
+    entities.fill(kind, uuid, res, since)
+
+    return res
@@ -0,0 +1,304 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cache of the entities read through ripcord.db.api."""
+
+import collections
+import threading
+import time
+
+from oslo.config import cfg
+
+from ripcord.openstack.common import importutils
+from ripcord.openstack.common import log as logging
+from ripcord.openstack.common import memorycache
+from ripcord.openstack.common import uuidutils
+
+LOG = logging.getLogger(__name__)
+
+entity_cache_opts = [
+    cfg.StrOpt('entity_cache_backend',
+               default='memory',
+               help=('Cache of domains and subscribers read by uuid, either '
+                     '"memory", "memcached", "none" or the class path of a '
+                     'backend. With more than one API worker only memcached '
+                     'with memcached_servers is used, the cache is disabled '
+                     'otherwise.')),
+    cfg.IntOpt('entity_cache_size',
+               default=10000,
+               help=('Maximum number of entities kept by the memory entity '
+                     'cache backend.')),
+    cfg.IntOpt('entity_cache_ttl',
+               default=60,
+               help=('Number of seconds a cached entity is used for before '
+                     'it is read from the database again.')),
+    cfg.IntOpt('entity_cache_negative_ttl',
+               default=5,
+               help=('Number of seconds an unknown uuid is remembered as '
+                     'such, 0 disables negative caching.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(entity_cache_opts, group='database')
+CONF.import_opt('workers', 'ripcord.api', group='api')
+
+_BACKENDS = {
+    'memcached': 'ripcord.db.cache.MemcachedBackend',
+    'memory': 'ripcord.db.cache.MemoryBackend',
+    'none': 'ripcord.db.cache.NoopBackend',
+}
+
+# NOTE(pabelanger): Cached in place of an entity which does not exist, a
+# string so that it survives a round trip through memcached.
+NOT_FOUND = '__ripcord_not_found__'
+
+_CACHE = None
+_MAX_WRITES = 10000
+# NOTE(pabelanger): Writes older than this are forgotten once _MAX_WRITES is
+# reached, no read is expected to take as long.
+_WRITES_WINDOW = 300
+
+
+class MemoryBackend(object):
+    """Least recently used cache, private to the process."""
+
+    shared = False
+
+    def __init__(self):
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] <= time.time():
+                return None
+
+            self._entries[key] = entry
+
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        size = CONF.database.entity_cache_size
+        if size <= 0:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def size(self):
+        return len(self._entries)
+
+
+class MemcachedBackend(object):
+    """Cache shared by every process, stored in memcached_servers.
+
+    Without memcached_servers an in-process stand-in is used, which is
+    how the backend is tested, and the cache is then private to the
+    process. Memcached evicts entries on its own, so neither evictions nor
+    size are known.
+    """
+
+    def __init__(self):
+        self.evictions = 0
+        self._client = memorycache.get_client()
+        self.shared = not isinstance(self._client, memorycache.Client)
+
+    def clear(self):
+        # NOTE(pabelanger): Other users of the servers would be flushed
+        # too, entries are left to expire.
+        pass
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, time=ttl)
+
+    def size(self):
+        return None
+
+
+class NoopBackend(object):
+    """Cache which never holds anything."""
+
+    evictions = 0
+    shared = True
+
+    def clear(self):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def size(self):
+        return 0
+
+
+class EntityCache(object):
+    """Cache entities by kind and uuid on top of a backend.
+
+    Unknown uuids are cached as NOT_FOUND for entity_cache_negative_ttl
+    seconds. Only well formed uuids are cached, so that requests for
+    arbitrary keys cannot fill the cache.
+
+    Writes go through set() and delete(), which remember when each entity
+    was last written. Reads fill the cache with fill() and set_not_found(),
+    which are skipped when the entity was written since the read started,
+    so a read racing with a write never replaces it with the row it read
+    before. A backend shared by several processes holds the write times
+    too, so the writes of every process are seen.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self._writes = {}
+
+    def _key(self, kind, uuid):
+        if not uuidutils.is_uuid_like(uuid):
+            return None
+
+        return 'ripcord/%s/%s' % (kind, uuid)
+
+    def clear(self):
+        self.backend.clear()
+
+    def delete(self, kind, uuid):
+        key = self._key(kind, uuid)
+        if key:
+            self._wrote(key)
+            self.backend.delete(key)
+
+    def fill(self, kind, uuid, value, since):
+        """Cache an entity read from the database at since or later.
+
+        Nothing is cached if the entity was written after since.
+        """
+        key = self._key(kind, uuid)
+        if key and not self._written_since(key, since):
+            self.backend.set(key, value, CONF.database.entity_cache_ttl)
+
+    def get(self, kind, uuid):
+        """Retrieve an entity, NOT_FOUND or None on a miss."""
+        key = self._key(kind, uuid)
+        res = self.backend.get(key) if key else None
+
+        if res is None:
+            self.misses += 1
+        elif res == NOT_FOUND:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+
+        return res
+
+    def set(self, kind, uuid, value):
+        """Cache an entity which was just written."""
+        key = self._key(kind, uuid)
+        if key:
+            self._wrote(key)
+            self.backend.set(key, value, CONF.database.entity_cache_ttl)
+
+    def set_not_found(self, kind, uuid, since):
+        """Cache an entity found missing by a read started at since."""
+        ttl = CONF.database.entity_cache_negative_ttl
+        key = self._key(kind, uuid)
+        if key and ttl > 0 and not self._written_since(key, since):
+            self.backend.set(key, NOT_FOUND, ttl)
+
+    def _written_since(self, key, since):
+        if self._writes.get(key, 0) >= since:
+            return True
+        if self.backend.shared:
+            return (self.backend.get(key + '/written') or 0) >= since
+
+        return False
+
+    def _wrote(self, key):
+        now = time.time()
+        if len(self._writes) >= _MAX_WRITES:
+            for k, written in self._writes.items():
+                if now - written >= _WRITES_WINDOW:
+                    del self._writes[k]
+
+        self._writes[key] = now
+        if self.backend.shared:
+            self.backend.set(key + '/written', now, _WRITES_WINDOW)
+
+    def stats(self):
+        lookups = self.hits + self.negative_hits + self.misses
+
+        return {
+            'evictions': self.backend.evictions,
+            'hit_ratio': (
+                float(self.hits + self.negative_hits) / lookups
+                if lookups else 0.0),
+            'hits': self.hits,
+            'misses': self.misses,
+            'negative_hits': self.negative_hits,
+            'size': self.backend.size(),
+        }
+
+
+def get_cache():
+    """Return the entity cache, creating it on first use."""
+    global _CACHE
+
+    if _CACHE is None:
+        name = CONF.database.entity_cache_backend
+        backend = importutils.import_object(_BACKENDS.get(name, name))
+        # NOTE(pabelanger): A write only invalidates the cache of the worker
+        # which served it, the other workers would keep serving the old row.
+        if CONF.api.workers > 1 and not getattr(backend, 'shared', False):
+            LOG.warn('The %s entity cache is private to each of the %d API '
+                     'workers, disabling it. Use the memcached backend with '
+                     'memcached_servers instead.' % (name, CONF.api.workers))
+            backend = NoopBackend()
+        _CACHE = EntityCache(backend)
+
+    return _CACHE
+
+
+def reset():
+    """Drop the entity cache, the next get_cache() creates a new one."""
+    global _CACHE
+
+    _CACHE = None
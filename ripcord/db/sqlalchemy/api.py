@@ -17,23 +17,251 @@
 
 """SQLAlchemy storage backend."""
 
+import collections
+import functools
 import hashlib
 import sys
+import threading
+import time
 
+from oslo.config import cfg
+import sqlalchemy
+from sqlalchemy import exc as sqla_exc
 from sqlalchemy.orm import exc
 
 from ripcord.common import exception
+from ripcord.db.sqlalchemy import instrument
 from ripcord.db.sqlalchemy import models
 from ripcord.openstack.common.db import exception as db_exc
 from ripcord.openstack.common.db.sqlalchemy import session as db_session
+from ripcord.openstack.common.db.sqlalchemy import utils as db_utils
 from ripcord.openstack.common import log as logging
+from ripcord.openstack.common import timeutils
 from ripcord.openstack.common import uuidutils
 
 LOG = logging.getLogger(__name__)
 
-get_session = db_session.get_session
+quota_cache_opts = [
+    cfg.IntOpt('quota_limit_cache_size',
+               default=1000,
+               help=('Maximum number of projects whose quota limits are '
+                     'kept in the in-process cache, 0 disables the cache.')),
+    cfg.IntOpt('quota_limit_cache_ttl',
+               default=60,
+               help=('Number of seconds cached quota limits are used for '
+                     'before they are read from the database again.')),
+]
+
+replica_opts = [
+    cfg.IntOpt('replica_read_after_write',
+               default=5,
+               help=('Number of seconds after a client writes during which '
+                     'its reads are served by the primary database, rather '
+                     'than slave_connection. Writes are remembered by each '
+                     'API worker, and returned to the client in the '
+                     'ripcord_last_write cookie so the other workers see '
+                     'them too. Clients which drop the cookie may read '
+                     'stale data from another worker.')),
+    cfg.IntOpt('replica_retry_interval',
+               default=30,
+               help=('Number of seconds reads are served by the primary '
+                     'database after a read from slave_connection failed.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(quota_cache_opts, group='quotas')
+CONF.register_opts(replica_opts, group='database')
 
 _DEFAULT_QUOTA_NAME = 'default'
+_STREAM_BATCH_SIZE = 100
+_BULK_CHUNK_SIZE = 500
+
+# NOTE(pabelanger): Models whose rows are counted in quota_usages, and the
+# quota resource they are counted against.
+_QUOTA_USAGE_RESOURCES = {
+    models.Domain: 'domains',
+    models.Subscriber: 'subscribers',
+}
+_QUOTA_USAGE_KNOWN = set()
+
+
+class ExpiringCache(object):
+    """Least recently used cache, whose entries expire.
+
+    The size and lifetime of the entries are read from the given options
+    of group, 0 entries disabling the cache. Every process has its own
+    cache, a change made by another process is only seen once the entry
+    expires.
+    """
+
+    def __init__(self, group, size_opt, ttl_opt):
+        self.group = group
+        self.size_opt = size_opt
+        self.ttl_opt = ttl_opt
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry[0] > time.time():
+                self._entries[key] = entry
+                self.hits += 1
+
+                return entry[1]
+
+            self.misses += 1
+
+            return None
+
+    def set(self, key, value):
+        size = CONF[self.group][self.size_opt]
+        if size <= 0:
+            return
+
+        expires = time.time() + CONF[self.group][self.ttl_opt]
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
+
+
+# NOTE(pabelanger): Maps a project_id to the quota limits stored in the
+# database for it, None holding those of the default quota class.
+_QUOTA_LIMIT_CACHE = ExpiringCache(
+    'quotas', 'quota_limit_cache_size', 'quota_limit_cache_ttl')
+
+# NOTE(pabelanger): Per request state, threading.local is green when the API
+# runs under eventlet.
+_LOCAL = threading.local()
+_LAST_WRITES = {}
+_MAX_LAST_WRITES = 10000
+_REPLICA_STATE = {'failed_at': 0}
+
+
+def _reader(f):
+    """Run the queries of f on slave_connection when it is safe to.
+
+    Reads go to the primary database when no slave_connection is set,
+    when called from a write, for a while after the current client last
+    wrote and for a while after the replica failed. A read which fails on
+    the replica is retried on the primary database.
+    """
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        if not _use_replica():
+            return f(*args, **kwargs)
+
+        _LOCAL.replica = True
+        try:
+            return f(*args, **kwargs)
+        except (sqla_exc.DBAPIError, db_exc.DBError) as e:
+            LOG.warn('Read from slave_connection failed, using the primary '
+                     'database: %s' % e)
+            _REPLICA_STATE['failed_at'] = time.time()
+        finally:
+            _LOCAL.replica = False
+
+        return f(*args, **kwargs)
+
+    return wrapper
+
+
+def _writer(f):
+    """Run f on the primary database, remembering the client wrote."""
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        _LOCAL.writing = getattr(_LOCAL, 'writing', 0) + 1
+        try:
+            return f(*args, **kwargs)
+        finally:
+            _LOCAL.writing -= 1
+            _record_write()
+
+    return wrapper
+
+
+def _record_write():
+    now = time.time()
+    if len(_LAST_WRITES) >= _MAX_LAST_WRITES:
+        window = CONF.database.replica_read_after_write
+        for client, last in _LAST_WRITES.items():
+            if now - last >= window:
+                del _LAST_WRITES[client]
+
+    _LAST_WRITES[getattr(_LOCAL, 'client', None)] = now
+    _LOCAL.wrote_at = now
+
+
+def _use_replica():
+    if not CONF.database.slave_connection:
+        return False
+    if getattr(_LOCAL, 'writing', 0) or getattr(_LOCAL, 'replica', False):
+        return False
+
+    if time.time() - _REPLICA_STATE['failed_at'] < (
+            CONF.database.replica_retry_interval):
+        return False
+
+    return not wrote_recently()
+
+
+def wrote_recently():
+    """Whether the current client wrote in the last
+    replica_read_after_write seconds, its reads must then see the writes.
+    """
+    last = max(_LAST_WRITES.get(getattr(_LOCAL, 'client', None)),
+               getattr(_LOCAL, 'last_write', None))
+
+    return last is not None and time.time() - last < (
+        CONF.database.replica_read_after_write)
+
+
+def get_last_write():
+    """Time of the last write since set_client(), None if there was none."""
+    return getattr(_LOCAL, 'wrote_at', None)
+
+
+def set_client(client, last_write=None):
+    """Identify the client making the following calls.
+
+    Used to send the reads of a client to the primary database shortly
+    after it wrote, so it always reads its own writes.
+
+    :param last_write: time the client last wrote, as told by the client,
+        for writes made through other processes.
+    """
+    _LOCAL.client = client
+    _LOCAL.last_write = last_write
+    _LOCAL.wrote_at = None
+
+
+def get_session(slave_session=False, **kwargs):
+    """Return a session, recording the checkouts of its engine's pool."""
+    engine = db_session.get_engine(slave_engine=slave_session)
+    instrument.watch_pool(engine.pool, 'slave' if slave_session else 'main')
+
+    return db_session.get_session(slave_session=slave_session, **kwargs)
 
 
 def get_backend():
@@ -47,11 +275,25 @@ def model_query(model, *args, **kwargs):
     :param session: if present, the session to use
     """
 
-    session = kwargs.get('session') or get_session()
+    session = kwargs.get('session') or get_session(
+        slave_session=getattr(_LOCAL, 'replica', False))
     query = session.query(model, *args)
     return query
 
 
+@_writer
+def commit_reservations(uuids):
+    """Release reservations whose resources have been created.
+
+    The created rows are already counted in in_use by the write which
+    created them, committing only drops the reserved delta.
+
+    :returns: the number of reservations committed.
+    """
+    return _release_reservations(models.Reservation.uuid.in_(uuids))
+
+
+@_writer
 def create_domain(name, project_id, user_id, disabled=False):
     """Create a new domain."""
     values = {
@@ -63,21 +305,26 @@ def create_domain(name, project_id, user_id, disabled=False):
 
     values['uuid'] = uuidutils.generate_uuid()
 
+    _ensure_quota_usage(project_id=project_id, resource='domains')
+    session = get_session()
     try:
-        res = _create_model(model=models.Domain(), values=values)
+        with session.begin():
+            res = _create_model(
+                model=models.Domain(), values=values, session=session)
+            _update_quota_usage(
+                session=session, project_id=project_id, resource='domains',
+                delta=1)
     except db_exc.DBDuplicateEntry:
         raise exception.DomainAlreadyExists(name=values['name'])
 
     return res
 
 
+@_writer
 def create_subscriber(
         username, domain_id, password, user_id, project_id, description='',
         disabled=False, email='', rpid=''):
     """Create a new subscriber."""
-
-    model = get_domain(uuid=domain_id)
-
     values = {
         'description': description,
         'disabled': disabled,
@@ -89,26 +336,101 @@ def create_subscriber(
         'user_id': user_id,
         'username': username,
     }
-
-    values['ha1'] = hashlib.md5(
-        '%s:%s:%s' % (
-            values['username'], model['name'],
-            values['password'])).hexdigest()
-    values['ha1b'] = hashlib.md5(
-        '%s@%s:%s:%s' % (
-            values['username'], model['name'], model['name'],
-            values['password'])).hexdigest()
     values['uuid'] = uuidutils.generate_uuid()
 
+    _ensure_quota_usage(project_id=project_id, resource='subscribers')
+    session = get_session()
     try:
-        res = _create_model(model=models.Subscriber(), values=values)
+        with session.begin():
+            domain = _get_domain_name(session=session, uuid=domain_id)
+            values['ha1'], values['ha1b'] = _calculate_ha1(
+                username=values['username'], domain=domain,
+                password=values['password'])
+
+            res = _create_model(
+                model=models.Subscriber(), values=values, session=session)
+            _update_quota_usage(
+                session=session, project_id=project_id,
+                resource='subscribers', delta=1)
     except db_exc.DBDuplicateEntry:
         raise exception.SubscriberAlreadyExists(
-            username=values['username'], domain_id=model['name'])
+            username=values['username'], domain_id=domain)
 
     return res
 
 
+@_writer
+def create_subscribers(subscribers, user_id, project_id):
+    """Create a batch of subscribers in a single transaction.
+
+    :param subscribers: list of dicts, each holding the keyword arguments
+        of create_subscriber, less user_id and project_id.
+    :returns: a list in the same order as subscribers, holding either the
+        new subscriber or the exception explaining why it was not created.
+    """
+    _ensure_quota_usage(project_id=project_id, resource='subscribers')
+    session = get_session()
+    with session.begin():
+        domains = _get_domain_names(
+            session=session,
+            uuids=set(s['domain_id'] for s in subscribers))
+        existing = _get_subscriber_keys(
+            session=session, domain_ids=domains.keys(),
+            usernames=set(s['username'] for s in subscribers))
+
+        now = timeutils.utcnow()
+        results = []
+        rows = []
+        for subscriber in subscribers:
+            key = (subscriber['username'], subscriber['domain_id'])
+            if subscriber['domain_id'] not in domains:
+                results.append(
+                    exception.DomainNotFound(uuid=subscriber['domain_id']))
+                continue
+            if key in existing:
+                results.append(exception.SubscriberAlreadyExists(
+                    username=subscriber['username'],
+                    domain_id=domains[subscriber['domain_id']]))
+                continue
+            existing.add(key)
+
+            values = {
+                'created_at': now,
+                'description': subscriber.get('description', ''),
+                'disabled': subscriber.get('disabled', False),
+                'domain_id': subscriber['domain_id'],
+                'email_address': subscriber.get('email', ''),
+                'password': subscriber['password'],
+                'project_id': project_id,
+                'rpid': subscriber.get('rpid', ''),
+                'user_id': user_id,
+                'username': subscriber['username'],
+                'uuid': uuidutils.generate_uuid(),
+            }
+            values['ha1'], values['ha1b'] = _calculate_ha1(
+                username=values['username'],
+                domain=domains[values['domain_id']],
+                password=values['password'])
+
+            res = models.Subscriber()
+            res.update(values)
+            results.append(res)
+            rows.append(values)
+
+        # NOTE(pabelanger): A list of parameters makes SQLAlchemy issue a
+        # single executemany() rather than one INSERT per subscriber.
+        for chunk in _chunks(rows, _BULK_CHUNK_SIZE):
+            session.execute(models.Subscriber.__table__.insert(), chunk)
+
+        if rows:
+            _update_quota_usage(
+                session=session, project_id=project_id,
+                resource='subscribers', delta=len(rows))
+
+    return results
+
+
+@_writer
 def delete_domain(uuid):
     """Delete a domain."""
     res = _delete_model(model=models.Domain, uuid=uuid)
@@ -117,6 +439,7 @@ def delete_domain(uuid):
         raise exception.DomainNotFound(uuid=uuid)
 
 
+@_writer
 def delete_subscriber(uuid):
     """Delete a subscriber."""
     res = _delete_model(model=models.Subscriber, uuid=uuid)
@@ -125,101 +448,406 @@ def delete_subscriber(uuid):
         raise exception.SubscriberNotFound(uuid=uuid)
 
 
-def get_domain(uuid):
+@_writer
+def expire_reservations():
+    """Release every reservation past its expiry.
+
+    :returns: the number of reservations expired.
+    """
+    return _release_reservations(
+        models.Reservation.expire < timeutils.utcnow())
+
+
+@_reader
+def get_domain(uuid, columns=None):
     """Retrieve information about the given domain."""
     try:
-        res = _get_model(model=models.Domain, uuid=uuid)
+        res = _get_model(model=models.Domain, columns=columns, uuid=uuid)
     except exc.NoResultFound:
         raise exception.DomainNotFound(uuid=uuid)
 
     return res
 
 
-def get_subscriber(uuid):
+@_reader
+def get_domain_rehash(uuid):
+    """Retrieve the progress of the given domain's subscriber rehash."""
+    res = get_domain(uuid=uuid)
+
+    query = model_query(sqlalchemy.func.count(models.Subscriber.id)).filter(
+        models.Subscriber.domain_id == uuid)
+    total = query.scalar()
+
+    if res['rehash_marker'] is None:
+        done = total
+    else:
+        done = query.filter(
+            models.Subscriber.id <= res['rehash_marker']).scalar()
+
+    return {
+        'done': done,
+        'pending': res['rehash_marker'] is not None,
+        'total': total,
+    }
+
+
+def get_pool_stats():
+    """Retrieve checkout and occupancy statistics of the connection pools."""
+    return instrument.get_pool_stats()
+
+
+def get_quota_usages(project_id):
+    """Retrieve the number of each resource used by a project.
+
+    Usages are always read from the primary database, as they are about to
+    be compared to a quota limit.
+    """
+    rows = model_query(
+        models.QuotaUsage.resource, models.QuotaUsage.in_use
+    ).filter_by(project_id=project_id).all()
+
+    return dict((r.resource, r.in_use) for r in rows)
+
+
+@_reader
+def get_subscriber(uuid, columns=None):
     """Retrieve information about the given subscriber."""
     try:
-        res = _get_model(model=models.Subscriber, uuid=uuid)
+        res = _get_model(model=models.Subscriber, columns=columns, uuid=uuid)
     except exc.NoResultFound:
         raise exception.SubscriberNotFound(uuid=uuid)
 
     return res
 
 
-def list_domains(project_id):
+@_reader
+def list_domains(
+        project_id, limit=None, marker=None, sort_key=None, sort_dir=None,
+        columns=None):
     """Retrieve a list of domains."""
-    res = _list_model(model=models.Domain, project_id=project_id)
+    res = _list_model(
+        model=models.Domain, limit=limit, marker=marker, sort_key=sort_key,
+        sort_dir=sort_dir, columns=columns, project_id=project_id)
 
     return res
 
 
-def list_subscribers(project_id):
+def list_domains_rehash_pending():
+    """Retrieve the uuids of domains with a rehash still to complete."""
+    # NOTE(pabelanger): Markers are subscriber ids, unlike IS NOT NULL a
+    # range lets the database use domains_rehash_marker_idx.
+    query = model_query(models.Domain.uuid).filter(
+        models.Domain.rehash_marker >= 0)
+
+    return [r.uuid for r in query.all()]
+
+
+@_reader
+def list_subscribers(
+        project_id, limit=None, marker=None, sort_key=None, sort_dir=None,
+        columns=None):
     """Retrieve a list of subscribers."""
-    res = _list_model(model=models.Subscriber, project_id=project_id)
+    res = _list_model(
+        model=models.Subscriber, limit=limit, marker=marker,
+        sort_key=sort_key, sort_dir=sort_dir, columns=columns,
+        project_id=project_id)
+
+    return res
+
+
+@_writer
+def refresh_quota_usages(project_id=None):
+    """Recount the quota usages of every project, or of the given one.
+
+    Projects are recounted _BULK_CHUNK_SIZE at a time, each chunk in its
+    own transaction, so the tables are never locked for long.
+
+    :returns: a list of (project_id, resource, old, new) tuples, one for
+        every usage which had drifted from the actual count.
+    """
+    if project_id is not None:
+        projects = [project_id]
+    else:
+        projects = set()
+        for model in _QUOTA_USAGE_RESOURCES.keys() + [models.QuotaUsage]:
+            query = model_query(model.project_id).distinct()
+            projects.update(r.project_id for r in query.all())
+        projects = sorted(projects)
+
+    drift = []
+    for chunk in _chunks(projects, _BULK_CHUNK_SIZE):
+        drift.extend(_refresh_quota_usages(projects=chunk))
+
+    return drift
+
+
+@_writer
+def rehash_domain(uuid, batches=None, rehashed=None):
+    """Recompute the ha1/ha1b digests of a domain's subscribers.
+
+    Subscribers are rehashed in batches of _BULK_CHUNK_SIZE, each in its
+    own transaction. The id of the last subscriber done is kept in the
+    domain's rehash_marker, so an interrupted rehash resumes from there.
+
+    :param batches: maximum number of batches to run, default: all.
+    :param rehashed: if present, called with the uuids of the subscribers
+        of each batch once it is committed.
+    :returns: the progress, as returned by get_domain_rehash().
+    """
+    count = 0
+    while batches is None or count < batches:
+        more, uuids = _rehash_domain_batch(uuid=uuid)
+        if rehashed is not None and uuids:
+            rehashed(uuids)
+        if not more:
+            break
+        count += 1
+
+    return get_domain_rehash(uuid=uuid)
+
+
+def start_query_stats():
+    """Start counting the statements issued by the current thread."""
+    return instrument.start()
+
+
+def stop_query_stats(stats):
+    """Stop counting statements, returning the count and time spent."""
+    return instrument.stop(stats)
+
+
+@_reader
+def stream_domains(project_id, sort_key=None, sort_dir=None):
+    """Iterate over every domain of a project."""
+    res = _stream_model(
+        model=models.Domain, sort_key=sort_key, sort_dir=sort_dir,
+        project_id=project_id)
 
     return res
 
 
+@_reader
+def stream_subscribers(project_id, sort_key=None, sort_dir=None):
+    """Iterate over every subscriber of a project."""
+    res = _stream_model(
+        model=models.Subscriber, sort_key=sort_key, sort_dir=sort_dir,
+        project_id=project_id)
+
+    return res
+
+
+@_writer
 def update_domain(
         uuid, name=None, disabled=None, project_id=None, user_id=None):
     """Update an existing domain."""
-    res = get_domain(uuid=uuid)
-
-    if disabled is not None:
-        res['disabled'] = disabled
-    if name is not None:
-        res['name'] = name
     if project_id is not None:
-        res['project_id'] = project_id
-    if user_id is not None:
-        res['user_id'] = user_id
+        _ensure_quota_usage(project_id=project_id, resource='domains')
 
-    res.save()
+    session = get_session()
+    with session.begin():
+        try:
+            res = model_query(
+                models.Domain, session=session).filter_by(uuid=uuid).one()
+        except exc.NoResultFound:
+            raise exception.DomainNotFound(uuid=uuid)
+
+        if disabled is not None:
+            res['disabled'] = disabled
+        if name is not None and name != res['name']:
+            res['name'] = name
+            # NOTE(pabelanger): The ha1/ha1b digests of every subscriber are
+            # derived from the domain name, flag them to be recomputed from
+            # the start by rehash_domain().
+            res['rehash_marker'] = 0
+        if project_id is not None and project_id != res['project_id']:
+            _move_quota_usage(
+                session=session, resource='domains',
+                old=res['project_id'], new=project_id)
+            res['project_id'] = project_id
+        if user_id is not None:
+            res['user_id'] = user_id
 
     return res
 
 
+@_writer
 def update_subscriber(
         uuid, description=None, disabled=None, domain_id=None, email=None,
         password=None, project_id=None, rpid=None, user_id=None,
         username=None):
-    """Update an existing subscriber."""
-    res = get_subscriber(uuid=uuid)
-
-    if description is not None:
-        res['description'] = description
-    if disabled is not None:
-        res['disabled'] = disabled
-    if domain_id is not None:
-        res['domain_id'] = domain_id
-    if email is not None:
-        res['email_address'] = email
-    if password is not None:
-        res['password'] = password
+    """Update an existing subscriber.
+
+    The subscriber and the name of its domain are read with a single
+    query, and only the columns which changed are written back.
+    """
     if project_id is not None:
-        res['project_id'] = project_id
-    if rpid is not None:
-        res['rpid'] = rpid
-    if user_id is not None:
-        res['user_id'] = user_id
-    if username is not None:
-        res['username'] = username
-
-    model = get_domain(uuid=res['domain_id'])
-
-    res['ha1'] = hashlib.md5(
-        '%s:%s:%s' % (
-            res['username'], model['name'],
-            res['password'])).hexdigest()
-    res['ha1b'] = hashlib.md5(
-        '%s@%s:%s:%s' % (
-            res['username'], model['name'], model['name'],
-            res['password'])).hexdigest()
-
-    res.save()
+        _ensure_quota_usage(project_id=project_id, resource='subscribers')
+
+    session = get_session()
+    with session.begin():
+        try:
+            res, domain = model_query(
+                models.Subscriber, models.Domain.name, session=session
+            ).outerjoin(
+                models.Domain,
+                models.Subscriber.domain_id == models.Domain.uuid
+            ).filter(models.Subscriber.uuid == uuid).one()
+        except exc.NoResultFound:
+            raise exception.SubscriberNotFound(uuid=uuid)
+
+        digest = (res['username'], res['domain_id'], res['password'])
+
+        if description is not None:
+            res['description'] = description
+        if disabled is not None:
+            res['disabled'] = disabled
+        if domain_id is not None:
+            res['domain_id'] = domain_id
+        if email is not None:
+            res['email_address'] = email
+        if password is not None:
+            res['password'] = password
+        if project_id is not None and project_id != res['project_id']:
+            _move_quota_usage(
+                session=session, resource='subscribers',
+                old=res['project_id'], new=project_id)
+            res['project_id'] = project_id
+        if rpid is not None:
+            res['rpid'] = rpid
+        if user_id is not None:
+            res['user_id'] = user_id
+        if username is not None:
+            res['username'] = username
+
+        if digest != (res['username'], res['domain_id'], res['password']):
+            if domain is None or res['domain_id'] != digest[1]:
+                domain = _get_domain_name(
+                    session=session, uuid=res['domain_id'])
+
+            res['ha1'], res['ha1b'] = _calculate_ha1(
+                username=res['username'], domain=domain,
+                password=res['password'])
 
     return res
 
 
+def get_quota_limits(project_id=None):
+    """Retrieve the quota limits stored in the database for a project.
+
+    The limits of the default quota class are read along with the project
+    overrides in a single query, the overrides taking precedence. The
+    result is cached, set_quota() and set_quota_class() invalidating it.
+
+    :param project_id: project to read overrides of, None for the default
+        quota class alone.
+    :returns: a dict mapping resources to hard limits, -1 meaning
+        unlimited. Resources without a limit in the database are missing.
+    """
+    res = _QUOTA_LIMIT_CACHE.get(project_id)
+    if res is None:
+        res = _get_quota_limits(project_id=project_id)
+        _QUOTA_LIMIT_CACHE.set(project_id, res)
+
+    return dict(res)
+
+
+@_writer
+def reserve_quotas(project_id, deltas, limits, expire):
+    """Reserve resources for a project, within its quota limits.
+
+    Each resource is reserved with a single conditional UPDATE of the
+    project's quota usage row, which only matches while in_use + reserved
+    + delta stays within the limit. Concurrent reservations for the same
+    project serialize on that row, other projects never contend. The
+    expired reservations of the project are released first.
+
+    :param deltas: a dict mapping resources to the number of rows about
+        to be created, deltas below 1 are not reserved.
+    :param limits: a dict mapping resources to hard limits, a missing or
+        negative limit meaning unlimited.
+    :param expire: datetime after which the reservations are released.
+    :returns: the uuids of the reservations made.
+    """
+    deltas = dict((k, v) for k, v in deltas.items() if v > 0)
+    for resource in deltas:
+        _ensure_quota_usage(project_id=project_id, resource=resource)
+
+    now = timeutils.utcnow()
+    table = models.QuotaUsage.__table__
+    session = get_session()
+    with session.begin():
+        _release_reservations(
+            models.Reservation.project_id == project_id,
+            models.Reservation.expire < now, session=session)
+
+        overs = []
+        for resource, delta in sorted(deltas.items()):
+            query = table.update().where(sqlalchemy.and_(
+                table.c.project_id == project_id,
+                table.c.resource == resource))
+
+            limit = limits.get(resource, -1)
+            if limit >= 0:
+                query = query.where(
+                    table.c.in_use + table.c.reserved + delta <= limit)
+
+            res = session.execute(query.values(
+                reserved=table.c.reserved + delta, updated_at=now))
+            if not res.rowcount:
+                overs.append(resource)
+
+        if overs:
+            raise exception.OverQuota(overs=overs)
+
+        rows = [{
+            'created_at': now,
+            'delta': delta,
+            'expire': expire,
+            'project_id': project_id,
+            'resource': resource,
+            'uuid': uuidutils.generate_uuid(),
+        } for resource, delta in sorted(deltas.items())]
+        if rows:
+            session.execute(models.Reservation.__table__.insert(), rows)
+
+    return [r['uuid'] for r in rows]
+
+
+@_writer
+def rollback_reservations(uuids):
+    """Release reservations whose resources were not created.
+
+    :returns: the number of reservations rolled back.
+    """
+    return _release_reservations(models.Reservation.uuid.in_(uuids))
+
+
+@_writer
+def set_quota(project_id, resource, hard_limit):
+    """Override the limit of a resource for a project.
+
+    :param hard_limit: the new limit, None for unlimited.
+    """
+    _set_quota_limit(
+        model=models.Quota, hard_limit=hard_limit, project_id=project_id,
+        resource=resource)
+    _QUOTA_LIMIT_CACHE.invalidate(project_id)
+
+
+@_writer
+def set_quota_class(class_name, resource, hard_limit):
+    """Set the limit of a resource for a quota class.
+
+    :param hard_limit: the new limit, None for unlimited.
+    """
+    _set_quota_limit(
+        model=models.QuotaClass, hard_limit=hard_limit,
+        class_name=class_name, resource=resource)
+    # NOTE(pabelanger): Every project inherits from the default quota class.
+    _QUOTA_LIMIT_CACHE.clear()
+
+
+@_reader
 def get_default_quota_class():
     rows = model_query(
         models.QuotaClass).filter_by(class_name=_DEFAULT_QUOTA_NAME).all()
@@ -233,10 +861,27 @@ def get_default_quota_class():
     return result
 
 
-def _create_model(model, values):
+def _calculate_ha1(username, domain, password):
+    """Return the ha1 and ha1b digests of a subscriber."""
+    ha1 = hashlib.md5(
+        '%s:%s:%s' % (username, domain, password)).hexdigest()
+    ha1b = hashlib.md5(
+        '%s@%s:%s:%s' % (username, domain, domain, password)).hexdigest()
+
+    return ha1, ha1b
+
+
+def _chunks(items, size):
+    """Split items into lists of at most size items."""
+    items = list(items)
+
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _create_model(model, values, session=None):
     """Create a new model."""
     model.update(values)
-    model.save()
+    model.save(session=session)
 
     return model
 
@@ -248,21 +893,386 @@ def _delete_model(model, **kwargs):
             model, session=session
         ).filter_by(**kwargs)
 
+        resource = _QUOTA_USAGE_RESOURCES.get(model)
+        if resource:
+            projects = collections.defaultdict(int)
+            for row in query.with_entities(model.project_id).all():
+                projects[row.project_id] += 1
+
         count = query.delete()
 
+        if resource:
+            for project_id, delta in projects.items():
+                _update_quota_usage(
+                    session=session, project_id=project_id,
+                    resource=resource, delta=-delta)
+
         return count
 
 
-def _get_model(model, **kwargs):
-    """Retrieve information about the given model."""
-    query = model_query(model).filter_by(**kwargs)
+def _ensure_quota_usage(project_id, resource):
+    """Make sure the quota usage row of a project exists.
+
+    The row is created in its own transaction, before the write which
+    updates it, so two requests racing to create it do not fail one of
+    the writes with a duplicate entry.
+    """
+    key = (project_id, resource)
+    if key in _QUOTA_USAGE_KNOWN:
+        return
+
+    session = get_session()
+    try:
+        with session.begin():
+            exists = model_query(
+                models.QuotaUsage.id, session=session
+            ).filter_by(project_id=project_id, resource=resource).first()
+            if not exists:
+                _create_model(
+                    model=models.QuotaUsage(),
+                    values={'in_use': 0, 'project_id': project_id,
+                            'resource': resource},
+                    session=session)
+    except db_exc.DBDuplicateEntry:
+        pass
+
+    _QUOTA_USAGE_KNOWN.add(key)
+
+
+def _get_model(model, columns=None, **kwargs):
+    """Retrieve information about the given model.
+
+    :param columns: names of the only columns to read, the row is then
+        returned as a dict of them rather than as a model.
+    """
+    query = _projection_query(model=model, columns=columns).filter_by(
+        **kwargs)
     res = query.one()
 
+    if columns:
+        return dict(zip(columns, res))
     return res
 
 
-def _list_model(model, **kwargs):
-    """Retrieve a list of the given model."""
-    query = model_query(model).filter_by(**kwargs)
+def _get_domain_name(session, uuid):
+    """Retrieve the name of the given domain."""
+    res = _get_domain_names(session=session, uuids=[uuid])
+    if uuid not in res:
+        raise exception.DomainNotFound(uuid=uuid)
+
+    return res[uuid]
+
+
+def _get_domain_names(session, uuids):
+    """Map the uuid of each existing domain in uuids to its name.
+
+    The names are read from the domain rows, locked until session ends, so
+    digests computed from them cannot race with a rename.
+    """
+    res = {}
+    for chunk in _chunks(list(uuids), _BULK_CHUNK_SIZE):
+        query = model_query(
+            models.Domain.uuid, models.Domain.name, session=session
+        ).filter(models.Domain.uuid.in_(chunk)).with_lockmode('read')
+        res.update(query.all())
+
+    return res
+
+
+def _get_quota_limits(project_id):
+    # NOTE(pabelanger): Read from the primary database, the result is cached
+    # for quota_limit_cache_ttl and a lagging replica would keep the limits
+    # set_quota() just replaced for that long.
+    query = model_query(
+        models.QuotaClass.resource, models.QuotaClass.hard_limit,
+        sqlalchemy.literal_column('0').label('override')
+    ).filter(models.QuotaClass.class_name == _DEFAULT_QUOTA_NAME)
+
+    if project_id is not None:
+        query = query.union_all(model_query(
+            models.Quota.resource, models.Quota.hard_limit,
+            sqlalchemy.literal_column('1').label('override')
+        ).filter(models.Quota.project_id == project_id))
 
+    res = {}
+    for resource, hard_limit, override in sorted(
+            query.all(), key=lambda r: r[2]):
+        res[resource] = -1 if hard_limit is None else hard_limit
+
+    return res
+
+
+def _get_subscriber_keys(session, domain_ids, usernames):
+    """Return the (username, domain_id) pairs already in use."""
+    res = set()
+    if not domain_ids:
+        return res
+
+    for chunk in _chunks(usernames, _BULK_CHUNK_SIZE):
+        query = model_query(
+            models.Subscriber.username, models.Subscriber.domain_id,
+            session=session).filter(sqlalchemy.and_(
+                models.Subscriber.domain_id.in_(domain_ids),
+                models.Subscriber.username.in_(chunk)))
+        res.update(tuple(r) for r in query.all())
+
+    return res
+
+
+def _list_model(
+        model, limit=None, marker=None, sort_key=None, sort_dir=None,
+        columns=None, **kwargs):
+    """Retrieve a list of the given model.
+
+    :param columns: names of the only columns to read, rows are then
+        returned as dicts of them rather than as models.
+    """
+    query = _paginate_query(
+        model=model, limit=limit, marker=marker, sort_key=sort_key,
+        sort_dir=sort_dir, columns=columns, **kwargs)
+
+    if columns:
+        return [dict(zip(columns, row)) for row in query]
     return query.all()
+
+
+def _move_quota_usage(session, resource, old, new):
+    """Move one unit of usage from project old to project new."""
+    _update_quota_usage(
+        session=session, project_id=old, resource=resource, delta=-1)
+    _update_quota_usage(
+        session=session, project_id=new, resource=resource, delta=1)
+
+
+def _paginate_query(
+        model, limit=None, marker=None, sort_key=None, sort_dir=None,
+        columns=None, **kwargs):
+    """Build a query for a page of the given model.
+
+    Results are ordered by sort_key, with id used as a tie breaker, and
+    start after the row whose uuid is marker.
+    """
+    query = _projection_query(model=model, columns=columns).filter_by(
+        **kwargs)
+
+    if marker is not None:
+        try:
+            marker = _get_model(model=model, uuid=marker, **kwargs)
+        except exc.NoResultFound:
+            raise exception.MarkerNotFound(marker=marker)
+
+    if sort_key is not None and sort_key not in model.__table__.columns:
+        raise exception.InvalidParameterValue(
+            err='Invalid sort key %s' % sort_key)
+
+    sort_keys = [sort_key or 'id']
+    if 'id' not in sort_keys:
+        sort_keys.append('id')
+
+    try:
+        query = db_utils.paginate_query(
+            query, model, limit, sort_keys, marker=marker,
+            sort_dir=sort_dir)
+    except ValueError as e:
+        raise exception.InvalidParameterValue(err=str(e))
+
+    return query
+
+
+def _projection_query(model, columns=None):
+    """Build a query for the given model, or only for some of its columns.
+
+    Selecting columns rather than the model leaves the others out of the
+    SELECT list, and rows are read as tuples rather than models.
+    """
+    if not columns:
+        return model_query(model)
+
+    invalid = [c for c in columns if c not in model.__table__.columns]
+    if invalid:
+        raise exception.InvalidParameterValue(
+            err='Invalid columns %s' % ', '.join(invalid))
+
+    return model_query(*[getattr(model, c) for c in columns])
+
+
+def _refresh_quota_usages(projects):
+    """Recount the quota usages of projects in a single transaction."""
+    drift = []
+    session = get_session()
+    with session.begin():
+        usages = {}
+        query = model_query(
+            models.QuotaUsage, session=session
+        ).filter(models.QuotaUsage.project_id.in_(projects))
+        for row in query.with_lockmode('update').all():
+            usages[(row.project_id, row.resource)] = row
+
+        for model, resource in sorted(
+                _QUOTA_USAGE_RESOURCES.items(), key=lambda x: x[1]):
+            counts = dict(model_query(
+                model.project_id, sqlalchemy.func.count(model.id),
+                session=session
+            ).filter(
+                model.project_id.in_(projects)
+            ).group_by(model.project_id).all())
+
+            for project_id in projects:
+                count = counts.get(project_id, 0)
+                row = usages.get((project_id, resource))
+                if row is None:
+                    if not count:
+                        continue
+                    row = _create_model(
+                        model=models.QuotaUsage(),
+                        values={'in_use': 0, 'project_id': project_id,
+                                'resource': resource},
+                        session=session)
+                if row['in_use'] != count:
+                    drift.append(
+                        (project_id, resource, row['in_use'], count))
+                    row['in_use'] = count
+
+    return drift
+
+
+def _rehash_domain_batch(uuid):
+    """Rehash the next batch of subscribers of a domain.
+
+    :returns: a tuple of True while subscribers are left to rehash, and the
+        uuids of the subscribers rehashed.
+    """
+    session = get_session()
+    with session.begin():
+        try:
+            domain = model_query(
+                models.Domain, session=session).filter_by(uuid=uuid).one()
+        except exc.NoResultFound:
+            raise exception.DomainNotFound(uuid=uuid)
+
+        marker = domain['rehash_marker']
+        if marker is None:
+            return False, []
+
+        rows = model_query(
+            models.Subscriber.id, models.Subscriber.username,
+            models.Subscriber.password, models.Subscriber.uuid,
+            session=session).filter(
+                sqlalchemy.and_(
+                    models.Subscriber.domain_id == uuid,
+                    models.Subscriber.id > marker)).order_by(
+                        models.Subscriber.id).limit(_BULK_CHUNK_SIZE).all()
+
+        params = []
+        for row in rows:
+            ha1, ha1b = _calculate_ha1(
+                username=row.username, domain=domain['name'],
+                password=row.password)
+            params.append({'_id': row.id, 'ha1': ha1, 'ha1b': ha1b})
+
+        if params:
+            table = models.Subscriber.__table__
+            session.execute(
+                table.update().where(
+                    table.c.id == sqlalchemy.bindparam('_id')).values(
+                        ha1=sqlalchemy.bindparam('ha1'),
+                        ha1b=sqlalchemy.bindparam('ha1b')), params)
+
+        next_marker = None
+        if len(rows) == _BULK_CHUNK_SIZE:
+            next_marker = rows[-1].id
+
+        # NOTE(pabelanger): Only move the marker if nobody else did, a rename
+        # in the meantime resets it to 0 and the rehash starts over.
+        count = model_query(models.Domain, session=session).filter_by(
+            uuid=uuid, rehash_marker=marker).update({
+                'rehash_marker': next_marker,
+                'updated_at': domain['updated_at'],
+            }, synchronize_session=False)
+
+    return next_marker is not None or count == 0, [r.uuid for r in rows]
+
+
+def _update_quota_usage(session, project_id, resource, delta):
+    """Add delta to the quota usage of a project, as part of session.
+
+    The increment is done by the database, so concurrent writers never
+    lose an update, and the row lock is held until session commits.
+    """
+    table = models.QuotaUsage.__table__
+    res = session.execute(table.update().where(
+        sqlalchemy.and_(
+            table.c.project_id == project_id,
+            table.c.resource == resource)
+    ).values(
+        in_use=table.c.in_use + delta, updated_at=timeutils.utcnow()))
+
+    if not res.rowcount:
+        # NOTE(pabelanger): The row was removed behind our back, it will be
+        # recreated by refresh_quota_usages().
+        LOG.warn('Quota usage of %s for project %s is missing' % (
+            resource, project_id))
+        _QUOTA_USAGE_KNOWN.discard((project_id, resource))
+
+
+def _release_reservations(*criterion, **kwargs):
+    """Delete the reservations matching criterion, releasing their delta.
+
+    :param session: if present, the session to use, otherwise the
+        reservations are released in a transaction of their own.
+    """
+    session = kwargs.get('session') or get_session()
+    with session.begin(subtransactions=True):
+        query = model_query(
+            models.Reservation, session=session
+        ).filter(*criterion).with_lockmode('update')
+
+        released = collections.defaultdict(int)
+        uuids = []
+        for row in query.all():
+            released[(row.project_id, row.resource)] += row.delta
+            uuids.append(row.uuid)
+
+        for chunk in _chunks(uuids, _BULK_CHUNK_SIZE):
+            model_query(
+                models.Reservation, session=session
+            ).filter(
+                models.Reservation.uuid.in_(chunk)
+            ).delete(synchronize_session=False)
+
+        table = models.QuotaUsage.__table__
+        now = timeutils.utcnow()
+        for (project_id, resource), delta in sorted(released.items()):
+            session.execute(table.update().where(sqlalchemy.and_(
+                table.c.project_id == project_id,
+                table.c.resource == resource)
+            ).values(
+                reserved=table.c.reserved - delta, updated_at=now))
+
+    return len(uuids)
+
+
+def _set_quota_limit(model, hard_limit, **kwargs):
+    """Create or update the row of model matching kwargs."""
+    session = get_session()
+    with session.begin():
+        res = model_query(
+            model, session=session).filter_by(**kwargs).first()
+        if res is None:
+            res = model()
+            res.update(kwargs)
+        res['hard_limit'] = hard_limit
+        res.save(session=session)
+
+
+def _stream_model(model, sort_key=None, sort_dir=None, **kwargs):
+    """Iterate over every row of the given model.
+
+    Rows are fetched from the database in batches of _STREAM_BATCH_SIZE
+    through a server-side cursor, where the driver supports one, so only a
+    single batch is held in memory at a time.
+    """
+    query = _paginate_query(
+        model=model, sort_key=sort_key, sort_dir=sort_dir, **kwargs)
+
+    return query.yield_per(_STREAM_BATCH_SIZE)
@@ -0,0 +1,221 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Verify the query plans of the SQLAlchemy storage backend.
+
+Every function of ripcord.db.sqlalchemy.api is called against the current
+database, the statements it issues are recorded and their query plans
+checked for full table scans.
+"""
+
+import contextlib
+import datetime
+import inspect
+import re
+
+import sqlalchemy
+
+from ripcord.common import exception
+from ripcord.db.sqlalchemy import api
+from ripcord.db.sqlalchemy import models
+from ripcord.openstack.common.db.sqlalchemy import session as db_session
+from ripcord.openstack.common import timeutils
+
+# NOTE(pabelanger): Public functions of the api which never query the
+# database.
+_NO_QUERIES = set([
+    'get_backend',
+    'get_last_write',
+    'get_pool_stats',
+    'get_session',
+    'model_query',
+    'set_client',
+    'start_query_stats',
+    'stop_query_stats',
+    'wrote_recently',
+])
+
+# NOTE(pabelanger): Functions which have to read every row of a table, and
+# why.
+_SCANS_ALLOWED = {
+    'refresh_quota_usages': 'recounts the usages of every project',
+}
+
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+
+class Recorder(object):
+    """Record the statements issued by each function of the api."""
+
+    def __init__(self, engine):
+        self.active = False
+        self.engine = engine
+        self.called = set()
+        self.function = None
+        self.statements = []
+
+    def __call__(self, _function, *args, **kwargs):
+        self.function = _function
+        self.called.add(_function)
+        try:
+            res = getattr(api, _function)(*args, **kwargs)
+            if inspect.isgenerator(res):
+                res = list(res)
+        finally:
+            self.function = None
+
+        return res
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters,
+                               context, executemany):
+        if not self.active or self.function is None:
+            return
+        if executemany:
+            parameters = parameters[0]
+
+        self.statements.append((self.function, statement, parameters))
+
+    @contextlib.contextmanager
+    def recording(self):
+        # NOTE(pabelanger): SQLAlchemy 0.7 cannot remove an engine event
+        # listener, ours stays attached and ignores statements once done.
+        sqlalchemy.event.listen(
+            self.engine, 'before_cursor_execute',
+            self._before_cursor_execute)
+        self.active = True
+        try:
+            yield self
+        finally:
+            self.active = False
+
+
+def _run(call):
+    """Call every function of the api which queries the database."""
+    api._QUOTA_LIMIT_CACHE.clear()
+
+    project_id = 'db-explain'
+    user_id = 'db-explain'
+
+    call('set_quota_class', class_name='default', resource='domains',
+         hard_limit=10)
+    call('set_quota', project_id=project_id, resource='domains',
+         hard_limit=10)
+    call('get_quota_limits', project_id=project_id)
+    call('get_default_quota_class')
+
+    domain = call(
+        'create_domain', name='db-explain.example.org',
+        project_id=project_id, user_id=user_id)
+    call('get_domain', uuid=domain['uuid'])
+    call('list_domains', project_id=project_id, limit=1,
+         marker=domain['uuid'])
+    call('stream_domains', project_id=project_id)
+
+    subscriber = call(
+        'create_subscriber', username='alice', domain_id=domain['uuid'],
+        password='foobar', user_id=user_id, project_id=project_id)
+    call('create_subscribers', subscribers=[{
+        'domain_id': domain['uuid'], 'password': 'foobar',
+        'username': 'bob'}], user_id=user_id, project_id=project_id)
+    call('get_subscriber', uuid=subscriber['uuid'])
+    call('list_subscribers', project_id=project_id, limit=1,
+         marker=subscriber['uuid'])
+    call('stream_subscribers', project_id=project_id)
+    call('update_subscriber', uuid=subscriber['uuid'], password='barfoo')
+
+    call('update_domain', uuid=domain['uuid'],
+         name='db-explain.example.net')
+    call('list_domains_rehash_pending')
+    call('rehash_domain', uuid=domain['uuid'])
+    call('get_domain_rehash', uuid=domain['uuid'])
+
+    expire = timeutils.utcnow() + datetime.timedelta(seconds=60)
+    reservations = call(
+        'reserve_quotas', project_id=project_id, deltas={'subscribers': 1},
+        limits={'subscribers': 10}, expire=expire)
+    call('commit_reservations', uuids=reservations)
+    reservations = call(
+        'reserve_quotas', project_id=project_id, deltas={'subscribers': 1},
+        limits={'subscribers': 10}, expire=expire)
+    call('rollback_reservations', uuids=reservations)
+    call('expire_reservations')
+
+    call('get_quota_usages', project_id=project_id)
+    call('refresh_quota_usages', project_id=project_id)
+    call('refresh_quota_usages')
+
+    for s in call('list_subscribers', project_id=project_id):
+        call('delete_subscriber', uuid=s['uuid'])
+    call('delete_domain', uuid=domain['uuid'])
+
+
+def _get_functions():
+    return set(
+        name for name, f in inspect.getmembers(api, inspect.isfunction)
+        if f.__module__ == api.__name__ and not name.startswith('_'))
+
+
+def _get_scans(conn, statement, parameters):
+    tables = models.Base.metadata.tables
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+
+    for row in rows.fetchall():
+        detail = list(row)[-1]
+        match = _SCAN.match(detail)
+        if match and match.group(1) in tables:
+            yield detail
+
+
+def verify():
+    """Look for full table scans in the statements of the api.
+
+    Must be run against a SQLite database whose content may be changed,
+    rows created are deleted again.
+
+    :returns: a tuple of the functions of the api which were not called
+        and a list of (function, statement, plan) tuples, one for every
+        full table scan.
+    :raises: RipcordException if the database is not SQLite.
+    """
+    engine = db_session.get_engine()
+    if engine.name != 'sqlite':
+        raise exception.RipcordException(
+            'Query plans can only be verified with SQLite, not %s' %
+            engine.name)
+
+    with Recorder(engine).recording() as recorder:
+        _run(recorder)
+
+    missing = _get_functions() - _NO_QUERIES - recorder.called
+
+    scans = []
+    seen = set()
+    conn = engine.connect()
+    try:
+        for function, statement, parameters in recorder.statements:
+            if function in _SCANS_ALLOWED or statement in seen:
+                continue
+            seen.add(statement)
+            if not statement.lstrip().upper().startswith(
+                    ('SELECT', 'UPDATE', 'DELETE')):
+                continue
+
+            for plan in _get_scans(conn, statement, parameters):
+                scans.append((function, statement, plan))
+    finally:
+        conn.close()
+
+    return sorted(missing), scans
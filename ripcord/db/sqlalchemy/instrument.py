@@ -0,0 +1,241 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Instrumentation of the statements issued through SQLAlchemy engines."""
+
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from oslo.config import cfg
+from sqlalchemy.engine import base
+from sqlalchemy import event
+from sqlalchemy import exc
+
+from ripcord.common import utils
+from ripcord.openstack.common import local
+from ripcord.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+slow_query_opts = [
+    cfg.IntOpt('slow_query_threshold',
+               default=1000,
+               help=('Statements taking longer than this number of '
+                     'milliseconds are logged, 0 disables the slow query '
+                     'log.')),
+    cfg.FloatOpt('slow_query_stack_rate',
+                 default=0.1,
+                 help=('Fraction, from 0 to 1, of the slow statements logged '
+                       'along with the stack which issued them.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(slow_query_opts, group='database')
+
+# NOTE(pabelanger): Upper bounds, in seconds, of the checkout time buckets.
+_CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+_LOCAL = threading.local()
+_POOL_LOCK = threading.Lock()
+_POOL_STATS = {}
+_WATCHED_POOLS = weakref.WeakKeyDictionary()
+
+
+class QueryStats(object):
+    """Statements executed, and the time spent in them, while recording."""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+        self.statements = []
+
+
+class PoolStats(object):
+    """Checkouts, checkout timeouts and checkout time of a pool.
+
+    The counters outlive the pool, engine.dispose() replaces it with a new
+    one which keeps adding to them.
+    """
+
+    def __init__(self):
+        self.checkout_time = utils.Histogram(_CHECKOUT_BUCKETS)
+        self.checkouts = 0
+        self.pool = None
+        self.timeouts = 0
+
+    def stats(self):
+        pool = self.pool and self.pool()
+        res = {
+            'checkout_time': self.checkout_time.stats(),
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+        }
+
+        # NOTE(pabelanger): Only QueuePool tracks its occupancy, the pools
+        # used for SQLite do not.
+        for key, gauge in (('checked_in', 'checkedin'),
+                           ('checked_out', 'checkedout'),
+                           ('overflow', 'overflow'),
+                           ('size', 'size')):
+            func = getattr(pool, gauge, None)
+            res[key] = func() if func else None
+
+        return res
+
+
+def get_pool_stats():
+    """Retrieve the statistics of the pools watched, by name."""
+    return dict((name, stats.stats()) for name, stats in _POOL_STATS.items())
+
+
+def watch_pool(pool, name):
+    """Record the checkouts of a connection pool under the given name."""
+    if pool in _WATCHED_POOLS:
+        return
+
+    with _POOL_LOCK:
+        if pool in _WATCHED_POOLS:
+            return
+        stats = _POOL_STATS.setdefault(name, PoolStats())
+        stats.pool = weakref.ref(pool)
+        connect = pool.connect
+
+        # NOTE(pabelanger): SQLAlchemy has no event fired before a checkout,
+        # so the time spent waiting on the pool is measured around connect().
+        def _connect():
+            started = time.time()
+            try:
+                return connect()
+            except exc.TimeoutError:
+                stats.timeouts += 1
+                raise
+            finally:
+                stats.checkouts += 1
+                stats.checkout_time.observe(time.time() - started)
+
+        pool.connect = _connect
+        _WATCHED_POOLS[pool] = stats
+
+
+def start():
+    """Start recording the statements executed by the current thread.
+
+    Recordings nest, a statement is counted by every recording in progress.
+    """
+    stats = QueryStats()
+    _LOCAL.__dict__.setdefault('stats', []).append(stats)
+
+    return stats
+
+
+def stop(stats):
+    """Stop the recording started by start()."""
+    recording = getattr(_LOCAL, 'stats', [])
+    if stats in recording:
+        recording.remove(stats)
+
+    return stats
+
+
+def _api_function():
+    """Return the name of the outermost api function on the stack."""
+    name = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code.co_name
+        if (frame.f_globals.get('__name__') == 'ripcord.db.sqlalchemy.api'
+                and not code.startswith('_') and code != 'wrapper'):
+            name = code
+        frame = frame.f_back
+
+    return name
+
+
+def _format_stack():
+    """Format the stack of the caller, leaving SQLAlchemy frames out."""
+    here = os.path.splitext(__file__)[0]
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if os.path.splitext(frame[0])[0] != here and
+        '%ssqlalchemy%s' % (os.sep, os.sep) not in frame[0]]
+
+    return ''.join(traceback.format_list(frames))
+
+
+def _log_slow_query(statement, parameters, executemany, elapsed):
+    context = getattr(local.store, 'context', None)
+    msg = ('Slow query, %(duration).1fms in %(function)s for request '
+           '%(request_id)s: %(statement)s parameters: %(parameters)s' % {
+               'duration': elapsed * 1000,
+               'function': _api_function() or '-',
+               'parameters': _parameter_shape(parameters, executemany),
+               'request_id': getattr(context, 'request_id', None) or '-',
+               'statement': ' '.join(statement.split())})
+
+    if random.random() < CONF.database.slow_query_stack_rate:
+        msg += '\n' + _format_stack()
+    LOG.warn(msg)
+
+
+def _parameter_shape(parameters, executemany):
+    """Describe bound parameters by their types, leaving values out."""
+    if executemany:
+        if not parameters:
+            return '[]'
+        return '%d x %s' % (
+            len(parameters), _parameter_shape(parameters[0], False))
+
+    if isinstance(parameters, dict):
+        return '{%s}' % ', '.join(
+            '%s: %s' % (key, type(value).__name__)
+            for key, value in sorted(parameters.items()))
+
+    return '(%s)' % ', '.join(
+        type(value).__name__ for value in parameters or ())
+
+
+def _before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_start'] = time.time()
+
+
+def _after_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_start', None)
+    if started is None:
+        return
+
+    elapsed = time.time() - started
+    for stats in getattr(_LOCAL, 'stats', ()):
+        stats.count += 1
+        stats.elapsed += elapsed
+        stats.statements.append(statement)
+
+    threshold = CONF.database.slow_query_threshold
+    if threshold > 0 and elapsed * 1000 >= threshold:
+        _log_slow_query(statement, parameters, executemany, elapsed)
+
+
+# NOTE(pabelanger): Listening on the Engine class, rather than on an
+# instance, covers every engine session.create_engine() builds, including the
+# ones created again after session.cleanup().
+event.listen(base.Engine, 'before_cursor_execute', _before_cursor_execute)
+event.listen(base.Engine, 'after_cursor_execute', _after_cursor_execute)
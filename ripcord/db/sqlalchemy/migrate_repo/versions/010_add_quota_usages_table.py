@@ -0,0 +1,84 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import func
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import select
+from sqlalchemy import String
+from sqlalchemy import Table
+from sqlalchemy import UniqueConstraint
+
+from ripcord.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+RESOURCES = {
+    'domains': 'domains',
+    'subscribers': 'subscribers',
+}
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    quota_usage = Table(
+        'quota_usages', meta,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('created_at', DateTime),
+        Column('in_use', Integer, nullable=False),
+        Column('project_id', String(length=255)),
+        Column('resource', String(length=255), nullable=False),
+        Column('updated_at', DateTime),
+        UniqueConstraint(
+            'project_id', 'resource',
+            name='uniq_quota_usages0project_id0resource'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8',
+    )
+
+    try:
+        quota_usage.create()
+    except Exception as e:
+        LOG.exception(e)
+        meta.drop_all(tables=[quota_usage])
+        raise
+
+    # NOTE(pabelanger): Seed the usages from the rows already in place.
+    now = datetime.datetime.utcnow()
+    for resource, table_name in RESOURCES.items():
+        table = Table(table_name, meta, autoload=True)
+        rows = select(
+            [table.c.project_id, func.count(table.c.id)]
+        ).group_by(table.c.project_id).execute().fetchall()
+
+        for project_id, count in rows:
+            quota_usage.insert().execute(
+                created_at=now, in_use=count, project_id=project_id,
+                resource=resource)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    quota_usage = Table('quota_usages', meta, autoload=True)
+    quota_usage.drop()
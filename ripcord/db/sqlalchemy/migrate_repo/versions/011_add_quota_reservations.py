@@ -0,0 +1,79 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import String
+from sqlalchemy import Table
+from sqlalchemy import UniqueConstraint
+
+from ripcord.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    quota_usage = Table('quota_usages', meta, autoload=True)
+    reserved = Column(
+        'reserved', Integer, nullable=False, default=0, server_default='0')
+    quota_usage.create_column(reserved)
+
+    reservation = Table(
+        'reservations', meta,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('created_at', DateTime),
+        Column('delta', Integer, nullable=False),
+        Column('expire', DateTime, nullable=False),
+        Column('project_id', String(length=255)),
+        Column('resource', String(length=255), nullable=False),
+        Column('updated_at', DateTime),
+        Column('uuid', String(length=36), nullable=False),
+        Index('reservations_uuid_idx', 'uuid', unique=True),
+        Index('reservations_project_id_expire_idx', 'project_id', 'expire'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8',
+    )
+
+    try:
+        reservation.create()
+    except Exception as e:
+        LOG.exception(e)
+        meta.drop_all(tables=[reservation])
+        raise
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    reservation = Table('reservations', meta, autoload=True)
+    reservation.drop()
+
+    # NOTE(pabelanger): We need to setup our UniqueConstraint again, otherwise
+    # autoload=True doesn't seem to pick it up.
+    quota_usage = Table(
+        'quota_usages', meta,
+        UniqueConstraint(
+            'project_id', 'resource',
+            name='uniq_quota_usages0project_id0resource'),
+        autoload=True)
+    quota_usage.drop_column('reserved')
@@ -0,0 +1,61 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from sqlalchemy import Index
+from sqlalchemy import MetaData
+from sqlalchemy import Table
+
+from ripcord.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+INDEXES = [
+    ('domains', 'domains_project_id_id_idx', ['project_id', 'id']),
+    ('domains', 'domains_rehash_marker_idx', ['rehash_marker']),
+    ('quota_classes', 'quota_classes_class_name_resource_idx',
+     ['class_name', 'resource']),
+    ('reservations', 'reservations_expire_idx', ['expire']),
+    ('subscribers', 'subscribers_domain_id_id_idx', ['domain_id', 'id']),
+    ('subscribers', 'subscribers_project_id_id_idx', ['project_id', 'id']),
+]
+
+UNIQUE_INDEXES = [
+    ('subscribers', 'subscribers_uuid_idx', ['uuid']),
+]
+
+
+def _get_indexes(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    tables = {}
+    for indexes, unique in [(INDEXES, False), (UNIQUE_INDEXES, True)]:
+        for table_name, name, columns in indexes:
+            if table_name not in tables:
+                tables[table_name] = Table(table_name, meta, autoload=True)
+            table = tables[table_name]
+
+            yield Index(name, *[table.c[c] for c in columns], unique=unique)
+
+
+def upgrade(migrate_engine):
+    for index in _get_indexes(migrate_engine):
+        index.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    for index in _get_indexes(migrate_engine):
+        index.drop(migrate_engine)
@@ -16,6 +16,7 @@
 
 from sqlalchemy import Boolean
 from sqlalchemy import Column
+from sqlalchemy import DateTime
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import ForeignKey
 from sqlalchemy import Integer
@@ -36,6 +37,8 @@ Base = declarative_base(cls=RipcordBase)
 class Domain(Base):
     __tablename__ = 'domains'
     __table_args__ = (
+        schema.Index('domains_project_id_id_idx', 'project_id', 'id'),
+        schema.Index('domains_rehash_marker_idx', 'rehash_marker'),
         schema.Index('uuid', 'uuid', unique=True),
         schema.UniqueConstraint('name', name='uniq_domain0name'))
 
@@ -43,6 +46,7 @@ class Domain(Base):
     disabled = Column(Boolean, default=False)
     name = Column(String(64), nullable=False, default='')
     project_id = Column(String(255))
+    rehash_marker = Column(Integer)
     user_id = Column(String(255))
     uuid = Column(String(255))
 
@@ -78,6 +82,10 @@ class QuotaClass(Base):
     """
 
     __tablename__ = 'quota_classes'
+    __table_args__ = (
+        schema.Index(
+            'quota_classes_class_name_resource_idx', 'class_name',
+            'resource'),)
 
     id = Column(Integer, primary_key=True)
     class_name = Column(String(255))
@@ -85,9 +93,54 @@ class QuotaClass(Base):
     resource = Column(String(255))
 
 
+class QuotaUsage(Base):
+    """Represents the current usage of a resource by a project.
+
+    Kept up to date in the same transaction as the rows it counts, so a
+    quota check reads a single row rather than counting the table.
+    """
+
+    __tablename__ = 'quota_usages'
+    __table_args__ = (
+        schema.UniqueConstraint(
+            'project_id', 'resource',
+            name='uniq_quota_usages0project_id0resource'),)
+
+    id = Column(Integer, primary_key=True)
+    in_use = Column(Integer, nullable=False, default=0)
+    project_id = Column(String(255))
+    reserved = Column(Integer, nullable=False, default=0)
+    resource = Column(String(255), nullable=False)
+
+
+class Reservation(Base):
+    """Represents a resource reserved by a request, until it expires.
+
+    The delta is counted in the reserved column of the matching quota usage
+    until the reservation is committed, rolled back or expires.
+    """
+
+    __tablename__ = 'reservations'
+    __table_args__ = (
+        schema.Index('reservations_expire_idx', 'expire'),
+        schema.Index(
+            'reservations_project_id_expire_idx', 'project_id', 'expire'),
+        schema.Index('reservations_uuid_idx', 'uuid', unique=True))
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    delta = Column(Integer, nullable=False)
+    expire = Column(DateTime, nullable=False)
+    project_id = Column(String(255))
+    resource = Column(String(255), nullable=False)
+    uuid = Column(String(36), nullable=False)
+
+
 class Subscriber(Base):
     __tablename__ = 'subscribers'
     __table_args__ = (
+        schema.Index('subscribers_domain_id_id_idx', 'domain_id', 'id'),
+        schema.Index('subscribers_project_id_id_idx', 'project_id', 'id'),
+        schema.Index('subscribers_uuid_idx', 'uuid', unique=True),
         schema.UniqueConstraint(
             'username', 'domain_id',
             name='uniq_subscriber0username0domain_id'),)
@@ -104,4 +157,4 @@ class Subscriber(Base):
     rpid = Column(String(64))
     user_id = Column(String(255))
     username = Column(String(64), nullable=False, default='')
-    uuid = Column(String(255), unique=True)
+    uuid = Column(String(255))
@@ -19,12 +19,15 @@
 
 """Quotas for ripcord."""
 
+import datetime
+
 from oslo.config import cfg
 
 from ripcord.common import exception
 from ripcord.db import api as db_api
 from ripcord.openstack.common import importutils
 from ripcord.openstack.common import log as logging
+from ripcord.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
 
@@ -38,6 +41,9 @@ quota_opts = [
     cfg.StrOpt(
         'quota_driver', default='ripcord.quota.DbQuotaDriver',
         help='Default driver to use for quota checks'),
+    cfg.IntOpt(
+        'reservation_expire', default=300,
+        help='Number of seconds until a reservation expires'),
 ]
 
 CONF = cfg.CONF
@@ -59,14 +65,128 @@ class DbQuotaDriver(object):
         :param resources: A dictionary of the registered resources.
         """
 
+        return self._get_quotas(resources, db_api.get_quota_limits())
+
+    def get_project_quotas(self, resources, project_id):
+        """Given a list of resources, retrieve the quotas for a project.
+
+        Project overrides take precedence over the default quota class,
+        which takes precedence over the configuration options.
+
+        :param resources: A dictionary of the registered resources.
+        :param project_id: The ID of the project to return quotas for.
+        """
+
+        return self._get_quotas(
+            resources, db_api.get_quota_limits(project_id=project_id))
+
+    def _get_quotas(self, resources, limits):
         quotas = {}
-        default_quotas = db_api.get_default_quota_class()
         for resource in resources.values():
-            quotas[resource.name] = default_quotas.get(
+            quotas[resource.name] = limits.get(
                 resource.name, resource.default)
 
         return quotas
 
+    def limit_check(self, resources, values, project_id=None, user_id=None):
+        """Check simple quota limits.
+
+        :param resources: A dictionary of the registered resources.
+        :param values: A dictionary of the values to check against the
+                       quota.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        :param user_id: Specify the user_id if current context
+                        is admin and admin wants to impact on
+                        common user.
+        """
+        unknown = [key for key in values if key not in resources]
+        if unknown:
+            raise exception.QuotaResourceUnknown(unknown=sorted(unknown))
+
+        if project_id is None:
+            quotas = self.get_defaults(resources)
+        else:
+            quotas = self.get_project_quotas(resources, project_id)
+        overs = [key for key, val in values.items()
+                 if quotas[key] >= 0 and val > quotas[key]]
+        if overs:
+            raise exception.OverQuota(overs=sorted(overs))
+
+    def commit(self, reservations, project_id=None):
+        """Commit reservations.
+
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+        db_api.commit_reservations(uuids=reservations)
+
+    def expire(self):
+        """Expire reservations.
+
+        Explores all currently existing reservations and rolls back
+        any that have expired.
+        """
+        return db_api.expire_reservations()
+
+    def reserve(self, resources, deltas, expire=None, project_id=None):
+        """Check quotas and reserve resources.
+
+        The deltas are reserved atomically against the project's quota
+        usages. If any of them would take the project over quota, an
+        OverQuota exception is raised and nothing is reserved.
+
+        :param resources: A dictionary of the registered resources.
+        :param deltas: A dictionary of the proposed delta changes.
+        :param expire: An optional parameter specifying an expiration
+                       time for the reservations.  If it is a simple
+                       number, it is interpreted as a number of
+                       seconds and added to the current time; if it is
+                       a datetime.timedelta object, it will also be
+                       added to the current time.  A datetime.datetime
+                       object will be interpreted as the absolute
+                       expiration time.  If None is specified, the
+                       default expiration time set by
+                       reservation_expire will be used.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+        if expire is None:
+            expire = CONF.quotas.reservation_expire
+        if isinstance(expire, (int, long)):
+            expire = datetime.timedelta(seconds=expire)
+        if isinstance(expire, datetime.timedelta):
+            expire = timeutils.utcnow() + expire
+        if not isinstance(expire, datetime.datetime):
+            raise exception.InvalidParameterValue(
+                err='Invalid reservation expiration %s' % expire)
+
+        unknown = [key for key in deltas if key not in resources]
+        if unknown:
+            raise exception.QuotaResourceUnknown(unknown=sorted(unknown))
+
+        quotas = self.get_project_quotas(resources, project_id)
+
+        return db_api.reserve_quotas(
+            project_id=project_id, deltas=deltas, limits=quotas,
+            expire=expire)
+
+    def rollback(self, reservations, project_id=None):
+        """Roll back reservations.
+
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+        db_api.rollback_reservations(uuids=reservations)
+
 
 class NoopQuotaDriver(object):
     """Noop quota driver.
@@ -87,6 +207,51 @@ class NoopQuotaDriver(object):
             quotas[resource.name] = -1
         return quotas
 
+    def get_project_quotas(self, resources, project_id):
+        """Given a list of resources, retrieve the quotas for a project.
+
+        :param resources: A dictionary of the registered resources.
+        :param project_id: The ID of the project to return quotas for.
+        """
+        return self.get_defaults(resources)
+
+    def limit_check(self, resources, values, project_id=None, user_id=None):
+        """Check simple quota limits.
+
+        :param resources: A dictionary of the registered resources.
+        :param values: A dictionary of the values to check against the
+                       quota.
+        """
+        pass
+
+    def commit(self, reservations, project_id=None):
+        """Commit reservations.
+
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        """
+        pass
+
+    def expire(self):
+        """Expire reservations."""
+        pass
+
+    def reserve(self, resources, deltas, expire=None, project_id=None):
+        """Check quotas and reserve resources.
+
+        :param resources: A dictionary of the registered resources.
+        :param deltas: A dictionary of the proposed delta changes.
+        """
+        return []
+
+    def rollback(self, reservations, project_id=None):
+        """Roll back reservations.
+
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        """
+        pass
+
 
 class BaseResource(object):
     """Describe a single resource for quota checking."""
@@ -161,6 +326,23 @@ class QuotaEngine(object):
 
         return self.__driver
 
+    def commit(self, reservations, project_id=None):
+        """Commit reservations.
+
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+
+        try:
+            self._driver.commit(reservations, project_id=project_id)
+        except Exception:
+            # NOTE(pabelanger): The resources have been created, a failure
+            # here only leaves the reservations to expire.
+            LOG.exception('Failed to commit reservations %s' % reservations)
+
     def count(self, resource, *args, **kwargs):
         """Count a resource.
 
@@ -178,11 +360,28 @@ class QuotaEngine(object):
 
         return res.count(*args, **kwargs)
 
+    def expire(self):
+        """Expire reservations.
+
+        Explores all currently existing reservations and rolls back
+        any that have expired.
+        """
+
+        return self._driver.expire()
+
     def get_defaults(self):
         """Retrieve the default quotas."""
 
         return self._driver.get_defaults(self._resources)
 
+    def get_project_quotas(self, project_id):
+        """Retrieve the quotas for the given project.
+
+        :param project_id: The ID of the project to return quotas for.
+        """
+
+        return self._driver.get_project_quotas(self._resources, project_id)
+
     def limit_check(self, project_id=None, user_id=None, **values):
         """Check simple quota limits.
 
@@ -224,19 +423,81 @@ class QuotaEngine(object):
         for resource in resources:
             self.register_resource(resource)
 
+    def reserve(self, expire=None, project_id=None, **deltas):
+        """Check quotas and reserve resources.
+
+        For counting quotas--those quotas for which there is a usage
+        synchronization function--this method checks quotas against
+        current usage and the desired deltas.  The deltas are given as
+        keyword arguments, and current usage and other reservations
+        are factored into the quota check.
+
+        This method will raise a QuotaResourceUnknown exception if a
+        given resource is unknown.
+
+        If any of the proposed values is over the defined quota, an
+        OverQuota exception will be raised with the sorted list of the
+        resources which are too high.  Otherwise, the method returns a
+        list of reservation UUIDs which were created.
+
+        :param expire: An optional parameter specifying an expiration
+                       time for the reservations, see
+                       DbQuotaDriver.reserve().
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+
+        reservations = self._driver.reserve(
+            self._resources, deltas, expire=expire, project_id=project_id)
+
+        LOG.debug('Created reservations %s' % reservations)
+
+        return reservations
+
+    def rollback(self, reservations, project_id=None):
+        """Roll back reservations.
+
+        :param reservations: A list of the reservation UUIDs, as
+                             returned by the reserve() method.
+        :param project_id: Specify the project_id if current context
+                           is admin and admin wants to impact on
+                           common user's tenant.
+        """
+
+        try:
+            self._driver.rollback(reservations, project_id=project_id)
+        except Exception:
+            # NOTE(pabelanger): Nothing was created, a failure here only
+            # leaves the reservations to expire.
+            LOG.exception(
+                'Failed to roll back reservations %s' % reservations)
+
     @property
     def resources(self):
         return sorted(self._resources.keys())
 
 
+def _count_usage(resource):
+    """Return a function counting the given resource of a project.
+
+    Counts are read from the quota_usages table, which is kept up to date
+    as rows are created and deleted, rather than counting the rows.
+    """
+    def _count(project_id):
+        return db_api.get_quota_usages(project_id=project_id).get(resource, 0)
+
+    return _count
+
+
 QUOTAS = QuotaEngine()
 
 
 resources = [
     CountableResource(
-        'domains', 'foo', 'quota_domains'),
+        'domains', _count_usage('domains'), 'quota_domains'),
     CountableResource(
-        'subscribers', 'foo', 'quota_subscribers'),
+        'subscribers', _count_usage('subscribers'), 'quota_subscribers'),
 ]
 
 
@@ -27,7 +27,9 @@ import stubout
 import testtools
 
 from ripcord.common import paths
+from ripcord.db import cache as db_cache
 from ripcord.db import migration
+from ripcord.db.sqlalchemy import api as sqlalchemy_api
 from ripcord.openstack.common.db.sqlalchemy import session
 from ripcord.openstack.common import log as logging
 from ripcord.tests import conf_fixture
@@ -81,6 +83,11 @@ class Database(fixtures.Fixture):
 
     def setUp(self):
         super(Database, self).setUp()
+        # NOTE(pabelanger): Cached quota limits and quota usage rows would
+        # outlive the database they were read from.
+        sqlalchemy_api._QUOTA_LIMIT_CACHE.clear()
+        db_cache.reset()
+        sqlalchemy_api._QUOTA_USAGE_KNOWN.clear()
 
         if self.sql_connection == "sqlite://":
             conn = self.engine.connect()
@@ -98,6 +105,8 @@ class MoxStubout(fixtures.Fixture):
         super(MoxStubout, self).setUp()
 
         self.stubs = stubout.StubOutForTesting()
+        self.addCleanup(self.stubs.UnsetAll)
+        self.addCleanup(self.stubs.SmartUnsetAll)
 
 
 class TestCase(testtools.TestCase):
@@ -0,0 +1,102 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ripcord.api import profiler
+from ripcord.tests.api.v1 import base
+
+
+class TestCase(base.FunctionalTest):
+
+    PATH_PREFIX = '/admin'
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.app.get('/v1/domains', headers=self.auth_headers)
+        self.admin_headers = dict(self.auth_headers, **{'X-Roles': 'admin'})
+
+    def test_pool(self):
+        res = self.get_json(
+            '/pool', headers=self.admin_headers,
+            extra_environ={'REMOTE_ADDR': '127.0.0.1'})
+
+        self.assertIn('main', res)
+        self.assertIn('checkout_time', res['main'])
+        self.assertIn('timeouts', res['main'])
+
+    def test_pool_remote(self):
+        res = self.get_json(
+            '/pool', expect_errors=True, headers=self.admin_headers,
+            extra_environ={'REMOTE_ADDR': '192.0.2.10'})
+        self.assertEqual(res.status_int, 403)
+
+    def test_pool_not_admin(self):
+        member = dict(self.auth_headers, **{'X-Roles': 'member'})
+        for headers in [self.auth_headers, member]:
+            res = self.get_json(
+                '/pool', expect_errors=True, headers=headers,
+                extra_environ={'REMOTE_ADDR': '127.0.0.1'})
+            self.assertEqual(res.status_int, 403)
+
+    def test_pool_ipv6(self):
+        res = self.get_json(
+            '/pool', headers=self.admin_headers,
+            extra_environ={'REMOTE_ADDR': '::1'})
+        self.assertIn('main', res)
+
+    def test_requests(self):
+        res = self.get_json(
+            '/requests', headers=self.admin_headers,
+            extra_environ={'REMOTE_ADDR': '127.0.0.1'})
+
+        self.assertEqual(len(res), 1)
+        self.assertEqual(res[0]['path'], '/admin/requests')
+        self.assertEqual(res[0]['route'], 'AdminController.requests')
+        self.assertEqual(res[0]['stage'], 'controller')
+        self.assertTrue(res[0]['request_id'].startswith('req-'))
+        self.assertIn('in requests', res[0]['stack'])
+
+    def test_requests_not_admin(self):
+        res = self.get_json(
+            '/requests', expect_errors=True, headers=self.auth_headers,
+            extra_environ={'REMOTE_ADDR': '127.0.0.1'})
+        self.assertEqual(res.status_int, 403)
+
+    def test_stacks(self):
+        sampler = profiler.SamplingProfiler(0.01, 100)
+        sampler.stacks['a;b'] = 3
+        self.stubs.Set(profiler, 'SAMPLER', sampler)
+
+        res = self.app.get(
+            '/admin/stacks', headers=self.admin_headers,
+            extra_environ={'REMOTE_ADDR': '127.0.0.1'})
+        self.assertEqual(res.body, 'a;b 3\n')
+
+    def test_stacks_not_admin(self):
+        self.stubs.Set(profiler, 'SAMPLER', profiler.SamplingProfiler(
+            0.01, 100))
+
+        res = self.app.get(
+            '/admin/stacks', expect_errors=True, headers=self.auth_headers,
+            extra_environ={'REMOTE_ADDR': '127.0.0.1'})
+        self.assertEqual(res.status_int, 403)
+
+    def test_stacks_not_running(self):
+        self.stubs.Set(profiler, 'SAMPLER', None)
+
+        res = self.app.get(
+            '/admin/stacks', expect_errors=True, headers=self.admin_headers,
+            extra_environ={'REMOTE_ADDR': '127.0.0.1'})
+        self.assertEqual(res.status_int, 404)
@@ -17,9 +17,13 @@
 
 import socket
 
+import mock
 from oslo.config import cfg
 
 from ripcord.api import app
+from ripcord.api import inflight
+from ripcord.api import profiler
+from ripcord.common import exception
 from ripcord.openstack.common.fixture import config
 from ripcord import test
 
@@ -41,3 +45,69 @@ class TestCase(test.TestCase):
         self.CONF.set_override('host', 'ddddd', group='api')
         server_cls = app.get_server_cls(cfg.CONF.api.host)
         self.assertEqual(server_cls.address_family, socket.AF_INET)
+
+    def test_wsgi_service_workers(self):
+        self.CONF.set_override('workers', 4, group='api')
+        self.stubs.Set(app, 'build_server', mock.Mock())
+        srv = app.WSGIService()
+
+        self.assertEqual(srv.workers, 4)
+        self.assertEqual(srv.server, app.build_server.return_value)
+
+    def test_wsgi_service_invalid_workers(self):
+        self.CONF.set_override('workers', 0, group='api')
+        self.assertRaises(exception.ConfigInvalid, app.WSGIService)
+
+    def test_wsgi_service_start(self):
+        self.CONF.set_override('slow_request_deadline', 0, group='api')
+        self.stubs.Set(app, 'build_server', mock.Mock())
+        self.stubs.Set(profiler, 'start_sampling', mock.Mock(
+            return_value=None))
+        srv = app.WSGIService()
+        srv.tg = mock.Mock()
+        srv.start()
+
+        srv.tg.add_thread.assert_called_once_with(srv.server.serve_forever)
+        self.assertFalse(srv.tg.add_timer.called)
+
+    def test_wsgi_service_start_sampling(self):
+        self.CONF.set_override(
+            'sampling_profiler_write_interval', 60, group='api')
+        self.CONF.set_override('slow_request_deadline', 0, group='api')
+        self.stubs.Set(app, 'build_server', mock.Mock())
+        self.stubs.Set(profiler, 'start_sampling', mock.Mock())
+        srv = app.WSGIService()
+        srv.tg = mock.Mock()
+        srv.start()
+
+        profiler.start_sampling.assert_called_once_with()
+        srv.tg.add_timer.assert_called_once_with(60, profiler.write_samples)
+
+    def test_wsgi_service_start_watchdog(self):
+        self.stubs.Set(app, 'build_server', mock.Mock())
+        self.stubs.Set(profiler, 'start_sampling', mock.Mock(
+            return_value=None))
+        srv = app.WSGIService()
+        srv.tg = mock.Mock()
+        srv.start()
+
+        srv.tg.add_timer.assert_called_once_with(
+            10, inflight.check_requests)
+
+    def test_build_server_eventlet(self):
+        self.CONF.set_override('host', '127.0.0.1', group='api')
+        self.CONF.set_override('port', 0, group='api')
+        self.CONF.set_override('server', 'eventlet', group='api')
+        self.CONF.set_override('eventlet_pool_size', 8, group='api')
+        self.stubs.Set(app, 'load_app', mock.Mock())
+        srv = app.build_server()
+        self.addCleanup(srv.socket.close)
+
+        self.assertTrue(isinstance(srv, app.EventletServer))
+        self.assertEqual(srv.app, app.load_app.return_value)
+        self.assertEqual(srv.pool.size, 8)
+
+    def test_build_server_invalid(self):
+        self.CONF.set_override('server', 'foo', group='api')
+        self.stubs.Set(app, 'load_app', mock.Mock())
+        self.assertRaises(exception.ConfigInvalid, app.build_server)
@@ -0,0 +1,94 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import webob
+
+from ripcord.api import hooks
+from ripcord.tests.api.v1 import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.flags(entity_cache_backend='none', group='database')
+
+    def _create_domain(self, name='example.org'):
+        return self.post_json(
+            '/domains', params={'name': name}, status=200,
+            headers=self.auth_headers)
+
+    def test_query_stats_headers(self):
+        domain = self._create_domain()
+        res = self.app.get(
+            '/v1/domains/%s' % domain.json['uuid'], headers=self.auth_headers)
+
+        self.assertEqual(res.headers['X-DB-Queries'], '1')
+        self.assertTrue(
+            res.headers['Server-Timing'].endswith(';desc="1 queries"'))
+        self.assertIn('queries=1 ', self.log_fixture.output)
+        self.assertNotIn('db_queries', self.log_fixture.output)
+
+    def test_query_stats_headers_error(self):
+        res = self.app.get(
+            '/v1/domains/0eda016a-b078-4bef-94ba-1ab10fe15a7d',
+            headers=self.auth_headers, expect_errors=True)
+
+        self.assertEqual(res.status_int, 404)
+        self.assertEqual(res.headers['X-DB-Queries'], '1')
+
+    def test_get_all_query_count(self):
+        self.flags(quota_domains=-1, group='quotas')
+        for name in ('example.org', 'example.net', 'example.com'):
+            self._create_domain(name=name)
+
+        # NOTE(pabelanger): Listing must not issue a query per domain.
+        with self.assertQueryCount(1):
+            res = self.get_json('/domains', headers=self.auth_headers)
+        self.assertEqual(len(res), 3)
+
+    def test_request_id(self):
+        res = self.app.get('/v1/domains', headers=self.auth_headers)
+        other = self.app.get('/v1/domains', headers=self.auth_headers)
+
+        self.assertTrue(res.headers['X-Openstack-Request-Id'].startswith(
+            'req-'))
+        self.assertNotEqual(res.headers['X-Openstack-Request-Id'],
+                            other.headers['X-Openstack-Request-Id'])
+
+    def test_last_write_cookie(self):
+        self.flags(replica_read_after_write=5, group='database')
+        res = self._create_domain()
+        self.assertIn('ripcord_last_write=', res.headers['Set-Cookie'])
+        self.assertIn('Max-Age=5', res.headers['Set-Cookie'])
+
+        res = self.app.get('/v1/domains', headers=self.auth_headers)
+        self.assertNotIn('Set-Cookie', res.headers)
+
+    def test_last_write_cookie_invalid(self):
+        now = time.time()
+        for value, expected in (('foo', None), ('%f' % (now + 60), None),
+                                ('%f' % (now - 1), now - 1)):
+            req = webob.Request.blank(
+                '/v1/domains', headers={
+                    'Cookie': 'ripcord_last_write=%s' % value})
+            res = hooks._last_write(req)
+            if expected is None:
+                self.assertIsNone(res)
+            else:
+                self.assertAlmostEqual(res, expected, places=3)
@@ -0,0 +1,94 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import eventlet
+import mock
+import webtest
+
+from ripcord.api import inflight
+from ripcord import test
+
+
+class TestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.stubs.Set(inflight, 'REQUESTS', {})
+
+    def _app(self, environ, start_response):
+        self.requests = inflight.snapshot()
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return ['a']
+
+    def test_middleware(self):
+        app = webtest.TestApp(inflight.InflightMiddleware(self._app))
+        res = app.get('/v1/domains', headers={'X-Tenant-Id': 'foo'})
+
+        self.assertEqual(res.body, 'a')
+        self.assertEqual(inflight.REQUESTS, {})
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.requests[0]['path'], '/v1/domains')
+        self.assertEqual(self.requests[0]['tenant'], 'foo')
+        self.assertIn('in _app', self.requests[0]['stack'])
+
+    def test_middleware_error(self):
+        app = inflight.InflightMiddleware(mock.Mock(side_effect=ValueError))
+
+        self.assertRaises(ValueError, app, {}, None)
+        self.assertEqual(inflight.REQUESTS, {})
+
+    def test_greenthread_stack(self):
+        event = eventlet.event.Event()
+        gt = eventlet.spawn(self._serve, event)
+        eventlet.sleep(0)
+        self.addCleanup(gt.wait)
+        self.addCleanup(event.send)
+
+        res = inflight.snapshot()
+        self.assertEqual(len(res), 1)
+        self.assertIn('in _wait', res[0]['stack'])
+
+    def _serve(self, event):
+        inflight.REQUESTS['a'] = inflight.Request(
+            {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/v1/domains'})
+        self._wait(event)
+
+    def _wait(self, event):
+        event.wait()
+
+    def test_check_requests(self):
+        self.flags(slow_request_deadline=30, group='api')
+        request = inflight.Request(
+            {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/v1/domains'})
+        inflight.REQUESTS['a'] = request
+
+        inflight.check_requests()
+        self.assertNotIn('Slow request', self.log_fixture.output)
+
+        request.started -= 31
+        inflight.check_requests()
+        inflight.check_requests()
+        self.assertEqual(self.log_fixture.output.count('Slow request'), 1)
+        self.assertIn('Slow request, GET /v1/domains served for 31.',
+                      self.log_fixture.output)
+        self.assertIn('in test_check_requests', self.log_fixture.output)
+
+    def test_start_watchdog_disabled(self):
+        self.flags(slow_request_deadline=0, group='api')
+        tg = mock.Mock()
+
+        self.assertFalse(inflight.start_watchdog(tg))
+        self.assertFalse(tg.add_timer.called)
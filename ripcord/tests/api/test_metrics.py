@@ -0,0 +1,149 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import fixtures
+import webtest
+
+from ripcord.api import metrics
+from ripcord.tests.api.v1 import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        metrics.METRICS.clear()
+        self.addCleanup(metrics.METRICS.clear)
+        self.metrics_dir = self.useFixture(fixtures.TempDir()).path
+        self.flags(metrics_dir=self.metrics_dir, group='api')
+
+    def _scrape(self):
+        app = webtest.TestApp(metrics.filter_factory({})(self.app.app))
+        res = app.get('/metrics')
+        self.assertEqual(res.content_type, 'text/plain')
+
+        return res.body.splitlines()
+
+    def test_requests(self):
+        self.post_json(
+            '/domains', params={'name': 'example.org'},
+            headers=self.auth_headers)
+        self.get_json('/domains', headers=self.auth_headers)
+        self.get_json('/domains', headers=self.auth_headers)
+        self.get_json(
+            '/domains/0eda016a-b078-4bef-94ba-1ab10fe15a7d',
+            headers=self.auth_headers, expect_errors=True)
+
+        res = self._scrape()
+        self.assertIn(
+            'ripcord_api_requests_total{route="DomainsController.get_all",'
+            'method="GET",status="200"} 2', res)
+        self.assertIn(
+            'ripcord_api_requests_total{route="DomainsController.get_one",'
+            'method="GET",status="404"} 1', res)
+        self.assertIn(
+            'ripcord_api_requests_total{route="DomainsController.post",'
+            'method="POST",status="200"} 1', res)
+        self.assertIn(
+            'ripcord_api_request_duration_seconds_bucket{'
+            'route="DomainsController.get_all",le="+Inf"} 2', res)
+        self.assertIn(
+            'ripcord_api_request_duration_seconds_count{'
+            'route="DomainsController.get_all"} 2', res)
+        self.assertIn(
+            'ripcord_api_db_queries_total{'
+            'route="DomainsController.get_all"} 2', res)
+        self.assertIn('# TYPE ripcord_db_pool_checkout_seconds histogram', res)
+        # NOTE(pabelanger): The domain created and the one not found.
+        self.assertIn('ripcord_entity_cache_size 2', res)
+
+    def test_unmatched(self):
+        self.app.get('/v1/nonexistent', expect_errors=True)
+
+        self.assertIn(
+            'ripcord_api_requests_total{route="unmatched",method="GET",'
+            'status="404"} 1', self._scrape())
+
+    def test_unknown_method(self):
+        self.app.request('/v1/nonexistent', method='BREW', expect_errors=True)
+
+        res = self._scrape()
+        self.assertIn(
+            'ripcord_api_requests_total{route="unmatched",method="other",'
+            'status="404"} 1', res)
+        self.assertFalse([line for line in res if 'BREW' in line])
+
+    def test_passed(self):
+        app = webtest.TestApp(metrics.filter_factory({})(self.app.app))
+        res = app.get('/v1/domains', headers=self.auth_headers)
+
+        self.assertEqual(res.json, [])
+        self.assertIn(
+            'ripcord_api_requests_total{route="DomainsController.get_all",'
+            'method="GET",status="200"} 1', self._scrape())
+
+    def test_single_worker(self):
+        self.get_json('/domains', headers=self.auth_headers)
+        self.assertEqual(os.listdir(self.metrics_dir), [])
+
+    def test_workers(self):
+        self.flags(workers=2, group='api')
+        self.get_json('/domains', headers=self.auth_headers)
+        path = os.path.join(self.metrics_dir, '%d.json' % os.getpid())
+        self.assertTrue(os.path.exists(path))
+
+        # NOTE(pabelanger): Pretend the parent process is another worker,
+        # which served the same route, and pid 0x7fffffff a dead one.
+        with open(path) as f:
+            families = json.load(f)
+        for pid in (os.getppid(), 0x7fffffff):
+            with open(os.path.join(
+                    self.metrics_dir, '%d.json' % pid), 'w') as f:
+                json.dump(families, f)
+
+        for i in range(2):
+            res = self._scrape()
+            self.assertIn(
+                'ripcord_api_requests_total{'
+                'route="DomainsController.get_all",method="GET",'
+                'status="200"} 3', res)
+            self.assertIn(
+                'ripcord_api_request_duration_seconds_bucket{'
+                'route="DomainsController.get_all",le="+Inf"} 3', res)
+            self.assertFalse(os.path.exists(
+                os.path.join(self.metrics_dir, '%d.json' % 0x7fffffff)))
+
+        # NOTE(pabelanger): Only the counters and histograms of the dead
+        # worker are kept.
+        with open(os.path.join(self.metrics_dir, 'retired.json')) as f:
+            retired = json.load(f)
+        self.assertTrue(retired)
+        self.assertEqual(
+            set(family['type'] for family in retired),
+            set(['counter', 'histogram']))
+
+    def test_render(self):
+        res = metrics.render([metrics._family(
+            'ripcord_test_total', 'counter', 'Test.',
+            [((('name', 'a"b\\c'),), 1.5)])])
+
+        self.assertEqual(
+            res, '# HELP ripcord_test_total Test.\n'
+                 '# TYPE ripcord_test_total counter\n'
+                 'ripcord_test_total{name="a\\"b\\\\c"} 1.5\n')
@@ -0,0 +1,146 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pstats
+import threading
+
+import fixtures
+import webtest
+
+from ripcord.api import profiler
+from ripcord import test
+
+
+def _app(environ, start_response):
+    environ['ripcord.route'] = 'DomainsController.get_all'
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return ['a', 'b']
+
+
+class TestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.profile_dir = self.useFixture(fixtures.TempDir()).path
+        self.flags(profile_dir=self.profile_dir, group='api')
+
+    def _get(self, headers=None):
+        app = webtest.TestApp(profiler.filter_factory({})(_app))
+        res = app.get('/v1/domains', headers=headers or {})
+        self.assertEqual(res.body, 'ab')
+
+        return sorted(os.listdir(self.profile_dir))
+
+    def test_disabled(self):
+        self.assertIs(profiler.filter_factory({})(_app), _app)
+
+    def test_sampled(self):
+        self.flags(profile_sample_rate=1, group='api')
+
+        res = self._get()
+        self.assertEqual(len(res), 1)
+        self.assertIn('-DomainsController.get_all-', res[0])
+        self.assertTrue(res[0].endswith('-%d.pstats' % os.getpid()))
+        stats = pstats.Stats(os.path.join(self.profile_dir, res[0]))
+        self.assertTrue(stats.total_calls > 0)
+
+    def test_header(self):
+        self.flags(profile_allow_header=True, group='api')
+
+        self.assertEqual(self._get(), [])
+        self.assertEqual(self._get({'X-Ripcord-Profile': '1'}), [])
+        self.assertEqual(
+            self._get({'X-Ripcord-Profile': '1', 'X-Roles': 'member'}), [])
+        self.assertEqual(len(self._get(
+            {'X-Ripcord-Profile': '1', 'X-Roles': 'member,admin'})), 1)
+
+    def test_header_not_allowed(self):
+        self.flags(profile_sample_rate=0.000001, group='api')
+
+        self.assertEqual(
+            self._get({'X-Ripcord-Profile': '1', 'X-Roles': 'admin'}), [])
+
+    def test_rotate(self):
+        self.flags(profile_sample_rate=1, profile_max_files=2, group='api')
+        for name in ('20130101T000000.000-a-1ms-1.pstats',
+                     '20130101T000001.000-b-1ms-1.pstats'):
+            open(os.path.join(self.profile_dir, name), 'w').close()
+
+        res = self._get()
+        self.assertEqual(len(res), 2)
+        self.assertEqual(res[0], '20130101T000001.000-b-1ms-1.pstats')
+
+
+class SamplingProfilerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(SamplingProfilerTestCase, self).setUp()
+        self.release = threading.Event()
+        self.started = threading.Event()
+        thread = threading.Thread(target=self._wait)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.release.set)
+        self.started.wait()
+
+    def _wait(self):
+        self.started.set()
+        self.release.wait()
+
+    def test_sample(self):
+        sampler = profiler.SamplingProfiler(0.01, 100)
+        sampler.sample()
+        sampler.sample()
+
+        self.assertTrue(sampler.samples >= 2)
+        res = [line for line in sampler.collapsed().splitlines()
+               if ':_wait;' in line]
+        self.assertEqual(len(res), 1)
+        self.assertTrue(res[0].startswith('threading:__bootstrap;'))
+        self.assertTrue(res[0].endswith(' 2'))
+        self.assertIn(
+            'ripcord.tests.api.test_profiler:_wait;threading:wait', res[0])
+
+    def test_max_stacks(self):
+        sampler = profiler.SamplingProfiler(0.01, 1)
+        sampler.stacks['a;b'] = 1
+        sampler.sample()
+
+        self.assertEqual(
+            sorted(sampler.stacks.keys()), ['[other]', 'a;b'])
+
+    def test_write(self):
+        path = self.useFixture(fixtures.TempDir()).path
+        sampler = profiler.SamplingProfiler(0.01, 100)
+        sampler.stacks['a;b'] = 3
+        sampler.write(path)
+
+        name = os.path.join(path, 'stacks-%d.collapsed' % os.getpid())
+        with open(name) as f:
+            self.assertEqual(f.read(), 'a;b 3\n')
+
+    def test_start_sampling_disabled(self):
+        self.flags(sampling_profiler_interval=0, group='api')
+        self.assertIsNone(profiler.start_sampling())
+
+    def test_start_sampling(self):
+        self.stubs.Set(profiler, 'SAMPLER', None)
+        self.stubs.Set(profiler.SamplingProfiler, 'start', lambda self: None)
+        sampler = profiler.start_sampling()
+
+        self.assertEqual(sampler.interval, 0.01)
+        self.assertIs(profiler.start_sampling(), sampler)
@@ -0,0 +1,150 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import webtest
+
+from ripcord.api import tracing
+from ripcord import test
+from ripcord.tests.api.v1 import base
+
+
+class FakeTime(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def time(self):
+        return self.now
+
+
+class ClosingList(list):
+
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _app(environ, start_response):
+    with tracing.span('dispatch'):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+    return ['a']
+
+
+class TestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.time = FakeTime()
+        self.stubs.Set(tracing.time, 'time', self.time.time)
+
+    def test_nested(self):
+        trace = tracing.Trace()
+        trace.start('dispatch')
+        self.time.now += 1
+        trace.start('db')
+        self.time.now += 2
+        trace.stop('db')
+        trace.start('db')
+        self.time.now += 3
+        trace.stop('db')
+        self.time.now += 4
+        trace.stop('dispatch')
+
+        self.assertEqual(
+            trace.stages.items(), [('db', 5.0), ('dispatch', 5.0)])
+        self.assertEqual(
+            trace.server_timing(),
+            'total;dur=10000.000, db;dur=5000.000, dispatch;dur=5000.000')
+
+    def test_stop_unwinds(self):
+        trace = tracing.Trace()
+        trace.start('controller')
+        trace.start('db')
+        self.time.now += 1
+        trace.stop('controller')
+        trace.stop('unknown')
+
+        self.assertEqual(trace.stages, {'db': 1.0, 'controller': 0.0})
+
+    def test_middleware(self):
+        app = webtest.TestApp(tracing.TracingMiddleware(_app))
+        res = app.get('/v1/domains')
+
+        self.assertEqual(res.body, 'a')
+        self.assertEqual(res.headers['Server-Timing'],
+                         'total;dur=0.000, dispatch;dur=0.000')
+        self.assertIn('"GET /v1/domains" status: 200 route: - timing: '
+                      'dispatch=0.0 total=0.0', self.log_fixture.output)
+
+    def test_middleware_write(self):
+        def app(environ, start_response):
+            write = start_response('200 OK', [('Content-Type', 'text/plain')])
+            write('a')
+            write('b')
+            return closing
+
+        closing = ClosingList(['c'])
+        app = webtest.TestApp(tracing.TracingMiddleware(app))
+        res = app.get('/v1/domains')
+
+        self.assertEqual(res.body, 'abc')
+        self.assertIn('Server-Timing', res.headers)
+        self.assertTrue(closing.closed)
+
+    def test_middleware_outer(self):
+        def outer(environ, start_response):
+            self.time.now += 2
+            return inner(environ, start_response)
+
+        inner = tracing.TracingMiddleware(_app)
+        app = webtest.TestApp(tracing.TracingMiddleware(outer))
+        res = app.get('/v1/domains')
+
+        self.assertEqual(res.headers['Server-Timing'],
+                         'total;dur=2000.000, authtoken;dur=2000.000, '
+                         'dispatch;dur=0.000')
+
+    def test_span_untraced(self):
+        with tracing.span('db'):
+            pass
+
+    def test_traced(self):
+        func = tracing.traced('db', lambda: 'a')
+        self.assertTrue(func.traced)
+        self.assertEqual(func(), 'a')
+
+
+class FunctionalTestCase(base.FunctionalTest):
+
+    def test_server_timing(self):
+        res = self.app.get('/v1/domains', headers=self.auth_headers)
+
+        stages = [metric.split(';')[0]
+                  for metric in res.headers['Server-Timing'].split(', ')]
+        self.assertEqual(stages[0], 'total')
+        self.assertEqual(stages[-1], 'sql')
+        for stage in ('controller', 'db', 'dispatch', 'errors', 'serialize'):
+            self.assertIn(stage, stages)
+        self.assertIn('route: DomainsController.get_all timing: ',
+                      self.log_fixture.output)
+
+    def test_validate(self):
+        res = self.post_json(
+            '/domains', params={'name': 'example.org'}, status=200,
+            headers=self.auth_headers)
+
+        self.assertIn('validate;dur=', res.headers['Server-Timing'])
@@ -90,3 +90,60 @@ class TestCase(base.FunctionalTest):
         # NOTE(pabelanger): We add 3 because of created_at, uuid, and hidden
         # sqlalchemy object.
         self.assertEqual(len(res[0]), len(json) + 2)
+
+    def test_get_all_pagination(self):
+        self.flags(quota_domains=-1, group='quotas')
+        headers = {
+            'X-Tenant-Id': '793491dd5fa8477eb2d6a820193a183b',
+            'X-User-Id': '02d99a62af974b26b510c3564ba84644',
+        }
+        uuids = []
+        for x in range(3):
+            tmp = self.post_json(
+                '/domains', params={'name': 'example%d.org' % x},
+                status=200, headers=headers)
+            uuids.append(tmp.json['uuid'])
+
+        res = self.app.get(
+            '/v1/domains', params={'limit': 2}, headers=headers)
+        self.assertEqual([r['uuid'] for r in res.json], uuids[:2])
+        self.assertIn('marker=%s' % uuids[1], res.headers['Link'])
+        self.assertIn('rel="next"', res.headers['Link'])
+
+        res = self.app.get(
+            '/v1/domains', params={'limit': 2, 'marker': uuids[1]},
+            headers=headers)
+        self.assertEqual([r['uuid'] for r in res.json], uuids[2:])
+        self.assertNotIn('Link', res.headers)
+
+    def test_get_all_invalid_parameters(self):
+        for params in [{'limit': 0}, {'sort_dir': 'foo'},
+                       {'sort_key': 'foo'},
+                       {'marker': '0eda016a-b078-4bef-94ba-1ab10fe15a7d'}]:
+            res = self.get_json('/domains', expect_errors=True, **params)
+            self.assertEqual(res.status_int, 400)
+            self.assertTrue(res.json['error_message'])
+
+    def test_export(self):
+        self.flags(quota_domains=-1, group='quotas')
+        headers = {
+            'X-Tenant-Id': '793491dd5fa8477eb2d6a820193a183b',
+            'X-User-Id': '02d99a62af974b26b510c3564ba84644',
+        }
+        for x in range(3):
+            self.post_json(
+                '/domains', params={'name': 'example%d.org' % x},
+                status=200, headers=headers)
+
+        expected = self.get_json('/domains', headers=headers)
+        res = self.app.get('/v1/domains/export', headers=headers)
+
+        self.assertEqual(res.content_type, 'application/json')
+        self.assertEqual(res.json, expected)
+
+    def test_export_invalid_parameters(self):
+        for params in [{'sort_dir': 'foo'}, {'sort_key': 'foo'}]:
+            res = self.app.get(
+                '/v1/domains/export', params=params, expect_errors=True)
+            self.assertEqual(res.status_int, 400)
+            self.assertTrue(res.json['error_message'])
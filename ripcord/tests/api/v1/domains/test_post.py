@@ -51,6 +51,7 @@ class TestCase(base.FunctionalTest):
         self.assertEqual(len(res.json), len(json) + 2)
 
     def test_domain_already_exists(self):
+        self.flags(quota_domains=-1, group='quotas')
         json = {
             'name': 'example.org',
         }
@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from ripcord.api.controllers.v1 import utils
 from ripcord.openstack.common import uuidutils
 from ripcord.tests.api.v1 import base
 
@@ -109,3 +110,38 @@ class TestCase(base.FunctionalTest):
 
         # NOTE(pabelanger): We add 2 because of created_at and uuid
         self.assertEqual(len(res.json), len(json) + 2)
+
+    def test_rename(self):
+        self.stubs.Set(
+            utils, 'spawn', lambda func, *args, **kw: func(*args, **kw))
+        headers = {
+            'X-User-Id': '02d99a62af974b26b510c3564ba84644',
+            'X-Tenant-Id': '793491dd5fa8477eb2d6a820193a183b',
+        }
+        tmp = self.post_json(
+            '/domains', params={'name': 'example.org'}, status=200,
+            headers=headers)
+        params = {
+            'domain_id': tmp.json['uuid'],
+            'password': 'foobar',
+            'username': 'alice',
+        }
+        sub = self.post_json(
+            '/subscribers', params=params, status=200, headers=headers)
+
+        self.put_json(
+            '/domains/%s' % tmp.json['uuid'], params={'name': 'example.net'},
+            status=200, headers=headers)
+
+        res = self.get_json('/domains/%s/rehash' % tmp.json['uuid'])
+        self.assertEqual(res, {'done': 1, 'pending': False, 'total': 1})
+
+        res = self.get_json('/subscribers/%s' % sub.json['uuid'])
+        self.assertEqual(res['ha1'], '1f66286e1db577f81e06c22c017c137b')
+        self.assertEqual(res['ha1b'], '88bb93a6b9273446665753b5972265a8')
+
+    def test_rehash_failure(self):
+        res = self.get_json(
+            '/domains/%s/rehash' % '0eda016a-b078-4bef-94ba-1ab10fe15a7d',
+            expect_errors=True)
+        self.assertEqual(res.status_int, 404)
@@ -168,3 +168,122 @@ class TestCase(base.FunctionalTest):
 
         # NOTE(pabelanger): We add 2 because of created_at and uuid.
         self.assertEqual(len(res[0]), len(json) + 2)
+
+    def test_get_all_pagination(self):
+        uuids = []
+        for username in ['alice', 'charlie']:
+            params = {
+                'domain_id': self.domain_id,
+                'password': 'foobar',
+                'username': username,
+            }
+            tmp = self.post_json(
+                '/subscribers', params=params, status=200,
+                headers=self.headers)
+            uuids.append(tmp.json['uuid'])
+
+        res = self.app.get(
+            '/v1/subscribers', headers=self.headers,
+            params={'limit': 2, 'sort_key': 'username', 'sort_dir': 'desc'})
+        self.assertEqual([r['username'] for r in res.json], ['charlie', 'bob'])
+        self.assertIn('rel="next"', res.headers['Link'])
+
+        res = self.get_json(
+            '/subscribers', headers=self.headers, limit=2,
+            marker=res.json[-1]['uuid'], sort_key='username',
+            sort_dir='desc')
+        self.assertEqual([r['uuid'] for r in res], uuids[:1])
+
+    def test_get_all_pagination_nullable(self):
+        res = self.get_json('/subscribers', headers=self.headers)
+        uuids = [res[0]['uuid']]
+        for username in ['alice', 'charlie']:
+            params = {
+                'domain_id': self.domain_id,
+                'password': 'foobar',
+                'username': username,
+            }
+            tmp = self.post_json(
+                '/subscribers', params=params, status=200,
+                headers=self.headers)
+            uuids.append(tmp.json['uuid'])
+        self.put_json(
+            '/subscribers/%s' % uuids[1], params={'description': 'alice'},
+            headers=self.headers)
+
+        # NOTE(pabelanger): updated_at is NULL until a subscriber is
+        # updated, a page starting after such a row would be empty.
+        for sort_key in ['updated_at', 'rpid', 'email_address']:
+            res = self.get_json(
+                '/subscribers', headers=self.headers, limit=1,
+                sort_key=sort_key, expect_errors=True)
+            self.assertEqual(res.status_int, 400)
+            self.assertTrue(res.json['error_message'])
+
+        res = self.app.get(
+            '/v1/subscribers', headers=self.headers,
+            params={'limit': 1, 'sort_key': 'created_at'})
+        seen = [r['uuid'] for r in res.json]
+        while 'Link' in res.headers:
+            url = res.headers['Link'].split('>', 1)[0][1:]
+            res = self.app.get(url, headers=self.headers)
+            seen.extend(r['uuid'] for r in res.json)
+
+        self.assertEqual(seen, uuids)
+
+    def test_get_all_fields(self):
+        params = {
+            'domain_id': self.domain_id,
+            'password': 'foobar',
+            'username': 'alice',
+        }
+        self.post_json(
+            '/subscribers', params=params, status=200, headers=self.headers)
+
+        fields = 'username,domain_id,ha1,ha1b,disabled'
+        res = self.app.get(
+            '/v1/subscribers', headers=self.headers,
+            params={'fields': fields, 'limit': 1, 'sort_key': 'username'})
+
+        self.assertEqual(res.json, [{
+            'disabled': False,
+            'domain_id': self.domain_id,
+            'ha1': '84ed3e3a76703c1044da21c8609334a2',
+            'ha1b': '2dc0ac0e03670d8474db6b1e62df8fd1',
+            'username': 'alice',
+        }])
+        self.assertIn('fields=username%2Cdomain_id', res.headers['Link'])
+
+    def test_get_all_fields_invalid(self):
+        res = self.get_json(
+            '/subscribers', headers=self.headers, fields='username,id',
+            expect_errors=True)
+        self.assertEqual(res.status_int, 400)
+
+    def test_get_one_fields(self):
+        self.flags(entity_cache_backend='none', group='database')
+        uuid = self.get_json('/subscribers', headers=self.headers)[0]['uuid']
+
+        res = self.get_json(
+            '/subscribers/%s' % uuid, fields='username,created_at')
+        self.assertEqual(sorted(res.keys()), ['created_at', 'username'])
+        self.assertEqual(res['username'], 'bob')
+
+    def test_export(self):
+        params = {
+            'domain_id': self.domain_id,
+            'password': 'foobar',
+            'username': 'alice',
+        }
+        self.post_json(
+            '/subscribers', params=params, status=200, headers=self.headers)
+
+        expected = self.get_json(
+            '/subscribers', headers=self.headers, sort_key='username',
+            sort_dir='desc')
+        res = self.app.get(
+            '/v1/subscribers/export', headers=self.headers,
+            params={'sort_key': 'username', 'sort_dir': 'desc'})
+
+        self.assertEqual(len(res.json), 2)
+        self.assertEqual(res.json, expected)
@@ -15,6 +15,7 @@
 # limitations under the License.
 
 from ripcord.openstack.common import uuidutils
+from ripcord import quota
 from ripcord.tests.api.v1 import base
 
 
@@ -96,3 +97,108 @@ class TestCase(base.FunctionalTest):
             expect_errors=True)
         self.assertEqual(res.status_int, 409)
         self.assertTrue(res.json['error_message'])
+
+    def _post_subscriber(self, username, **kwargs):
+        params = {
+            'domain_id': self.domain_id,
+            'password': 'foobar',
+            'username': username,
+        }
+
+        return self.post_json(
+            '/subscribers', params=params, headers=self.headers, **kwargs)
+
+    def test_over_quota_reserved(self):
+        self.flags(quota_subscribers=1, group='quotas')
+        # NOTE(pabelanger): A parallel create holds the last slot, it has
+        # not inserted its subscriber yet.
+        reservations = quota.QUOTAS.reserve(
+            project_id=self.project_id, subscribers=1)
+
+        res = self._post_subscriber(username='alice', expect_errors=True)
+        self.assertEqual(res.status_int, 413)
+        self.assertIn(
+            "Quota exceeded for resources: ['subscribers']",
+            res.json['error_message'])
+
+        quota.QUOTAS.rollback(reservations, project_id=self.project_id)
+        self._post_subscriber(username='alice', status=200)
+        res = self._post_subscriber(username='bob', expect_errors=True)
+        self.assertEqual(res.status_int, 413)
+
+    def test_over_quota_rollback(self):
+        self.flags(quota_subscribers=1, group='quotas')
+        self.domain_id = '0eda016a-b078-4bef-94ba-1ab10fe15a7d'
+        res = self._post_subscriber(username='alice', expect_errors=True)
+        self.assertNotEqual(res.status_int, 200)
+
+        # NOTE(pabelanger): The failed create released its reservation.
+        self.domain_id = self.get_json(
+            '/domains', headers=self.headers)[0]['uuid']
+        self._post_subscriber(username='alice', status=200)
+
+    def test_bulk(self):
+        params = [{
+            'domain_id': self.domain_id,
+            'email_address': 'alice@example.org',
+            'password': 'foobar',
+            'username': 'alice',
+        }, {
+            'domain_id': '0eda016a-b078-4bef-94ba-1ab10fe15a7d',
+            'password': 'foobar',
+            'username': 'bob',
+        }, {
+            'domain_id': self.domain_id,
+            'password': 'foobar',
+            'username': 'alice',
+        }, {
+            'domain_id': self.domain_id,
+            'username': 'charlie',
+        }]
+
+        res = self.post_json(
+            '/subscribers/bulk', params=params, status=200,
+            headers=self.headers)
+
+        self.assertEqual(
+            [r['status_code'] for r in res.json], [200, 404, 409, 400])
+        self.assertEqual(
+            res.json[0]['subscriber']['email_address'], 'alice@example.org')
+        self.assertEqual(
+            res.json[0]['subscriber']['ha1'],
+            '84ed3e3a76703c1044da21c8609334a2')
+        for r in res.json[1:]:
+            self.assertTrue(r['error_message'])
+
+        tmp = self.get_json(
+            '/subscribers/%s' % res.json[0]['subscriber']['uuid'])
+        self.assertEqual(tmp['project_id'], self.project_id)
+        self.assertEqual(tmp['user_id'], self.user_id)
+
+    def test_bulk_over_quota(self):
+        self.flags(quota_subscribers=1, group='quotas')
+        params = [{
+            'domain_id': self.domain_id,
+            'password': 'foobar',
+            'username': username,
+        } for username in ['alice', 'bob']]
+
+        res = self.post_json(
+            '/subscribers/bulk', params=params, expect_errors=True,
+            headers=self.headers)
+        self.assertEqual(res.status_int, 413)
+        self.assertEqual(
+            self.get_json('/subscribers', headers=self.headers), [])
+
+    def test_bulk_too_many(self):
+        self.flags(max_limit=1, group='api')
+        params = [{
+            'domain_id': self.domain_id,
+            'password': 'foobar',
+            'username': username,
+        } for username in ['alice', 'bob']]
+
+        res = self.post_json(
+            '/subscribers/bulk', params=params, expect_errors=True,
+            headers=self.headers)
+        self.assertEqual(res.status_int, 400)
@@ -50,6 +50,7 @@ class TestCase(base.FunctionalTest):
         self.assertTrue(res.json['error_message'])
 
     def test_all_fields(self):
+        self.flags(quota_domains=-1, group='quotas')
         json = {
             'description': 'a subscriber',
             'disabled': True,
@@ -0,0 +1,79 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+from wsme.rest import json as wsme_json
+from wsme import types
+
+from ripcord.api.controllers.v1 import domain
+from ripcord.api.controllers.v1 import subscriber
+from ripcord.db.sqlalchemy import models
+from ripcord import test
+
+
+class SerializerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(SerializerTestCase, self).setUp()
+        self.row = models.Subscriber(
+            created_at=datetime.datetime(2014, 1, 2, 3, 4, 5), description='',
+            disabled=False, domain_id='d', email_address='', ha1='a',
+            ha1b='b', id=1, password='foobar', project_id='p', rpid=None,
+            user_id='u', username='alice', uuid='s')
+
+    def test_fields(self):
+        self.assertEqual(
+            domain.SERIALIZER.fields,
+            ('disabled', 'name', 'project_id', 'user_id', 'uuid',
+             'created_at', 'updated_at'))
+        self.assertEqual(
+            subscriber.SERIALIZER.datetimes, ('created_at', 'updated_at'))
+
+    def test_to_dict(self):
+        res = subscriber.SERIALIZER.to_dict(self.row)
+
+        self.assertEqual(res['created_at'], '2014-01-02T03:04:05')
+        self.assertEqual(res['updated_at'], None)
+        self.assertNotIn('id', res)
+        self.assertEqual(
+            res, wsme_json.tojson.default(subscriber.Subscriber, self.row))
+
+    def test_to_dict_dict(self):
+        self.assertEqual(
+            subscriber.SERIALIZER.to_dict(dict(self.row)),
+            subscriber.SERIALIZER.to_dict(self.row))
+
+    def test_to_dict_api(self):
+        body = subscriber.Subscriber(username='alice')
+        del body.password
+
+        res = subscriber.SERIALIZER.to_dict(body)
+        self.assertEqual(res['username'], 'alice')
+        self.assertNotIn('password', res)
+
+    def test_tojson(self):
+        datatype = types.registry.resolve_type([subscriber.Subscriber])
+        res = wsme_json.tojson(datatype, [self.row, None])
+        self.assertEqual(
+            res, [subscriber.SERIALIZER.to_dict(self.row), None])
+
+    def test_as_dict(self):
+        res = domain.Domain(name='example.org').as_dict()
+
+        self.assertEqual(res['name'], 'example.org')
+        self.assertEqual(res['disabled'], None)
+        self.assertNotIn('id', res)
@@ -14,6 +14,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
+from ripcord.db import api as db_api
 from ripcord import test
 
 
@@ -21,3 +24,16 @@ class TestCase(test.TestCase):
 
     def setUp(self):
         super(TestCase, self).setUp()
+
+    @contextlib.contextmanager
+    def assertQueryCount(self, expected):
+        """Assert the number of statements issued by the wrapped block."""
+        stats = db_api.start_query_stats()
+        try:
+            yield stats
+        finally:
+            db_api.stop_query_stats(stats)
+
+        self.assertEqual(
+            expected, stats.count, 'Expected %d statements, got %d:\n%s' % (
+                expected, stats.count, '\n'.join(stats.statements)))
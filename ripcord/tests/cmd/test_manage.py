@@ -21,6 +21,7 @@ import mock
 import testtools
 
 from ripcord.cmd import manage
+from ripcord.common import exception
 from ripcord.db import migration as db_migration
 from ripcord.openstack.common.db.sqlalchemy import migration
 from ripcord.openstack.common import log
@@ -58,6 +59,18 @@ class TestCase(testtools.TestCase):
             migration.db_sync,
             abs_path=db_migration.MIGRATE_REPO_PATH, version='20')
 
+    def test_db_explain_error(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            'ripcord.db.migration.db_sync', mock.Mock()))
+        self.useFixture(fixtures.MonkeyPatch(
+            'ripcord.db.sqlalchemy.explain.verify',
+            mock.Mock(side_effect=exception.RipcordException('No SQLite'))))
+        self.useFixture(fixtures.MonkeyPatch(
+            'sys.argv', ['ripcord.cmd.manage', 'db-explain']))
+
+        res = self.assertRaises(SystemExit, manage.main)
+        self.assertEqual(res.code, 'No SQLite')
+
     def test_db_version(self):
         migration.db_version = mock.Mock()
         self._main_test_helper(
@@ -0,0 +1,112 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from ripcord.common import exception
+from ripcord.common import utils
+from ripcord import test
+
+
+class HistogramTestCase(test.NoDBTestCase):
+
+    def test_observe(self):
+        histogram = utils.Histogram([1.0, 0.1])
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        res = histogram.stats()
+        self.assertEqual(
+            res['buckets'], [(0.1, 2), (1.0, 3), ('+Inf', 4)])
+        self.assertEqual(res['count'], 4)
+        self.assertAlmostEqual(res['sum'], 2.65)
+
+    def test_empty(self):
+        res = utils.Histogram([0.1]).stats()
+        self.assertEqual(res['buckets'], [(0.1, 0), ('+Inf', 0)])
+        self.assertEqual(res['count'], 0)
+        self.assertEqual(res['sum'], 0)
+
+
+class SingleFlightTestCase(test.TestCase):
+
+    def setUp(self):
+        super(SingleFlightTestCase, self).setUp()
+        self.flights = utils.SingleFlight()
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def _slow(self, value):
+        self.calls.append(value)
+        self.started.set()
+        self.release.wait()
+        if isinstance(value, Exception):
+            raise value
+
+        return value
+
+    def _run(self, count, key, value):
+        results = []
+
+        def _call():
+            try:
+                results.append(self.flights.do(key, self._slow, value))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=_call) for x in range(count)]
+        threads[0].start()
+        self.started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        # NOTE(pabelanger): Wait for every follower to join the flight.
+        while self.flights.coalesced < count - 1:
+            threading.Event().wait(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_coalesced(self):
+        results = self._run(10, 'foo', 'bar')
+
+        self.assertEqual(results, ['bar'] * 10)
+        self.assertEqual(self.calls, ['bar'])
+        self.assertEqual(self.flights.stats(), {'calls': 1, 'coalesced': 9})
+
+    def test_exception(self):
+        e = exception.DomainNotFound(uuid='foo')
+        results = self._run(3, 'foo', e)
+
+        self.assertEqual(results, [e] * 3)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_sequential(self):
+        self.release.set()
+        self.flights.do('foo', self._slow, 'bar')
+        self.flights.do('foo', self._slow, 'bar')
+
+        self.assertEqual(self.calls, ['bar', 'bar'])
+        self.assertEqual(self.flights.stats(), {'calls': 2, 'coalesced': 0})
+
+    def test_different_keys(self):
+        self.release.set()
+        self.flights.do('foo', self._slow, 'bar')
+        self.flights.do('bar', self._slow, 'foo')
+
+        self.assertEqual(self.calls, ['bar', 'foo'])
@@ -29,6 +29,7 @@ class TestCase(base.FunctionalTest):
             'id': 1,
             'name': 'example.org',
             'project_id': '793491dd5fa8477eb2d6a820193a183b',
+            'rehash_marker': None,
             'updated_at': None,
             'user_id': '02d99a62af974b26b510c3564ba84644',
         }
@@ -51,6 +52,7 @@ class TestCase(base.FunctionalTest):
             'disabled': False,
             'name': 'example.org',
             'project_id': '793491dd5fa8477eb2d6a820193a183b',
+            'rehash_marker': None,
             'updated_at': None,
             'user_id': '02d99a62af974b26b510c3564ba84644',
         }
@@ -16,6 +16,7 @@
 
 import datetime
 
+from ripcord.common import exception
 from ripcord.openstack.common import uuidutils
 from ripcord.tests.db import base
 
@@ -28,6 +29,7 @@ class TestCase(base.FunctionalTest):
             'name': 'example.org',
             'id': 1,
             'project_id': '793491dd5fa8477eb2d6a820193a183b',
+            'rehash_marker': None,
             'updated_at': None,
             'user_id': '02d99a62af974b26b510c3564ba84644',
         }
@@ -48,3 +50,62 @@ class TestCase(base.FunctionalTest):
         # NOTE(pabelanger): We add 3 because of created_at, uuid, and hidden
         # sqlalchemy object.
         self.assertEqual(len(res[0].__dict__), len(row) + 3)
+
+    def _create_domains(self, project_id, count):
+        res = []
+        for x in range(count):
+            res.append(self.db_api.create_domain(
+                name='example%d.org' % x, project_id=project_id,
+                user_id='02d99a62af974b26b510c3564ba84644'))
+
+        return [r['uuid'] for r in res]
+
+    def test_limit_and_marker(self):
+        project_id = '793491dd5fa8477eb2d6a820193a183b'
+        uuids = self._create_domains(project_id=project_id, count=5)
+
+        res = self.db_api.list_domains(project_id=project_id, limit=2)
+        self.assertEqual([r['uuid'] for r in res], uuids[:2])
+
+        res = self.db_api.list_domains(
+            project_id=project_id, limit=2, marker=uuids[1])
+        self.assertEqual([r['uuid'] for r in res], uuids[2:4])
+
+        res = self.db_api.list_domains(
+            project_id=project_id, limit=2, marker=uuids[3])
+        self.assertEqual([r['uuid'] for r in res], uuids[4:])
+
+    def test_sort(self):
+        project_id = '793491dd5fa8477eb2d6a820193a183b'
+        uuids = self._create_domains(project_id=project_id, count=3)
+
+        res = self.db_api.list_domains(
+            project_id=project_id, sort_key='name', sort_dir='desc')
+        self.assertEqual([r['uuid'] for r in res], uuids[::-1])
+
+        res = self.db_api.list_domains(
+            project_id=project_id, limit=1, marker=uuids[2],
+            sort_key='name', sort_dir='desc')
+        self.assertEqual([r['uuid'] for r in res], uuids[1:2])
+
+    def test_marker_from_other_project(self):
+        uuids = self._create_domains(
+            project_id='793491dd5fa8477eb2d6a820193a183b', count=1)
+
+        self.assertRaises(
+            exception.MarkerNotFound,
+            self.db_api.list_domains,
+            project_id='5fccabbb-9d65-417f-8b0b-a2fc77b501e6',
+            marker=uuids[0])
+
+    def test_invalid_sort(self):
+        project_id = '793491dd5fa8477eb2d6a820193a183b'
+
+        self.assertRaises(
+            exception.InvalidParameterValue,
+            self.db_api.list_domains, project_id=project_id,
+            sort_key='foo')
+        self.assertRaises(
+            exception.InvalidParameterValue,
+            self.db_api.list_domains, project_id=project_id,
+            sort_dir='foo')
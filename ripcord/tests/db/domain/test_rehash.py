@@ -0,0 +1,95 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+
+from ripcord.common import exception
+from ripcord.db.sqlalchemy import api as db_api
+from ripcord.tests.db import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.project_id = '793491dd5fa8477eb2d6a820193a183b'
+        self.user_id = '02d99a62af974b26b510c3564ba84644'
+
+        res = self.db_api.create_domain(
+            name='example.net', project_id=self.project_id,
+            user_id=self.user_id)
+        self.domain_id = res['uuid']
+
+        self.subscribers = []
+        for username in ['alice', 'bob', 'charlie', 'dave', 'eve']:
+            res = self.db_api.create_subscriber(
+                username=username, domain_id=self.domain_id,
+                password='foobar', user_id=self.user_id,
+                project_id=self.project_id)
+            self.subscribers.append(res['uuid'])
+
+    def _ha1(self, username, domain):
+        return hashlib.md5(
+            '%s:%s:foobar' % (username, domain)).hexdigest()
+
+    def test_failure(self):
+        self.assertRaises(
+            exception.DomainNotFound,
+            self.db_api.rehash_domain,
+            uuid='0eda016a-b078-4bef-94ba-1ab10fe15a7d')
+
+    def test_no_rename(self):
+        self.db_api.update_domain(uuid=self.domain_id, name='example.net')
+
+        res = self.db_api.get_domain_rehash(uuid=self.domain_id)
+        self.assertEqual(res, {'done': 5, 'pending': False, 'total': 5})
+        self.assertEqual(self.db_api.list_domains_rehash_pending(), [])
+
+    def test_rename(self):
+        self.stubs.Set(db_api, '_BULK_CHUNK_SIZE', 2)
+        self.db_api.update_domain(uuid=self.domain_id, name='example.org')
+
+        res = self.db_api.get_domain_rehash(uuid=self.domain_id)
+        self.assertEqual(res, {'done': 0, 'pending': True, 'total': 5})
+        self.assertEqual(
+            self.db_api.list_domains_rehash_pending(), [self.domain_id])
+
+        res = self.db_api.rehash_domain(uuid=self.domain_id, batches=2)
+        self.assertEqual(res, {'done': 4, 'pending': True, 'total': 5})
+
+        res = self.db_api.get_subscriber(uuid=self.subscribers[0])
+        self.assertEqual(res['ha1'], '84ed3e3a76703c1044da21c8609334a2')
+        self.assertEqual(res['ha1b'], '2dc0ac0e03670d8474db6b1e62df8fd1')
+        res = self.db_api.get_subscriber(uuid=self.subscribers[4])
+        self.assertNotEqual(res['ha1'], self._ha1('eve', 'example.org'))
+
+        res = self.db_api.rehash_domain(uuid=self.domain_id)
+        self.assertEqual(res, {'done': 5, 'pending': False, 'total': 5})
+        self.assertEqual(self.db_api.list_domains_rehash_pending(), [])
+
+        for uuid in self.subscribers:
+            res = self.db_api.get_subscriber(uuid=uuid)
+            self.assertEqual(
+                res['ha1'], self._ha1(res['username'], 'example.org'))
+
+    def test_rename_restarts(self):
+        self.stubs.Set(db_api, '_BULK_CHUNK_SIZE', 2)
+        self.db_api.update_domain(uuid=self.domain_id, name='example.org')
+        self.db_api.rehash_domain(uuid=self.domain_id, batches=2)
+
+        self.db_api.update_domain(uuid=self.domain_id, name='example.com')
+        res = self.db_api.get_domain_rehash(uuid=self.domain_id)
+        self.assertEqual(res, {'done': 0, 'pending': True, 'total': 5})
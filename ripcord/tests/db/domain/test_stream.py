@@ -0,0 +1,56 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ripcord.common import exception
+from ripcord.db.sqlalchemy import api as db_api
+from ripcord.tests.db import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.project_id = '793491dd5fa8477eb2d6a820193a183b'
+        self.uuids = []
+        for x in range(5):
+            res = self.db_api.create_domain(
+                name='example%d.org' % x, project_id=self.project_id,
+                user_id='02d99a62af974b26b510c3564ba84644')
+            self.uuids.append(res['uuid'])
+
+    def test_success(self):
+        self.stubs.Set(db_api, '_STREAM_BATCH_SIZE', 2)
+        res = self.db_api.stream_domains(project_id=self.project_id)
+
+        self.assertEqual([r['uuid'] for r in res], self.uuids)
+
+    def test_sort(self):
+        res = self.db_api.stream_domains(
+            project_id=self.project_id, sort_key='name', sort_dir='desc')
+
+        self.assertEqual([r['uuid'] for r in res], self.uuids[::-1])
+
+    def test_other_project(self):
+        res = self.db_api.stream_domains(
+            project_id='5fccabbb-9d65-417f-8b0b-a2fc77b501e6')
+
+        self.assertEqual(list(res), [])
+
+    def test_invalid_sort(self):
+        self.assertRaises(
+            exception.InvalidParameterValue,
+            self.db_api.stream_domains, project_id=self.project_id,
+            sort_key='foo')
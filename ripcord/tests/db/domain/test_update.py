@@ -35,6 +35,7 @@ class TestCase(base.FunctionalTest):
             'name': 'example.org',
             'id': 1,
             'project_id': '793491dd5fa8477eb2d6a820193a183b',
+            'rehash_marker': None,
             'updated_at': None,
             'user_id': '02d99a62af974b26b510c3564ba84644',
         }
@@ -48,6 +49,7 @@ class TestCase(base.FunctionalTest):
             'name': 'example.net',
             'id': 1,
             'project_id': '02d99a62af974b26b510c3564ba84644',
+            'rehash_marker': 0,
             'user_id': '793491dd5fa8477eb2d6a820193a183b',
         }
         res = self.db_api.update_domain(
@@ -71,6 +73,7 @@ class TestCase(base.FunctionalTest):
             'name': 'example.org',
             'id': 1,
             'project_id': '793491dd5fa8477eb2d6a820193a183b',
+            'rehash_marker': None,
             'updated_at': None,
             'user_id': '02d99a62af974b26b510c3564ba84644',
         }
@@ -0,0 +1,85 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ripcord.db.sqlalchemy import api as sqlalchemy_api
+from ripcord.tests.db import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.project_id = '793491dd5fa8477eb2d6a820193a183b'
+
+        self.db_api.set_quota_class(
+            class_name='default', resource='domains', hard_limit=5)
+        self.db_api.set_quota_class(
+            class_name='default', resource='subscribers', hard_limit=50)
+        self.db_api.set_quota_class(
+            class_name='gold', resource='subscribers', hard_limit=500)
+
+    def test_defaults(self):
+        self.assertEqual(
+            self.db_api.get_quota_limits(),
+            {'domains': 5, 'subscribers': 50})
+
+    def test_project(self):
+        self.db_api.set_quota(
+            project_id=self.project_id, resource='subscribers',
+            hard_limit=None)
+
+        self.assertEqual(
+            self.db_api.get_quota_limits(project_id=self.project_id),
+            {'domains': 5, 'subscribers': -1})
+        self.assertEqual(
+            self.db_api.get_quota_limits(
+                project_id='5fccabbb-9d65-417f-8b0b-a2fc77b501e6'),
+            {'domains': 5, 'subscribers': 50})
+
+    def test_cached(self):
+        self.db_api.get_quota_limits(project_id=self.project_id)
+        self.db_api.get_quota_limits(project_id=self.project_id)
+
+        self.assertEqual(sqlalchemy_api._QUOTA_LIMIT_CACHE.stats(), {
+            'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_set_quota_invalidates(self):
+        self.db_api.get_quota_limits(project_id=self.project_id)
+        self.db_api.set_quota(
+            project_id=self.project_id, resource='domains', hard_limit=10)
+        self.db_api.set_quota(
+            project_id=self.project_id, resource='domains', hard_limit=20)
+
+        self.assertEqual(
+            self.db_api.get_quota_limits(project_id=self.project_id),
+            {'domains': 20, 'subscribers': 50})
+
+    def test_set_quota_class_invalidates(self):
+        self.db_api.get_quota_limits(project_id=self.project_id)
+        self.db_api.set_quota_class(
+            class_name='default', resource='domains', hard_limit=1)
+
+        self.assertEqual(
+            self.db_api.get_quota_limits(project_id=self.project_id),
+            {'domains': 1, 'subscribers': 50})
+
+    def test_ttl(self):
+        self.flags(quota_limit_cache_ttl=0, group='quotas')
+        self.db_api.get_quota_limits(project_id=self.project_id)
+        self.db_api.get_quota_limits(project_id=self.project_id)
+
+        self.assertEqual(sqlalchemy_api._QUOTA_LIMIT_CACHE.stats(), {
+            'hits': 0, 'misses': 2, 'size': 1})
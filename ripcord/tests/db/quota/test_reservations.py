@@ -0,0 +1,112 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+from ripcord.common import exception
+from ripcord.db.sqlalchemy import models
+from ripcord.openstack.common.db.sqlalchemy import session as db_session
+from ripcord.openstack.common import timeutils
+from ripcord.tests.db import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.project_id = '793491dd5fa8477eb2d6a820193a183b'
+        self.user_id = '02d99a62af974b26b510c3564ba84644'
+        self.expire = timeutils.utcnow() + datetime.timedelta(seconds=60)
+
+        res = self.db_api.create_domain(
+            name='example.org', project_id=self.project_id,
+            user_id=self.user_id)
+        self.domain_id = res['uuid']
+
+    def _get_reserved(self, resource):
+        session = db_session.get_session()
+        res = session.query(models.QuotaUsage).filter_by(
+            project_id=self.project_id, resource=resource).one()
+
+        return res['reserved']
+
+    def _reserve(self, expire=None, **deltas):
+        return self.db_api.reserve_quotas(
+            project_id=self.project_id, deltas=deltas,
+            limits={'domains': 2, 'subscribers': 3},
+            expire=expire or self.expire)
+
+    def test_reserve(self):
+        res = self._reserve(domains=1, subscribers=3)
+
+        self.assertEqual(len(res), 2)
+        self.assertEqual(self._get_reserved('domains'), 1)
+        self.assertEqual(self._get_reserved('subscribers'), 3)
+
+    def test_reserve_over_quota(self):
+        self._reserve(subscribers=2)
+        self.assertRaises(
+            exception.OverQuota, self._reserve, domains=1, subscribers=2)
+
+        self.assertEqual(self._get_reserved('domains'), 0)
+        self.assertEqual(self._get_reserved('subscribers'), 2)
+
+    def test_reserve_counts_usage(self):
+        self.assertRaises(exception.OverQuota, self._reserve, domains=2)
+        self._reserve(domains=1)
+
+    def test_reserve_unlimited(self):
+        res = self.db_api.reserve_quotas(
+            project_id=self.project_id, deltas={'subscribers': 100},
+            limits={'subscribers': -1}, expire=self.expire)
+
+        self.assertEqual(len(res), 1)
+        self.assertEqual(self._get_reserved('subscribers'), 100)
+
+    def test_commit(self):
+        res = self._reserve(subscribers=3)
+        self.db_api.create_subscriber(
+            username='alice', domain_id=self.domain_id, password='foobar',
+            user_id=self.user_id, project_id=self.project_id)
+
+        self.assertEqual(self.db_api.commit_reservations(uuids=res), 1)
+        self.assertEqual(self._get_reserved('subscribers'), 0)
+        self.assertRaises(exception.OverQuota, self._reserve, subscribers=3)
+        self._reserve(subscribers=2)
+
+    def test_rollback(self):
+        res = self._reserve(subscribers=3)
+
+        self.assertEqual(self.db_api.rollback_reservations(uuids=res), 1)
+        self.assertEqual(self.db_api.rollback_reservations(uuids=res), 0)
+        self.assertEqual(self._get_reserved('subscribers'), 0)
+
+    def test_expire(self):
+        self._reserve(subscribers=1)
+        self._reserve(
+            subscribers=1,
+            expire=timeutils.utcnow() - datetime.timedelta(seconds=1))
+
+        self.assertEqual(self.db_api.expire_reservations(), 1)
+        self.assertEqual(self._get_reserved('subscribers'), 1)
+
+    def test_reserve_releases_expired(self):
+        self._reserve(
+            subscribers=3,
+            expire=timeutils.utcnow() - datetime.timedelta(seconds=1))
+        self._reserve(subscribers=3)
+
+        self.assertEqual(self._get_reserved('subscribers'), 3)
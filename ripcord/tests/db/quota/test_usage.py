@@ -0,0 +1,129 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ripcord.common import exception
+from ripcord.db.sqlalchemy import models
+from ripcord.openstack.common.db.sqlalchemy import session as db_session
+from ripcord.tests.db import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.project_id = '793491dd5fa8477eb2d6a820193a183b'
+        self.user_id = '02d99a62af974b26b510c3564ba84644'
+
+        res = self.db_api.create_domain(
+            name='example.org', project_id=self.project_id,
+            user_id=self.user_id)
+        self.domain_id = res['uuid']
+
+    def _create_subscriber(self, username, project_id=None):
+        return self.db_api.create_subscriber(
+            username=username, domain_id=self.domain_id, password='foobar',
+            user_id=self.user_id, project_id=project_id or self.project_id)
+
+    def test_create(self):
+        self._create_subscriber(username='alice')
+        self._create_subscriber(username='bob')
+
+        self.assertEqual(
+            self.db_api.get_quota_usages(project_id=self.project_id),
+            {'domains': 1, 'subscribers': 2})
+
+    def test_create_bulk(self):
+        self._create_subscriber(username='alice')
+        self.db_api.create_subscribers(
+            subscribers=[
+                {'domain_id': self.domain_id, 'password': 'foobar',
+                 'username': username}
+                for username in ['alice', 'bob', 'charlie']],
+            user_id=self.user_id, project_id=self.project_id)
+
+        self.assertEqual(
+            self.db_api.get_quota_usages(project_id=self.project_id),
+            {'domains': 1, 'subscribers': 3})
+
+    def test_create_domain_not_found(self):
+        self.assertRaises(
+            exception.DomainNotFound, self.db_api.create_subscriber,
+            username='alice', domain_id='0eda016a-b078-4bef-94ba-1ab10fe15a7d',
+            password='foobar', user_id=self.user_id,
+            project_id=self.project_id)
+
+        self.assertEqual(
+            self.db_api.get_quota_usages(project_id=self.project_id),
+            {'domains': 1, 'subscribers': 0})
+
+    def test_delete(self):
+        res = self._create_subscriber(username='alice')
+        self.db_api.delete_subscriber(uuid=res['uuid'])
+        self.db_api.delete_domain(uuid=self.domain_id)
+
+        self.assertEqual(
+            self.db_api.get_quota_usages(project_id=self.project_id),
+            {'domains': 0, 'subscribers': 0})
+
+    def test_update_project(self):
+        project_id = '5fccabbb-9d65-417f-8b0b-a2fc77b501e6'
+        res = self._create_subscriber(username='alice')
+        self.db_api.update_subscriber(uuid=res['uuid'], project_id=project_id)
+        self.db_api.update_domain(uuid=self.domain_id, project_id=project_id)
+
+        self.assertEqual(
+            self.db_api.get_quota_usages(project_id=self.project_id),
+            {'domains': 0, 'subscribers': 0})
+        self.assertEqual(
+            self.db_api.get_quota_usages(project_id=project_id),
+            {'domains': 1, 'subscribers': 1})
+
+    def test_refresh(self):
+        self._create_subscriber(username='alice')
+        self._create_subscriber(
+            username='bob', project_id='5fccabbb-9d65-417f-8b0b-a2fc77b501e6')
+
+        session = db_session.get_session()
+        session.query(models.QuotaUsage).filter_by(
+            project_id=self.project_id, resource='subscribers'
+        ).update({'in_use': 5})
+        session.query(models.QuotaUsage).filter_by(
+            project_id='5fccabbb-9d65-417f-8b0b-a2fc77b501e6'
+        ).delete()
+
+        res = self.db_api.refresh_quota_usages()
+
+        self.assertEqual(sorted(res), [
+            ('5fccabbb-9d65-417f-8b0b-a2fc77b501e6', 'subscribers', 0, 1),
+            (self.project_id, 'subscribers', 5, 1),
+        ])
+        self.assertEqual(
+            self.db_api.get_quota_usages(
+                project_id='5fccabbb-9d65-417f-8b0b-a2fc77b501e6'),
+            {'subscribers': 1})
+        self.assertEqual(self.db_api.refresh_quota_usages(), [])
+
+    def test_refresh_project(self):
+        self._create_subscriber(username='alice')
+
+        session = db_session.get_session()
+        session.query(models.QuotaUsage).filter_by(
+            project_id=self.project_id, resource='domains'
+        ).update({'in_use': 3})
+
+        res = self.db_api.refresh_quota_usages(project_id=self.project_id)
+
+        self.assertEqual(res, [(self.project_id, 'domains', 3, 1)])
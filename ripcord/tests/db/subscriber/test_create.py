@@ -118,3 +118,60 @@ class TestCase(base.FunctionalTest):
             username=row['username'], domain_id=row['domain_id'],
             password=row['password'], user_id=row['user_id'],
             project_id=row['project_id'])
+
+    def test_bulk(self):
+        subscribers = [{
+            'domain_id': self.domain_id,
+            'password': 'foobar',
+            'username': 'alice',
+        }, {
+            'domain_id': '0eda016a-b078-4bef-94ba-1ab10fe15a7d',
+            'password': 'foobar',
+            'username': 'bob',
+        }, {
+            'domain_id': self.domain_id,
+            'password': 'foobar',
+            'username': 'alice',
+        }, {
+            'description': 'a subscriber',
+            'disabled': True,
+            'domain_id': self.domain_id,
+            'email': 'charlie@example.org',
+            'password': 'foobar',
+            'rpid': 'charlie@example.org',
+            'username': 'charlie',
+        }]
+
+        res = self.db_api.create_subscribers(
+            subscribers=subscribers, user_id=self.user_id,
+            project_id=self.project_id)
+
+        self.assertEqual(len(res), 4)
+        self.assertEqual(res[0]['ha1'], '84ed3e3a76703c1044da21c8609334a2')
+        self.assertEqual(res[0]['ha1b'], '2dc0ac0e03670d8474db6b1e62df8fd1')
+        self.assertTrue(isinstance(res[1], exception.DomainNotFound))
+        self.assertTrue(
+            isinstance(res[2], exception.SubscriberAlreadyExists))
+
+        for r in [res[0], res[3]]:
+            tmp = self.db_api.get_subscriber(uuid=r['uuid'])
+            for k in ['description', 'disabled', 'domain_id',
+                      'email_address', 'ha1', 'ha1b', 'password',
+                      'project_id', 'rpid', 'user_id', 'username']:
+                self.assertEqual(tmp[k], r[k])
+            self.assertEqual(type(tmp['created_at']), datetime.datetime)
+
+    def test_bulk_already_exists(self):
+        self.db_api.create_subscriber(
+            username='alice', domain_id=self.domain_id, password='foobar',
+            user_id=self.user_id, project_id=self.project_id)
+
+        res = self.db_api.create_subscribers(
+            subscribers=[{
+                'domain_id': self.domain_id,
+                'password': 'foobar',
+                'username': 'alice',
+            }], user_id=self.user_id, project_id=self.project_id)
+
+        self.assertTrue(
+            isinstance(res[0], exception.SubscriberAlreadyExists))
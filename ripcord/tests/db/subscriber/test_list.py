@@ -16,6 +16,7 @@
 
 import datetime
 
+from ripcord.common import exception
 from ripcord.openstack.common import uuidutils
 from ripcord.tests.db import base
 
@@ -69,3 +70,48 @@ class TestCase(base.FunctionalTest):
         # NOTE(pabelanger): We add 3 because of created_at, uuid, and hidden
         # sqlalchemy object.
         self.assertEqual(len(res[0].__dict__), len(row) + 3)
+
+    def test_columns(self):
+        res = self.db_api.create_subscriber(
+            username='alice', domain_id=self.domain_id, password='foobar',
+            user_id=self.user_id, project_id=self.project_id)
+
+        with self.assertQueryCount(1):
+            res = self.db_api.list_subscribers(
+                project_id=self.project_id, columns=('username', 'ha1'))
+        self.assertEqual(
+            res, [{'username': 'alice',
+                   'ha1': '84ed3e3a76703c1044da21c8609334a2'}])
+
+    def test_columns_invalid(self):
+        self.assertRaises(
+            exception.InvalidParameterValue, self.db_api.list_subscribers,
+            project_id=self.project_id, columns=('username', 'foo'))
+
+    def test_limit_and_marker(self):
+        uuids = []
+        for username in ['alice', 'bob', 'charlie']:
+            res = self.db_api.create_subscriber(
+                username=username, domain_id=self.domain_id,
+                password='foobar', user_id=self.user_id,
+                project_id=self.project_id)
+            uuids.append(res['uuid'])
+
+        res = self.db_api.list_subscribers(
+            project_id=self.project_id, limit=2)
+        self.assertEqual([r['uuid'] for r in res], uuids[:2])
+
+        res = self.db_api.list_subscribers(
+            project_id=self.project_id, limit=2, marker=uuids[1])
+        self.assertEqual([r['uuid'] for r in res], uuids[2:])
+
+        res = self.db_api.list_subscribers(
+            project_id=self.project_id, sort_key='username',
+            sort_dir='desc')
+        self.assertEqual([r['uuid'] for r in res], uuids[::-1])
+
+    def test_marker_not_found(self):
+        self.assertRaises(
+            exception.MarkerNotFound,
+            self.db_api.list_subscribers, project_id=self.project_id,
+            marker='0eda016a-b078-4bef-94ba-1ab10fe15a7d')
@@ -134,3 +134,37 @@ class TestCase(base.FunctionalTest):
         # NOTE(pabelanger): We add 3 because of created_at, uuid, and hidden
         # sqlalchemy object.
         self.assertEqual(len(res.__dict__), len(row) + 3)
+
+    def test_digest(self):
+        res = self.db_api.create_domain(
+            name='example.net', project_id=self.project_id,
+            user_id=self.user_id)
+        domain_id = res['uuid']
+
+        tmp = self.db_api.create_subscriber(
+            username='alice', domain_id=self.domain_id, password='foobar',
+            user_id=self.user_id, project_id=self.project_id)
+        self.assertEqual(tmp['ha1'], '84ed3e3a76703c1044da21c8609334a2')
+
+        res = self.db_api.update_subscriber(
+            uuid=tmp['uuid'], domain_id=domain_id)
+        self.assertEqual(res['ha1'], '1f66286e1db577f81e06c22c017c137b')
+        self.assertEqual(res['ha1b'], '88bb93a6b9273446665753b5972265a8')
+
+        res = self.db_api.update_subscriber(
+            uuid=tmp['uuid'], description='a subscriber')
+        self.assertEqual(res['ha1'], '1f66286e1db577f81e06c22c017c137b')
+
+        res = self.db_api.get_subscriber(uuid=tmp['uuid'])
+        self.assertEqual(res['description'], 'a subscriber')
+        self.assertEqual(res['ha1'], '1f66286e1db577f81e06c22c017c137b')
+
+    def test_domain_not_found(self):
+        tmp = self.db_api.create_subscriber(
+            username='alice', domain_id=self.domain_id, password='foobar',
+            user_id=self.user_id, project_id=self.project_id)
+
+        self.assertRaises(
+            exception.DomainNotFound,
+            self.db_api.update_subscriber, uuid=tmp['uuid'],
+            domain_id='0eda016a-b078-4bef-94ba-1ab10fe15a7d')
@@ -0,0 +1,287 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from ripcord.common import exception
+from ripcord.common import utils
+from ripcord.db import api as db_api
+from ripcord.db import cache
+from ripcord.db.sqlalchemy import api as sqlalchemy_api
+from ripcord.tests.db import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.project_id = '793491dd5fa8477eb2d6a820193a183b'
+        self.user_id = '02d99a62af974b26b510c3564ba84644'
+
+    def _create_domain(self, name='example.org'):
+        return self.db_api.create_domain(
+            name=name, project_id=self.project_id, user_id=self.user_id)
+
+    def _create_subscriber(self, domain_id, username='alice'):
+        return self.db_api.create_subscriber(
+            username=username, domain_id=domain_id, password='foobar',
+            user_id=self.user_id, project_id=self.project_id)
+
+    def _set_backend(self, backend):
+        self.flags(entity_cache_backend=backend, group='database')
+        cache.reset()
+
+    def test_write_through(self):
+        domain = self._create_domain()
+        subscriber = self._create_subscriber(domain_id=domain['uuid'])
+
+        self.db_api.get_domain(uuid=domain['uuid'])
+        self.db_api.get_subscriber(uuid=subscriber['uuid'])
+
+        stats = self.db_api.get_entity_cache_stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 0)
+        self.assertEqual(stats['size'], 2)
+
+    def test_update(self):
+        domain = self._create_domain()
+        subscriber = self._create_subscriber(domain_id=domain['uuid'])
+        self.db_api.update_domain(uuid=domain['uuid'], disabled=True)
+        self.db_api.update_subscriber(
+            uuid=subscriber['uuid'], email='alice@example.org')
+
+        res = self.db_api.get_domain(uuid=domain['uuid'])
+        self.assertEqual(res['disabled'], True)
+        res = self.db_api.get_subscriber(uuid=subscriber['uuid'])
+        self.assertEqual(res['email_address'], 'alice@example.org')
+        self.assertEqual(self.db_api.get_entity_cache_stats()['hits'], 2)
+
+    def test_delete(self):
+        domain = self._create_domain()
+        subscriber = self._create_subscriber(domain_id=domain['uuid'])
+        self.db_api.delete_subscriber(uuid=subscriber['uuid'])
+        self.db_api.delete_domain(uuid=domain['uuid'])
+
+        self.assertRaises(
+            exception.SubscriberNotFound, self.db_api.get_subscriber,
+            uuid=subscriber['uuid'])
+        self.assertRaises(
+            exception.DomainNotFound, self.db_api.get_domain,
+            uuid=domain['uuid'])
+        self.assertEqual(self.db_api.get_entity_cache_stats()['misses'], 2)
+
+    def test_update_during_read(self):
+        domain = self._create_domain()
+        subscriber = self._create_subscriber(domain_id=domain['uuid'])
+        cache.get_cache().clear()
+        get_subscriber = self.db_api.IMPL.get_subscriber
+
+        def racing_read(uuid):
+            # NOTE(pabelanger): The row is read before the update commits,
+            # but returned after the update filled the cache.
+            res = get_subscriber(uuid=uuid)
+            self.db_api.update_subscriber(uuid=uuid, password='barfoo')
+            return res
+
+        self.stubs.Set(self.db_api.IMPL, 'get_subscriber', racing_read)
+        res = self.db_api.get_subscriber(uuid=subscriber['uuid'])
+        self.assertEqual(res['password'], 'foobar')
+        self.stubs.UnsetAll()
+
+        res = self.db_api.get_subscriber(uuid=subscriber['uuid'])
+        self.assertEqual(res['password'], 'barfoo')
+
+    def test_create_during_read(self):
+        uuid = '0eda016a-b078-4bef-94ba-1ab10fe15a7d'
+        domain = {'name': 'example.org', 'uuid': uuid}
+
+        def racing_read(uuid):
+            # NOTE(pabelanger): The domain is created, and written through
+            # to the cache, after the read found it missing.
+            cache.get_cache().set('domain', uuid, domain)
+            raise exception.DomainNotFound(uuid=uuid)
+
+        self.stubs.Set(self.db_api.IMPL, 'get_domain', racing_read)
+        self.assertRaises(
+            exception.DomainNotFound, self.db_api.get_domain, uuid=uuid)
+
+        self.assertEqual(cache.get_cache().get('domain', uuid), domain)
+
+    def test_rehash(self):
+        domain = self._create_domain()
+        subscriber = self._create_subscriber(domain_id=domain['uuid'])
+        other = self._create_subscriber(
+            domain_id=self._create_domain(name='example.com')['uuid'])
+        self.db_api.update_domain(uuid=domain['uuid'], name='example.net')
+        self.db_api.rehash_domain(uuid=domain['uuid'])
+
+        res = self.db_api.get_subscriber(uuid=subscriber['uuid'])
+        self.assertEqual(res['ha1'], '1f66286e1db577f81e06c22c017c137b')
+        self.db_api.get_subscriber(uuid=other['uuid'])
+
+        # NOTE(pabelanger): Only the subscribers of the renamed domain were
+        # dropped from the cache.
+        stats = self.db_api.get_entity_cache_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_negative(self):
+        uuid = '0eda016a-b078-4bef-94ba-1ab10fe15a7d'
+        for x in range(2):
+            self.assertRaises(
+                exception.DomainNotFound, self.db_api.get_domain, uuid=uuid)
+
+        stats = self.db_api.get_entity_cache_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['negative_hits'], 1)
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_negative_disabled(self):
+        self.flags(entity_cache_negative_ttl=0, group='database')
+        uuid = '0eda016a-b078-4bef-94ba-1ab10fe15a7d'
+        for x in range(2):
+            self.assertRaises(
+                exception.DomainNotFound, self.db_api.get_domain, uuid=uuid)
+
+        self.assertEqual(self.db_api.get_entity_cache_stats()['misses'], 2)
+
+    def test_not_uuid(self):
+        for x in range(2):
+            self.assertRaises(
+                exception.DomainNotFound, self.db_api.get_domain, uuid='foo')
+
+        stats = self.db_api.get_entity_cache_stats()
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['size'], 0)
+
+    def test_evictions(self):
+        self.flags(entity_cache_size=1, group='database')
+        self._create_domain(name='example.org')
+        self._create_domain(name='example.net')
+
+        stats = self.db_api.get_entity_cache_stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_ttl(self):
+        self.flags(entity_cache_ttl=0, group='database')
+        domain = self._create_domain()
+        self.db_api.get_domain(uuid=domain['uuid'])
+
+        self.assertEqual(self.db_api.get_entity_cache_stats()['misses'], 1)
+
+    def test_memcached(self):
+        self._set_backend('memcached')
+        domain = self._create_domain()
+
+        res = self.db_api.get_domain(uuid=domain['uuid'])
+        self.assertEqual(res['name'], 'example.org')
+        self.db_api.delete_domain(uuid=domain['uuid'])
+        self.assertRaises(
+            exception.DomainNotFound, self.db_api.get_domain,
+            uuid=domain['uuid'])
+
+        stats = self.db_api.get_entity_cache_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['size'], None)
+
+    def test_memcached_shared(self):
+        self._set_backend('memcached')
+        first = cache.get_cache()
+        # NOTE(pabelanger): Another worker, using the same memcached.
+        second = cache.EntityCache(cache.MemcachedBackend())
+        second.backend._client = first.backend._client
+        first.backend.shared = second.backend.shared = True
+
+        domain = self._create_domain()
+        self.assertEqual(second.get('domain', domain['uuid']), domain)
+
+        since = time.time()
+        self.db_api.update_domain(uuid=domain['uuid'], disabled=True)
+        res = second.get('domain', domain['uuid'])
+        self.assertEqual(res['disabled'], True)
+
+        # NOTE(pabelanger): A read started by the other worker before the
+        # delete does not cache the row it read.
+        self.db_api.delete_domain(uuid=domain['uuid'])
+        second.fill('domain', domain['uuid'], domain, since)
+        self.assertIsNone(second.get('domain', domain['uuid']))
+
+    def test_workers(self):
+        self.flags(workers=2, group='api')
+        for backend in ('memory', 'memcached'):
+            self._set_backend(backend)
+            self.assertIsInstance(
+                cache.get_cache().backend, cache.NoopBackend)
+
+        self._set_backend('none')
+        self.assertIsInstance(cache.get_cache().backend, cache.NoopBackend)
+
+    def test_none(self):
+        self._set_backend('none')
+        domain = self._create_domain()
+        self.db_api.get_domain(uuid=domain['uuid'])
+
+        self.assertEqual(self.db_api.get_entity_cache_stats()['misses'], 1)
+
+    def test_class_path(self):
+        self._set_backend('ripcord.db.cache.NoopBackend')
+
+        self.assertIsInstance(cache.get_cache().backend, cache.NoopBackend)
+
+    def _forget_writes(self):
+        sqlalchemy_api._LAST_WRITES.clear()
+        sqlalchemy_api.set_client(None)
+
+    def test_coalesce_reads(self):
+        self._set_backend('none')
+        domain = self._create_domain()
+        self._forget_writes()
+        self.addCleanup(self._forget_writes)
+
+        stats = self.db_api.get_read_coalescing_stats()
+        self.db_api.get_domain(uuid=domain['uuid'])
+        self.assertEqual(
+            self.db_api.get_read_coalescing_stats()['calls'],
+            stats['calls'] + 1)
+
+        stats = self.db_api.get_read_coalescing_stats()
+        self.flags(coalesce_reads=False, group='database')
+        self.db_api.get_domain(uuid=domain['uuid'])
+
+        self.assertEqual(self.db_api.get_read_coalescing_stats(), stats)
+
+    def test_coalesce_reads_after_write(self):
+        self._set_backend('none')
+        domain = self._create_domain()
+        self._forget_writes()
+        self.addCleanup(self._forget_writes)
+        self.db_api.set_client(self.project_id)
+
+        # NOTE(pabelanger): A flight started before the update below, which
+        # would answer with the domain as it was.
+        key = ('domain', domain['uuid'])
+        flight = utils._Flight()
+        flight.result = self.db_api.get_domain(uuid=domain['uuid'])
+        flight.done.set()
+        db_api._FLIGHTS._flights[key] = flight
+        self.addCleanup(db_api._FLIGHTS._flights.pop, key, None)
+
+        self.db_api.update_domain(uuid=domain['uuid'], disabled=True)
+        res = self.db_api.get_domain(uuid=domain['uuid'])
+
+        self.assertTrue(res['disabled'])
@@ -0,0 +1,55 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mock
+
+from ripcord.common import exception
+from ripcord.db.sqlalchemy import explain
+from ripcord.openstack.common.db.sqlalchemy import session as db_session
+from ripcord.tests.db import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def test_verify(self):
+        missing, scans = explain.verify()
+
+        self.assertEqual(missing, [])
+        self.assertEqual(scans, [])
+
+    def test_verify_scan(self):
+        db_session.get_engine().execute('DROP INDEX subscribers_uuid_idx')
+        missing, scans = explain.verify()
+
+        self.assertIn(
+            'get_subscriber', [function for function, _, _ in scans])
+        self.assertIn('SCAN', scans[0][2])
+
+    def test_verify_not_sqlite(self):
+        engine = mock.Mock()
+        engine.name = 'mysql'
+        self.stubs.Set(db_session, 'get_engine', lambda: engine)
+
+        self.assertRaises(exception.RipcordException, explain.verify)
+
+    def test_verify_missing(self):
+        self.stubs.Set(
+            explain, '_NO_QUERIES', explain._NO_QUERIES | set(['foo']))
+        self.stubs.Set(
+            explain, '_get_functions', lambda: set(['foo', 'bar']))
+        missing, scans = explain.verify()
+
+        self.assertEqual(missing, ['bar'])
@@ -0,0 +1,164 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+
+from sqlalchemy import exc
+from sqlalchemy import pool
+
+from ripcord.db.sqlalchemy import instrument
+from ripcord.openstack.common import context
+from ripcord.openstack.common import local
+from ripcord.tests.db import base
+
+
+class FakeTime(object):
+    """Clock moving 2 seconds forward every time it is read."""
+
+    def __init__(self):
+        self.now = 0
+
+    def time(self):
+        self.now += 2
+        return self.now
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.flags(entity_cache_backend='none', group='database')
+
+    def test_count(self):
+        stats = self.db_api.start_query_stats()
+        self.db_api.list_domains(project_id='793491dd5fa8477eb2d6a820193a183b')
+        self.db_api.stop_query_stats(stats)
+
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(len(stats.statements), 1)
+        self.assertTrue(stats.statements[0].startswith('SELECT'))
+        self.assertTrue(stats.elapsed > 0)
+
+    def test_nested(self):
+        outer = self.db_api.start_query_stats()
+        self.db_api.list_domains_rehash_pending()
+        inner = self.db_api.start_query_stats()
+        self.db_api.list_domains_rehash_pending()
+        self.db_api.stop_query_stats(inner)
+        self.db_api.list_domains_rehash_pending()
+        self.db_api.stop_query_stats(outer)
+
+        self.assertEqual(inner.count, 1)
+        self.assertEqual(outer.count, 3)
+
+    def test_stopped(self):
+        stats = self.db_api.start_query_stats()
+        self.db_api.stop_query_stats(stats)
+        self.db_api.list_domains_rehash_pending()
+
+        self.assertEqual(stats.count, 0)
+        self.assertEqual(stats.elapsed, 0)
+
+    def test_assert_query_count(self):
+        domain = self.db_api.create_domain(
+            name='example.org', project_id='793491dd5fa8477eb2d6a820193a183b',
+            user_id='02d99a62af974b26b510c3564ba84644')
+
+        with self.assertQueryCount(1):
+            self.db_api.get_domain(uuid=domain['uuid'])
+
+    def test_assert_query_count_mismatch(self):
+        def _list():
+            with self.assertQueryCount(0):
+                self.db_api.list_domains_rehash_pending()
+
+        self.assertRaises(AssertionError, _list)
+
+    def test_pool_stats(self):
+        self.db_api.list_domains_rehash_pending()
+        res = self.db_api.get_pool_stats()['main']
+
+        self.assertTrue(res['checkouts'] > 0)
+        self.assertEqual(res['checkout_time']['count'], res['checkouts'])
+        self.assertEqual(res['timeouts'], 0)
+
+    def test_pool_stats_queue_pool(self):
+        queue_pool = pool.QueuePool(
+            lambda: sqlite3.connect(':memory:'), pool_size=1, max_overflow=0,
+            timeout=0.01)
+        instrument.watch_pool(queue_pool, 'test')
+        instrument.watch_pool(queue_pool, 'test')
+        self.addCleanup(instrument._POOL_STATS.pop, 'test')
+
+        conn = queue_pool.connect()
+        res = instrument.get_pool_stats()['test']
+        self.assertEqual(res['checked_out'], 1)
+        self.assertEqual(res['overflow'], 0)
+        self.assertEqual(res['size'], 1)
+
+        self.assertRaises(exc.TimeoutError, queue_pool.connect)
+        conn.close()
+
+        res = instrument.get_pool_stats()['test']
+        self.assertEqual(res['checked_in'], 1)
+        self.assertEqual(res['checked_out'], 0)
+        self.assertEqual(res['checkouts'], 2)
+        self.assertEqual(res['timeouts'], 1)
+        self.assertEqual(res['checkout_time']['count'], 2)
+        self.assertTrue(res['checkout_time']['sum'] >= 0.01)
+
+    def test_slow_query(self):
+        self.flags(slow_query_stack_rate=0, group='database')
+        self.stubs.Set(instrument, 'time', FakeTime())
+        ctx = context.RequestContext(request_id='req-1')
+        local.store.context = ctx
+
+        self.db_api.list_domains(project_id='793491dd5fa8477eb2d6a820193a183b')
+
+        output = self.log_fixture.output
+        self.assertIn('Slow query, 2000.0ms in list_domains for request '
+                      'req-1: SELECT ', output)
+        self.assertIn('parameters: (str)', output)
+        self.assertNotIn('test_instrument.py', output)
+
+    def test_slow_query_stack(self):
+        self.flags(slow_query_stack_rate=1, group='database')
+        self.stubs.Set(instrument, 'time', FakeTime())
+
+        self.db_api.list_domains_rehash_pending()
+
+        output = self.log_fixture.output
+        self.assertIn('in list_domains_rehash_pending for request -', output)
+        self.assertIn('test_instrument.py', output)
+        self.assertNotIn('sqlalchemy/engine', output)
+
+    def test_slow_query_disabled(self):
+        self.flags(slow_query_threshold=0, group='database')
+        self.stubs.Set(instrument, 'time', FakeTime())
+
+        self.db_api.list_domains_rehash_pending()
+        self.assertNotIn('Slow query', self.log_fixture.output)
+
+    def test_parameter_shape(self):
+        self.assertEqual(
+            instrument._parameter_shape((u'a', 1, None), False),
+            '(unicode, int, NoneType)')
+        self.assertEqual(
+            instrument._parameter_shape({'b': 1, 'a': 'x'}, False),
+            '{a: str, b: int}')
+        self.assertEqual(
+            instrument._parameter_shape([(1,), (2,)], True), '2 x (int)')
+        self.assertEqual(instrument._parameter_shape((), False), '()')
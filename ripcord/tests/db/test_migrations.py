@@ -366,3 +366,83 @@ class TestRipcordMigrations(test_migrations.BaseMigrationTestCase,
 
     def _post_downgrade_008(self, engine):
         self.assertColumnNotExists(engine, 'subscribers', 'description')
+
+    def _check_009(self, engine, data):
+        self.assertColumnExists(engine, 'domains', 'rehash_marker')
+        table = db_utils.get_table(engine, 'domains')
+
+        self.assertIsInstance(
+            table.c.rehash_marker.type, sqlalchemy.types.Integer)
+
+        domains = table.select().where(
+            table.c.rehash_marker == None).execute().fetchall()  #flake8: noqa
+        self.assertEqual(len(domains), 1)
+
+    def _post_downgrade_009(self, engine):
+        self.assertColumnNotExists(engine, 'domains', 'rehash_marker')
+
+    def _check_010(self, engine, data):
+        table = db_utils.get_table(engine, 'quota_usages')
+
+        for c in ['id', 'created_at', 'in_use', 'project_id', 'resource',
+                  'updated_at']:
+            self.assertIn(c, table.c)
+
+        for resource in ['domains', 'subscribers']:
+            counted = db_utils.get_table(engine, resource)
+            expected = sqlalchemy.select(
+                [counted.c.project_id, sqlalchemy.func.count(counted.c.id)]
+            ).group_by(counted.c.project_id).execute().fetchall()
+
+            usages = table.select().where(
+                table.c.resource == resource).execute().fetchall()
+            self.assertEqual(
+                dict((r.project_id, r.in_use) for r in usages),
+                dict(expected))
+
+        insert = table.insert()
+        data = dict(in_use=0, project_id='project1', resource='foo')
+
+        insert.execute(data)
+        self.assertRaises(exc.IntegrityError, insert.execute, data)
+
+    def _post_downgrade_010(self, engine):
+        self.assertRaises(
+            exc.NoSuchTableError, db_utils.get_table, engine, 'quota_usages')
+
+    def _check_011(self, engine, data):
+        self.assertColumnExists(engine, 'quota_usages', 'reserved')
+        self.assertIndexExists(
+            engine, 'reservations', 'reservations_project_id_expire_idx')
+        table = db_utils.get_table(engine, 'quota_usages')
+
+        usages = table.select().where(
+            table.c.reserved != 0).execute().fetchall()
+        self.assertEqual(len(usages), 0)
+
+        table = db_utils.get_table(engine, 'reservations')
+        for c in ['id', 'created_at', 'delta', 'expire', 'project_id',
+                  'resource', 'updated_at', 'uuid']:
+            self.assertIn(c, table.c)
+
+    def _check_012(self, engine, data):
+        for table, index in [
+                ('domains', 'domains_project_id_id_idx'),
+                ('domains', 'domains_rehash_marker_idx'),
+                ('quota_classes', 'quota_classes_class_name_resource_idx'),
+                ('reservations', 'reservations_expire_idx'),
+                ('subscribers', 'subscribers_domain_id_id_idx'),
+                ('subscribers', 'subscribers_project_id_id_idx'),
+                ('subscribers', 'subscribers_uuid_idx')]:
+            self.assertIndexExists(engine, table, index)
+
+    def _post_downgrade_012(self, engine):
+        self.assertIndexNotExists(
+            engine, 'subscribers', 'subscribers_project_id_id_idx')
+        self.assertIndexNotExists(
+            engine, 'subscribers', 'subscribers_uuid_idx')
+
+    def _post_downgrade_011(self, engine):
+        self.assertColumnNotExists(engine, 'quota_usages', 'reserved')
+        self.assertRaises(
+            exc.NoSuchTableError, db_utils.get_table, engine, 'reservations')
@@ -0,0 +1,176 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2013 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+
+import fixtures
+import sqlalchemy
+
+from ripcord.common import exception
+from ripcord.db.sqlalchemy import api as sqlalchemy_api
+from ripcord.db.sqlalchemy import models
+from ripcord.openstack.common.db.sqlalchemy import session
+from ripcord.tests.db import base
+
+
+class TestCase(base.FunctionalTest):
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.project_id = '793491dd5fa8477eb2d6a820193a183b'
+        self.user_id = '02d99a62af974b26b510c3564ba84644'
+
+        # NOTE(pabelanger): A SQLite file stands in for the replica.
+        path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'replica.sqlite')
+        self.replica = sqlalchemy.create_engine('sqlite:///%s' % path)
+        models.Base.metadata.create_all(self.replica)
+
+        self.flags(slave_connection='sqlite:///%s' % path, group='database')
+        # NOTE(pabelanger): Cached entities would hide where reads go.
+        self.flags(entity_cache_backend='none', group='database')
+        self.addCleanup(self._reset_replica)
+        self._reset_replica()
+
+    def _reset_replica(self):
+        if session._SLAVE_ENGINE:
+            session._SLAVE_ENGINE.dispose()
+        session._SLAVE_ENGINE = None
+        session._SLAVE_MAKER = None
+        sqlalchemy_api._LAST_WRITES.clear()
+        sqlalchemy_api._REPLICA_STATE['failed_at'] = 0
+        sqlalchemy_api.set_client(None)
+
+    def _create_replica_domain(self, name):
+        uuid = '0eda016a-b078-4bef-94ba-1ab10fe15a7d'
+        self.replica.execute(models.Domain.__table__.insert().values(
+            name=name, project_id=self.project_id, user_id=self.user_id,
+            uuid=uuid))
+
+        return uuid
+
+    def test_reads_use_replica(self):
+        uuid = self._create_replica_domain(name='example.org')
+
+        res = self.db_api.get_domain(uuid=uuid)
+        self.assertEqual(res['name'], 'example.org')
+
+        res = self.db_api.list_domains(project_id=self.project_id)
+        self.assertEqual([r['uuid'] for r in res], [uuid])
+
+    def test_stream_domains_use_replica(self):
+        uuid = self._create_replica_domain(name='example.org')
+
+        res = self.db_api.stream_domains(project_id=self.project_id)
+        self.assertEqual([r['uuid'] for r in res], [uuid])
+
+    def test_stream_subscribers_use_replica(self):
+        uuid = self._create_replica_domain(name='example.org')
+        self.replica.execute(models.Subscriber.__table__.insert().values(
+            domain_id=uuid, project_id=self.project_id, user_id=self.user_id,
+            username='alice', uuid='5fccabbb-9d65-417f-8b0b-a2fc77b501e6'))
+
+        res = self.db_api.stream_subscribers(project_id=self.project_id)
+        self.assertEqual(
+            [r['uuid'] for r in res], ['5fccabbb-9d65-417f-8b0b-a2fc77b501e6'])
+
+    def test_writes_use_primary(self):
+        self.db_api.set_client(self.project_id)
+        res = self.db_api.create_domain(
+            name='example.org', project_id=self.project_id,
+            user_id=self.user_id)
+
+        rows = self.replica.execute(
+            models.Domain.__table__.select()).fetchall()
+        self.assertEqual(rows, [])
+
+        # NOTE(pabelanger): Reads from the update go to the primary, the
+        # domain doesn't exist on the replica.
+        self.db_api.update_domain(uuid=res['uuid'], disabled=True)
+
+    def test_read_your_writes(self):
+        self.db_api.set_client(self.project_id)
+        res = self.db_api.create_domain(
+            name='example.org', project_id=self.project_id,
+            user_id=self.user_id)
+
+        tmp = self.db_api.get_domain(uuid=res['uuid'])
+        self.assertEqual(tmp['name'], 'example.org')
+
+        self.db_api.set_client('5fccabbb-9d65-417f-8b0b-a2fc77b501e6')
+        self.assertRaises(
+            exception.DomainNotFound, self.db_api.get_domain,
+            uuid=res['uuid'])
+
+        self.flags(replica_read_after_write=0, group='database')
+        self.db_api.set_client(self.project_id)
+        self.assertRaises(
+            exception.DomainNotFound, self.db_api.get_domain,
+            uuid=res['uuid'])
+
+    def test_read_your_writes_last_write(self):
+        uuid = self._create_replica_domain(name='example.org')
+        self.db_api.set_client(self.project_id)
+        self.assertIsNone(self.db_api.get_last_write())
+
+        # NOTE(pabelanger): A write made through another worker, as told by
+        # the client, sends its reads to the primary database.
+        self.db_api.set_client(self.project_id, last_write=time.time())
+        self.assertRaises(
+            exception.DomainNotFound, self.db_api.get_domain, uuid=uuid)
+
+        self.db_api.set_client(self.project_id, last_write=time.time() - 60)
+        self.assertEqual(
+            self.db_api.get_domain(uuid=uuid)['name'], 'example.org')
+
+        self.db_api.create_domain(
+            name='example.net', project_id=self.project_id,
+            user_id=self.user_id)
+        self.assertTrue(self.db_api.get_last_write())
+
+    def test_quota_limits_use_primary(self):
+        self.db_api.set_quota(
+            project_id=self.project_id, resource='domains', hard_limit=5)
+        sqlalchemy_api._LAST_WRITES.clear()
+
+        # NOTE(pabelanger): The replica has not seen the new limit yet, it
+        # must not be cached.
+        self.assertEqual(
+            self.db_api.get_quota_limits(project_id=self.project_id)[
+                'domains'], 5)
+
+    def test_replica_failure(self):
+        models.Base.metadata.drop_all(self.replica)
+        res = self.db_api.create_domain(
+            name='example.org', project_id=self.project_id,
+            user_id=self.user_id)
+        self.flags(replica_read_after_write=0, group='database')
+
+        tmp = self.db_api.get_domain(uuid=res['uuid'])
+        self.assertEqual(tmp['name'], 'example.org')
+        self.assertTrue(sqlalchemy_api._REPLICA_STATE['failed_at'])
+
+        # NOTE(pabelanger): Until replica_retry_interval passes, reads stay
+        # on the primary database without trying the replica.
+        models.Base.metadata.create_all(self.replica)
+        tmp = self.db_api.get_domain(uuid=res['uuid'])
+        self.assertEqual(tmp['name'], 'example.org')
+
+        self.flags(replica_retry_interval=0, group='database')
+        self.assertRaises(
+            exception.DomainNotFound, self.db_api.get_domain,
+            uuid=res['uuid'])
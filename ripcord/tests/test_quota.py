@@ -14,10 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
+
 from oslo.config import cfg
 
 from ripcord.common import exception
 from ripcord.db import api as db_api
+from ripcord.openstack.common import timeutils
 from ripcord import quota
 from ripcord import test
 
@@ -29,15 +32,32 @@ class FakeDriver(object):
     def __init__(self):
         self.called = []
 
+    def commit(self, reservations, project_id=None):
+        self.called.append(('commit', reservations, project_id))
+
     def get_defaults(self, resources):
         self.called.append(('get_defaults', resources))
 
         return resources
 
+    def get_project_quotas(self, resources, project_id):
+        self.called.append(('get_project_quotas', resources, project_id))
+
+        return resources
+
     def limit_check(self, resources, values, project_id=None, user_id=None):
         self.called.append(
             ('limit_check', resources, values, project_id, user_id))
 
+    def reserve(self, resources, deltas, expire=None, project_id=None):
+        self.called.append(
+            ('reserve', resources, deltas, expire, project_id))
+
+        return ['resv-01', 'resv-02']
+
+    def rollback(self, reservations, project_id=None):
+        self.called.append(('rollback', reservations, project_id))
+
 
 class BaseResourceTestCase(test.TestCase):
     def test_no_flag(self):
@@ -142,6 +162,16 @@ class QuotaEngineTestCase(test.TestCase):
             driver.called, [('get_defaults', quota_obj._resources), ])
         self.assertEqual(result, quota_obj._resources)
 
+    def test_get_project_quotas(self):
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver=driver)
+        result = quota_obj.get_project_quotas('test_project')
+
+        self.assertEqual(driver.called, [
+            ('get_project_quotas', quota_obj._resources, 'test_project'),
+        ])
+        self.assertEqual(result, quota_obj._resources)
+
     def test_limit_check(self):
         driver = FakeDriver()
         quota_obj = self._make_quota_obj(driver=driver)
@@ -158,6 +188,38 @@ class QuotaEngineTestCase(test.TestCase):
             ), None, None),
         ])
 
+    def test_reserve(self):
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver=driver)
+        result = quota_obj.reserve(
+            project_id='test_project', test_resource1=4, test_resource2=3)
+
+        self.assertEqual(driver.called, [
+            ('reserve', quota_obj._resources, dict(
+                test_resource1=4,
+                test_resource2=3,
+            ), None, 'test_project'),
+        ])
+        self.assertEqual(result, ['resv-01', 'resv-02'])
+
+    def test_commit(self):
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver=driver)
+        quota_obj.commit(['resv-01', 'resv-02'])
+
+        self.assertEqual(driver.called, [
+            ('commit', ['resv-01', 'resv-02'], None),
+        ])
+
+    def test_rollback(self):
+        driver = FakeDriver()
+        quota_obj = self._make_quota_obj(driver=driver)
+        quota_obj.rollback(['resv-01', 'resv-02'])
+
+        self.assertEqual(driver.called, [
+            ('rollback', ['resv-01', 'resv-02'], None),
+        ])
+
     def test_resources(self):
         quota_obj = self._make_quota_obj(driver=None)
 
@@ -178,19 +240,90 @@ class DbQuotaDriverTestCase(test.TestCase):
         self.driver = quota.DbQuotaDriver()
 
     def test_get_defaults(self):
-        self._stub_get_default_quota_class()
+        self._stub_get_quota_limits()
         result = self.driver.get_defaults(quota.QUOTAS._resources)
 
         self.assertEqual(
             result, dict(domains=100, subscribers=255))
 
-    def _stub_get_default_quota_class(self):
+    def test_get_project_quotas(self):
+        self._stub_get_quota_limits()
+        result = self.driver.get_project_quotas(
+            quota.QUOTAS._resources, 'test_project')
+
+        self.assertEqual(
+            result, dict(domains=-1, subscribers=255))
 
-        def fake_gdqc():
+    def test_limit_check(self):
+        self._stub_get_quota_limits()
+        self.driver.limit_check(
+            quota.QUOTAS._resources, dict(domains=100, subscribers=255))
+
+    def test_limit_check_over_quota(self):
+        self._stub_get_quota_limits()
+        self.assertRaises(
+            exception.OverQuota, self.driver.limit_check,
+            quota.QUOTAS._resources, dict(domains=101, subscribers=1))
+
+    def test_limit_check_unknown_resource(self):
+        self._stub_get_quota_limits()
+        self.assertRaises(
+            exception.QuotaResourceUnknown, self.driver.limit_check,
+            quota.QUOTAS._resources, dict(foo=1))
+
+    def test_limit_check_project(self):
+        self._stub_get_quota_limits()
+        self.driver.limit_check(
+            quota.QUOTAS._resources, dict(domains=1000),
+            project_id='test_project')
+
+    def test_limit_check_unlimited(self):
+        self.flags(group='quotas', quota_domains=-1)
+        self._stub_get_quota_limits()
+        self.driver.limit_check(
+            quota.QUOTAS._resources, dict(domains=1000))
+
+    def test_reserve(self):
+        self._stub_get_quota_limits()
+        calls = []
+
+        def fake_reserve_quotas(project_id, deltas, limits, expire):
+            calls.append((project_id, deltas, limits, expire))
+            return ['resv-01']
+
+        self.stubs.Set(db_api, 'reserve_quotas', fake_reserve_quotas)
+        self.stubs.Set(
+            timeutils, 'utcnow', lambda: datetime.datetime(2014, 1, 1))
+        result = self.driver.reserve(
+            quota.QUOTAS._resources, dict(subscribers=2), expire=60,
+            project_id='test_project')
+
+        self.assertEqual(result, ['resv-01'])
+        self.assertEqual(calls, [(
+            'test_project', dict(subscribers=2),
+            dict(domains=-1, subscribers=255),
+            datetime.datetime(2014, 1, 1, 0, 1))])
+
+    def test_reserve_unknown_resource(self):
+        self._stub_get_quota_limits()
+        self.assertRaises(
+            exception.QuotaResourceUnknown, self.driver.reserve,
+            quota.QUOTAS._resources, dict(foo=1))
+
+    def test_reserve_invalid_expire(self):
+        self.assertRaises(
+            exception.InvalidParameterValue, self.driver.reserve,
+            quota.QUOTAS._resources, dict(subscribers=1), expire='foo')
+
+    def _stub_get_quota_limits(self):
+
+        def fake_gql(project_id=None):
+            if project_id == 'test_project':
+                return dict(domains=-1, subscribers=255)
             return dict(
                 subscribers=255)
 
-        self.stubs.Set(db_api, 'get_default_quota_class', fake_gdqc)
+        self.stubs.Set(db_api, 'get_quota_limits', fake_gql)
 
 
 class NoopQuotaDriverTestCase(test.TestCase):
@@ -206,3 +339,8 @@ class NoopQuotaDriverTestCase(test.TestCase):
     def test_get_defaults(self):
         result = self.driver.get_defaults(quota.QUOTAS._resources)
         self.assertEqual(self.expected_without_dict, result)
+
+    def test_get_project_quotas(self):
+        result = self.driver.get_project_quotas(
+            quota.QUOTAS._resources, 'test_project')
+        self.assertEqual(self.expected_without_dict, result)
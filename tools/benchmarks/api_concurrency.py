@@ -0,0 +1,190 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare ripcord-api throughput under concurrent clients.
+
+Starts ripcord-api once per WSGI server mode against a scratch SQLite
+database, then hammers GET /v1/domains from a number of concurrent client
+threads and reports requests per second and latency percentiles.
+
+Usage:
+
+    python tools/benchmarks/api_concurrency.py --concurrency 50 --duration 10
+"""
+
+import argparse
+import httplib
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+PASTE = """[pipeline:main]
+pipeline = api-server
+
+[app:api-server]
+paste.app_factory = ripcord.api.app:app_factory
+"""
+
+CONF = """[DEFAULT]
+api_paste_config = %(paste)s
+
+[api]
+host = 127.0.0.1
+port = %(port)d
+server = %(server)s
+workers = %(workers)d
+
+[database]
+connection = sqlite:///%(db)s
+"""
+
+TENANT = '793491dd5fa8477eb2d6a820193a183b'
+
+
+def _free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    return port
+
+
+def _wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return
+        except socket.error:
+            time.sleep(.1)
+    raise RuntimeError('ripcord-api did not start listening on %d' % port)
+
+
+def _write_config(tmpdir, server, workers, port):
+    paste = os.path.join(tmpdir, 'api_paste.ini')
+    with open(paste, 'w') as f:
+        f.write(PASTE)
+
+    conf = os.path.join(tmpdir, 'ripcord-%s.conf' % server)
+    with open(conf, 'w') as f:
+        f.write(CONF % {
+            'db': os.path.join(tmpdir, 'ripcord.sqlite'),
+            'paste': paste,
+            'port': port,
+            'server': server,
+            'workers': workers,
+        })
+
+    return conf
+
+
+def _client(port, deadline, latencies, errors):
+    while time.time() < deadline:
+        start = time.time()
+        try:
+            conn = httplib.HTTPConnection('127.0.0.1', port, timeout=30)
+            conn.request('GET', '/v1/domains', headers={'X-Tenant-Id': TENANT})
+            res = conn.getresponse()
+            res.read()
+            conn.close()
+            if res.status != 200:
+                errors.append(res.status)
+                continue
+        except (socket.error, httplib.HTTPException) as e:
+            errors.append(e)
+            continue
+        latencies.append(time.time() - start)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+
+    return values[index]
+
+
+def run(server, args, tmpdir):
+    port = _free_port()
+    conf = _write_config(tmpdir, server, args.workers, port)
+    with open(os.devnull, 'w') as devnull:
+        proc = subprocess.Popen(
+            ['ripcord-api', '--config-file=%s' % conf],
+            stdout=devnull, stderr=devnull)
+    try:
+        _wait_for_port(port)
+        latencies = []
+        errors = []
+        deadline = time.time() + args.duration
+        threads = [
+            threading.Thread(
+                target=_client, args=(port, deadline, latencies, errors))
+            for _ in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    latencies.sort()
+    return {
+        'server': server,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / float(args.duration),
+        'p50': _percentile(latencies, 50) * 1000,
+        'p99': _percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=50,
+                        help='Number of concurrent client threads.')
+    parser.add_argument('--duration', type=int, default=10,
+                        help='Seconds to run each server mode for.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Value of [api] workers for each run.')
+    parser.add_argument('--servers', default='simple,eventlet',
+                        help='Comma separated [api] server modes to run.')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='ripcord-bench-')
+    try:
+        conf = _write_config(tmpdir, 'simple', 1, _free_port())
+        subprocess.check_call(
+            ['ripcord-manage', '--config-file=%s' % conf, 'db-sync'])
+
+        results = [run(s, args, tmpdir) for s in args.servers.split(',')]
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print('%-10s %10s %8s %10s %10s %10s' % (
+        'server', 'requests', 'errors', 'req/s', 'p50 (ms)', 'p99 (ms)'))
+    for r in results:
+        print('%(server)-10s %(requests)10d %(errors)8d %(rps)10.1f '
+              '%(p50)10.1f %(p99)10.1f' % r)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Count the database round trips made by the subscriber write paths.
+
+Runs create_subscriber and update_subscriber against a scratch SQLite
+database and reports, per call, the number of statements sent to the
+database, the number of commits and the number of connection checkouts.
+
+Usage:
+
+    python tools/benchmarks/db_round_trips.py --count 100
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from oslo.config import cfg
+from sqlalchemy import event
+
+from ripcord.db import api as db_api
+from ripcord.db import migration
+from ripcord.openstack.common.db.sqlalchemy import session as db_session
+
+CONF = cfg.CONF
+
+TENANT = '793491dd5fa8477eb2d6a820193a183b'
+USER = '02d99a62af974b26b510c3564ba84644'
+
+
+class Counter(object):
+
+    def __init__(self, engine):
+        self.reset()
+        event.listen(engine, 'before_cursor_execute', self._execute)
+        event.listen(engine, 'commit', self._commit)
+        event.listen(engine.pool, 'checkout', self._checkout)
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+        self.checkouts = 0
+
+    def _execute(self, *args):
+        self.statements += 1
+
+    def _commit(self, *args):
+        self.commits += 1
+
+    def _checkout(self, *args):
+        self.checkouts += 1
+
+
+def run(name, counter, count, func):
+    counter.reset()
+    for x in range(count):
+        func(x)
+
+    return {
+        'name': name,
+        'statements': counter.statements / float(count),
+        'commits': counter.commits / float(count),
+        'checkouts': counter.checkouts / float(count),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100,
+                        help='Number of calls to average over.')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='ripcord-bench-')
+    try:
+        CONF([], project='ripcord')
+        CONF.set_override(
+            'connection', 'sqlite:///%s' % os.path.join(
+                tmpdir, 'ripcord.sqlite'), group='database')
+        migration.db_sync()
+
+        domain = db_api.create_domain(
+            name='example.org', project_id=TENANT, user_id=USER)
+        counter = Counter(db_session.get_engine())
+
+        uuids = []
+
+        def create(x):
+            res = db_api.create_subscriber(
+                username='user%d' % x, domain_id=domain['uuid'],
+                password='foobar', user_id=USER, project_id=TENANT)
+            uuids.append(res['uuid'])
+
+        def update(x):
+            db_api.update_subscriber(
+                uuid=uuids[x], description='subscriber %d' % x)
+
+        def update_password(x):
+            db_api.update_subscriber(uuid=uuids[x], password='barfoo')
+
+        results = [
+            run('create_subscriber', counter, args.count, create),
+            run('update_subscriber', counter, args.count, update),
+            run('update_subscriber (password)', counter, args.count,
+                update_password),
+        ]
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print('%-30s %12s %10s %10s' % (
+        'call', 'statements', 'commits', 'checkouts'))
+    for r in results:
+        print('%(name)-30s %(statements)12.1f %(commits)10.1f '
+              '%(checkouts)10.1f' % r)
+
+
+if __name__ == '__main__':
+    main()
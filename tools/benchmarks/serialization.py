@@ -0,0 +1,95 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compare the cost of serializing subscribers to JSON.
+
+Builds a list of subscriber rows in memory and times turning it into the
+body of GET /v1/subscribers, once with the per-attribute conversion of
+WSME and once with the serializer of the subscriber controller.
+
+Usage:
+
+    python tools/benchmarks/serialization.py --rows 10000
+"""
+
+import argparse
+import datetime
+import json
+import time
+
+from wsme.rest import json as wsme_json
+
+from ripcord.api.controllers.v1 import subscriber
+from ripcord.db.sqlalchemy import models
+
+
+def generic(rows):
+    return json.dumps([wsme_json.tojson.default(subscriber.Subscriber, row)
+                       for row in rows])
+
+
+def serializer(rows):
+    return json.dumps([subscriber.SERIALIZER.to_dict(row) for row in rows])
+
+
+def run(name, func, rows, repeat):
+    best = None
+    for x in range(repeat):
+        started = time.time()
+        func(rows)
+        elapsed = time.time() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    return {
+        'name': name,
+        'total': best * 1000,
+        'row': best * 1000000 / len(rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000,
+                        help='Number of subscribers serialized.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of runs, the fastest is reported.')
+    args = parser.parse_args()
+
+    now = datetime.datetime.utcnow()
+    rows = [models.Subscriber(
+        created_at=now, description='', disabled=False,
+        domain_id='example.org', email_address='user%d@example.org' % x,
+        ha1='84ed3e3a76703c1044da21c8609334a2',
+        ha1b='2dc0ac0e03670d8474db6b1e62df8fd1', id=x, password='foobar',
+        project_id='793491dd5fa8477eb2d6a820193a183b', rpid='',
+        user_id='02d99a62af974b26b510c3564ba84644', username='user%d' % x,
+        uuid='0eda016a-b078-4bef-94ba-%012d' % x) for x in range(args.rows)]
+
+    if json.loads(generic(rows[:10])) != json.loads(serializer(rows[:10])):
+        raise SystemExit('Serializer output differs from WSME')
+
+    results = [
+        run('wsme', generic, rows, args.repeat),
+        run('serializer', serializer, rows, args.repeat),
+    ]
+
+    print('%-12s %12s %12s' % ('path', 'total (ms)', 'row (us)'))
+    for r in results:
+        print('%(name)-12s %(total)12.1f %(row)12.2f' % r)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (C) 2014 PolyBeacon, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measure database queries under a thundering herd of identical reads.
+
+Starts a number of threads which all read the same domain with
+get_domain() for a fixed duration, as a Kamailio cluster does when it
+restarts, and reports the calls served and the SELECT statements sent
+to the database, with and without read coalescing. The entity cache is
+disabled so that every call would otherwise reach the database.
+
+Usage:
+
+    python tools/benchmarks/thundering_herd.py --threads 200 --duration 5
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from oslo.config import cfg
+from sqlalchemy import event
+
+from ripcord.db import api as db_api
+from ripcord.db import cache
+from ripcord.db import migration
+from ripcord.openstack.common.db.sqlalchemy import session as db_session
+
+CONF = cfg.CONF
+
+TENANT = '793491dd5fa8477eb2d6a820193a183b'
+USER = '02d99a62af974b26b510c3564ba84644'
+
+
+class Counter(object):
+
+    def __init__(self, engine):
+        self.lock = threading.Lock()
+        self.selects = 0
+        event.listen(engine, 'before_cursor_execute', self._execute)
+
+    def _execute(self, conn, cursor, statement, *args):
+        if statement.startswith('SELECT'):
+            with self.lock:
+                self.selects += 1
+
+
+def run(counter, uuid, threads, duration, coalesce):
+    CONF.set_override('coalesce_reads', coalesce, group='database')
+    counter.selects = 0
+    calls = [0] * threads
+    start = threading.Event()
+    deadline = []
+
+    def _herd(idx):
+        start.wait()
+        while time.time() < deadline[0]:
+            db_api.get_domain(uuid=uuid)
+            calls[idx] += 1
+
+    workers = [threading.Thread(target=_herd, args=(x,))
+               for x in range(threads)]
+    for worker in workers:
+        worker.start()
+    deadline.append(time.time() + duration)
+    start.set()
+    for worker in workers:
+        worker.join()
+
+    return {
+        'name': 'coalesced' if coalesce else 'uncoalesced',
+        'calls': sum(calls) / float(duration),
+        'selects': counter.selects / float(duration),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=200,
+                        help='Number of concurrent readers.')
+    parser.add_argument('--duration', type=float, default=5,
+                        help='Number of seconds to run each case for.')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='ripcord-bench-')
+    try:
+        CONF([], project='ripcord')
+        CONF.set_override(
+            'connection', 'sqlite:///%s' % os.path.join(
+                tmpdir, 'ripcord.sqlite'), group='database')
+        CONF.set_override('entity_cache_backend', 'none', group='database')
+        cache.reset()
+        migration.db_sync()
+
+        domain = db_api.create_domain(
+            name='example.org', project_id=TENANT, user_id=USER)
+        counter = Counter(db_session.get_engine())
+
+        results = [
+            run(counter, domain['uuid'], args.threads, args.duration, False),
+            run(counter, domain['uuid'], args.threads, args.duration, True),
+        ]
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print('%-15s %12s %12s %12s' % (
+        'case', 'calls/s', 'selects/s', 'calls/select'))
+    for r in results:
+        print('%-15s %12.0f %12.0f %12.1f' % (
+            r['name'], r['calls'], r['selects'],
+            r['calls'] / r['selects'] if r['selects'] else 0))
+
+
+if __name__ == '__main__':
+    main()